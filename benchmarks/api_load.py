@@ -0,0 +1,92 @@
+"""Load test for the read-only query API.
+
+Starts the API server in-process against a database and hammers it with
+concurrent clients, reporting requests/second for a cold (uncached) and a
+warm (cached) pass.
+
+Usage:
+    python -m benchmarks.api_load --db data/exist.db --clients 8 --requests 2000
+"""
+
+import argparse
+import json
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import requests
+
+from exist_backup.server import make_server
+
+from .synthetic import SyntheticDataset
+
+
+def list_dates(path):
+    conn = sqlite3.connect(path)
+    dates = [row[0] for row in conn.execute("SELECT date FROM calendar ORDER BY day")]
+    conn.close()
+    return dates
+
+
+def run_pass(base_url, paths, clients):
+    local = threading.local()
+
+    def fetch(path):
+        session = getattr(local, "session", None)
+        if session is None:
+            session = local.session = requests.Session()
+        resp = session.get(base_url + path)
+        resp.raise_for_status()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        list(pool.map(fetch, paths))
+    elapsed = time.perf_counter() - start
+    return {"requests": len(paths), "seconds": round(elapsed, 3), "rps": round(len(paths) / elapsed, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", help="Database to serve (default: generate a synthetic database)")
+    parser.add_argument("--attributes", type=int, default=40, help="Synthetic attributes when --db is not given")
+    parser.add_argument("--years", type=int, default=2, help="Synthetic years when --db is not given")
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--distinct", type=int, default=200, help="Distinct URLs in the request mix")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = args.db
+        if db_path is None:
+            db_path = str(Path(tmp) / "synthetic.db")
+            SyntheticDataset(args.attributes, args.years).build_db(db_path)
+        dates = list_dates(db_path)
+
+        rng = random.Random(0)
+        urls = ["/attributes"] + [f"/day/{d}" for d in rng.sample(dates, min(args.distinct, len(dates)))]
+        paths = [rng.choice(urls) for _ in range(args.requests)]
+
+        server = make_server(db_path, port=0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        host, port = server.server_address[:2]
+        base_url = f"http://{host}:{port}"
+        try:
+            server.app.cache.maxsize = 0
+            uncached = run_pass(base_url, paths, args.clients)
+            server.app.cache.maxsize = len(urls)
+            run_pass(base_url, urls, args.clients)  # prime
+            cached = run_pass(base_url, paths, args.clients)
+        finally:
+            server.shutdown()
+            server.server_close()
+            server.app.close()
+
+    print(json.dumps({"clients": args.clients, "uncached": uncached, "cached": cached}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
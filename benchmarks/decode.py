@@ -0,0 +1,107 @@
+"""Transfer size and JSON decode time for large API pages.
+
+Pages are recorded from the synthetic dataset in the shape the API returns
+them (``attributes/with-values/`` with 31 days of values, 100 attributes
+per page, and ``attributes/values/`` history pages), or loaded from a
+directory of previously recorded ``*.json`` bodies. For each content
+encoding the bodies' total size is reported, and for each available JSON
+backend the best-of-N time to decode all of them.
+
+Usage:
+    python -m benchmarks.decode --attributes 200 --years 3 --record pages/
+    python -m benchmarks.decode --payloads pages/ --output decode.json
+"""
+
+import argparse
+import gzip
+import json
+import time
+import zlib
+from pathlib import Path
+
+from exist_backup import fastjson
+
+from .synthetic import SyntheticDataset
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+PAGE_SIZE = 100
+
+ENCODINGS = {
+    "identity": lambda body: body,
+    "gzip": lambda body: gzip.compress(body, compresslevel=6),
+    "deflate": lambda body: zlib.compress(body, 6),
+}
+if brotli is not None:
+    ENCODINGS["br"] = lambda body: brotli.compress(body, quality=5)
+
+
+def record_pages(dataset):
+    """Serialised response bodies for with-values and per-attribute history pages."""
+    pages = []
+    with_values = list(dataset.with_values(days=31))
+    for start in range(0, len(with_values), PAGE_SIZE):
+        pages.append({"count": len(with_values), "next": None, "previous": None,
+                      "results": with_values[start:start + PAGE_SIZE]})
+    for name, values in dataset.values.items():
+        for start in range(0, len(values), PAGE_SIZE):
+            pages.append({"count": len(values), "next": None, "previous": None,
+                          "results": values[start:start + PAGE_SIZE]})
+    return [json.dumps(page).encode() for page in pages]
+
+
+def measure(bodies, repeat):
+    """Total encoded size per encoding and best decode time per JSON backend."""
+    raw = sum(len(body) for body in bodies)
+    sizes = {}
+    for name, encode in ENCODINGS.items():
+        size = sum(len(encode(body)) for body in bodies)
+        sizes[name] = {"bytes": size, "ratio": round(size / raw, 4)}
+
+    decode = {}
+    for name, loads in fastjson.BACKENDS.items():
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for body in bodies:
+                loads(body)
+            timings.append(time.perf_counter() - start)
+        seconds = min(timings)
+        decode[name] = {"seconds": round(seconds, 4), "mb_per_second": round(raw / seconds / 1e6, 1)}
+    return {"pages": len(bodies), "bytes": raw, "encodings": sizes, "decode": decode}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--attributes", type=int, default=100)
+    parser.add_argument("--years", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=5, help="Decode runs per backend (best is kept)")
+    parser.add_argument("--payloads", help="Directory of recorded *.json bodies to use instead of synthetic pages")
+    parser.add_argument("--record", help="Write the synthetic pages to this directory")
+    parser.add_argument("--output", help="Also write results JSON to this file")
+    args = parser.parse_args(argv)
+
+    if args.payloads:
+        bodies = [path.read_bytes() for path in sorted(Path(args.payloads).glob("*.json"))]
+    else:
+        bodies = record_pages(SyntheticDataset(args.attributes, args.years, args.seed))
+    if args.record:
+        directory = Path(args.record)
+        directory.mkdir(parents=True, exist_ok=True)
+        for i, body in enumerate(bodies):
+            (directory / f"page-{i:05d}.json").write_bytes(body)
+
+    document = measure(bodies, args.repeat)
+    output = json.dumps(document, indent=2)
+    print(output)
+    if args.output:
+        Path(args.output).write_text(output + "\n")
+    return document
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+"""Timed benchmark scenarios over synthetic data.
+
+Each scenario runs against a freshly generated database and reports wall
+time, rows processed, rows/second and peak Python memory (tracemalloc, in
+a separate pass so it doesn't distort the timings). Results are printed as
+JSON, tagged with the current git commit, and can be compared against an
+earlier results file. The *_http scenarios drive the real ExistClient
+against the local stub server instead of an in-process fake client.
+
+Usage:
+    python -m benchmarks.run --attributes 50 --years 3 --output bench.json
+    python -m benchmarks.run --compare bench-before.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from datetime import timedelta
+from pathlib import Path
+from unittest.mock import patch
+
+from exist_backup import db, rollups
+from exist_backup.export import export_date_range
+from exist_backup.sync import run_sync
+
+from .stub_server import StubExistServer
+from .synthetic import SyntheticClient, SyntheticDataset
+
+INCREMENTAL_LAG_DAYS = 7
+
+
+def _config(workdir, db_path):
+    return {
+        "auth": {"token": "benchmark"},
+        "sync": {"database": str(db_path)},
+        "export": {"output_dir": str(Path(workdir) / "export"), "template": "daily"},
+    }
+
+
+def _fresh_copy(template_db, workdir, name):
+    path = Path(workdir) / name
+    for suffix in ("", "-wal", "-shm"):
+        Path(str(path) + suffix).unlink(missing_ok=True)
+    shutil.copyfile(template_db, path)
+    return path
+
+
+class Scenarios:
+    """Each scenario method prepares fresh state and returns the callable to time."""
+
+    def __init__(self, dataset, workdir, stub_options=None):
+        self.dataset = dataset
+        self.workdir = Path(workdir)
+        self.stub_options = stub_options or {}
+        self._stubs = []
+        self.full_db = self.workdir / "full-template.db"
+        self.lagged_db = self.workdir / "lagged-template.db"
+        dataset.build_db(str(self.full_db))
+        dataset.build_db(str(self.lagged_db), until=dataset.end_date - timedelta(days=INCREMENTAL_LAG_DAYS))
+
+    def _sync(self, db_path, full):
+        config = _config(self.workdir, db_path)
+        client = SyntheticClient(self.dataset)
+
+        def run():
+            with patch("exist_backup.sync.api.ExistClient", return_value=client):
+                return run_sync(config, full=full)["values_synced"]
+        return run
+
+    def full_sync(self):
+        path = self.workdir / "full-sync.db"
+        for suffix in ("", "-wal", "-shm"):
+            Path(str(path) + suffix).unlink(missing_ok=True)
+        return self._sync(path, full=True)
+
+    def incremental_sync(self):
+        return self._sync(_fresh_copy(self.lagged_db, self.workdir, "incremental.db"), full=False)
+
+    def _http_sync(self, db_path, full):
+        """Sync through the real ExistClient against a local stub server."""
+        self.close()
+        stub = StubExistServer(self.dataset, **self.stub_options)
+        self._stubs.append(stub)
+        config = _config(self.workdir, db_path)
+        config["sync"]["api_url"] = stub.start()
+
+        def run():
+            return run_sync(config, full=full)["values_synced"]
+        return run
+
+    def close(self):
+        """Stop any stub servers started by earlier scenarios."""
+        while self._stubs:
+            self._stubs.pop().stop()
+
+    def full_sync_http(self):
+        path = self.workdir / "full-sync-http.db"
+        for suffix in ("", "-wal", "-shm"):
+            Path(str(path) + suffix).unlink(missing_ok=True)
+        return self._http_sync(path, full=True)
+
+    def incremental_sync_http(self):
+        return self._http_sync(_fresh_copy(self.lagged_db, self.workdir, "incremental-http.db"), full=False)
+
+    def _export(self, date_from, date_to):
+        config = _config(self.workdir, _fresh_copy(self.full_db, self.workdir, "export.db"))
+        shutil.rmtree(config["export"]["output_dir"], ignore_errors=True)
+        # Counted here so the timed run is the export alone
+        conn = db.connect_readonly(config["sync"]["database"])
+        rows = len(db.get_values_for_date_range(conn, date_from.isoformat(), date_to.isoformat()))
+        conn.close()
+
+        def run():
+            export_date_range(config, date_from, date_to)
+            return rows
+        return run
+
+    def export_day(self):
+        return self._export(self.dataset.end_date, self.dataset.end_date)
+
+    def export_range(self):
+        return self._export(self.dataset.start_date, self.dataset.end_date)
+
+    def status(self):
+        path = _fresh_copy(self.full_db, self.workdir, "status.db")
+
+        def run():
+            # The read-only path the status command takes
+            conn = db.connect_readonly(str(path))
+            stats = db.get_sync_status(conn)
+            conn.close()
+            return stats["total_values"]
+        return run
+
+    def summary_range(self):
+        path = _fresh_copy(self.full_db, self.workdir, "summary.db")
+
+        def run():
+            conn = db.connect(str(path))
+            stats = rollups.summarize(conn, self.dataset.start_date, self.dataset.end_date)
+            conn.close()
+            return sum(s["count"] for s in stats.values())
+        return run
+
+
+SCENARIOS = [
+    "full_sync",
+    "incremental_sync",
+    "full_sync_http",
+    "incremental_sync_http",
+    "export_day",
+    "export_range",
+    "status",
+    "summary_range",
+]
+
+
+def measure(scenarios, name, repeat):
+    """Best-of-`repeat` timing plus one tracemalloc pass."""
+    timings = []
+    rows = 0
+    for _ in range(repeat):
+        run = getattr(scenarios, name)()
+        with contextlib.redirect_stderr(io.StringIO()):
+            start = time.perf_counter()
+            rows = run()
+            timings.append(time.perf_counter() - start)
+
+    run = getattr(scenarios, name)()
+    with contextlib.redirect_stderr(io.StringIO()):
+        tracemalloc.start()
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    seconds = min(timings)
+    return {
+        "seconds": round(seconds, 4),
+        "rows": rows,
+        "rows_per_second": round(rows / seconds, 1) if seconds else None,
+        "peak_memory_bytes": peak,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=Path(__file__).parent,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(before, after):
+    """Print a per-scenario comparison of two result documents."""
+    print(f"{'scenario':<18} {'before s':>10} {'after s':>10} {'speedup':>8} {'mem ratio':>9}")
+    for name, new in after["scenarios"].items():
+        old = before["scenarios"].get(name)
+        if not old:
+            continue
+        speedup = old["seconds"] / new["seconds"] if new["seconds"] else float("inf")
+        mem = new["peak_memory_bytes"] / old["peak_memory_bytes"] if old["peak_memory_bytes"] else float("nan")
+        print(f"{name:<18} {old['seconds']:>10.4f} {new['seconds']:>10.4f} {speedup:>7.2f}x {mem:>9.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--attributes", type=int, default=50)
+    parser.add_argument("--years", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=3, help="Timing runs per scenario (best is kept)")
+    parser.add_argument("--scenario", action="append", choices=SCENARIOS, help="Run only these scenarios")
+    parser.add_argument("--stub-latency", type=float, default=0.0,
+                        help="Per-request latency of the stub server in the *_http scenarios")
+    parser.add_argument("--stub-page-size", type=int, default=100,
+                        help="Maximum page size of the stub server in the *_http scenarios")
+    parser.add_argument("--output", help="Also write results JSON to this file")
+    parser.add_argument("--compare", help="Results JSON from an earlier run to compare against")
+    args = parser.parse_args(argv)
+
+    dataset = SyntheticDataset(args.attributes, args.years, args.seed)
+    with tempfile.TemporaryDirectory() as workdir:
+        stub_options = {"latency": args.stub_latency, "page_size": args.stub_page_size}
+        scenarios = Scenarios(dataset, workdir, stub_options)
+        try:
+            results = {
+                name: measure(scenarios, name, args.repeat)
+                for name in (args.scenario or SCENARIOS)
+            }
+        finally:
+            scenarios.close()
+
+    document = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "cpu_count": os.cpu_count(),
+        "params": {
+            "attributes": args.attributes,
+            "years": args.years,
+            "seed": args.seed,
+            "total_values": dataset.total_values,
+            "stub_latency": args.stub_latency,
+            "stub_page_size": args.stub_page_size,
+        },
+        "scenarios": results,
+    }
+    output = json.dumps(document, indent=2)
+    print(output)
+    if args.output:
+        Path(args.output).write_text(output + "\n")
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), document)
+    return document
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+"""Local stub of the Exist.io API v2 serving a SyntheticDataset.
+
+Implements the endpoints ExistClient uses, with Exist-style pagination
+(count/next/previous/results, ?page=&limit=) on the attribute lists:
+
+    GET accounts/profile/
+    GET attributes/?attributes=&groups=&manual=&include_inactive=
+    GET attributes/with-values/?days=&date_max=&attributes=&groups=&manual=&include_inactive=
+    GET attributes/values/?attribute=&date_max=
+    POST attributes/update/      (up to 35 {name, date, value} per request)
+    POST attributes/increment/
+
+Writes are accepted for manual attributes only, mimicking Exist's rule
+that an app can only write attributes it owns. With --hide-inactive,
+inactive attributes are only listed when include_inactive=true is sent,
+as Exist does. Bodies over 1 KiB are gzip-compressed when the client
+accepts it, like Exist's own responses (disable with --no-compress).
+
+Fault injection makes it useful for measuring the sync path offline:
+per-request latency with jitter, a maximum page size, a request quota per
+window answered with 429 + Retry-After, and a random 5xx error rate.
+
+Usage:
+    python -m benchmarks.stub_server --attributes 50 --years 3 --port 8700 \\
+        --latency 0.05 --quota 300 --quota-window 60 --error-rate 0.01
+then point [sync] api_url at http://127.0.0.1:8700/api/2/
+"""
+
+import argparse
+import gzip
+import json
+import math
+import random
+import threading
+import time
+from collections import Counter, deque
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlparse
+
+from .synthetic import SyntheticDataset, select_attributes
+
+API_PREFIX = "/api/2/"
+MAX_DAYS = 31
+MAX_WRITE_BATCH = 35
+COMPRESS_MIN_BYTES = 1024
+WRITE_ENDPOINTS = ("attributes/update/", "attributes/increment/")
+
+
+class StubState:
+    """Dataset plus fault-injection settings and request counters."""
+
+    def __init__(self, dataset, latency=0.0, jitter=0.0, page_size=100, quota=None,
+                 quota_window=60.0, error_rate=0.0, seed=0, compress=True, hide_inactive=False):
+        self.dataset = dataset
+        self.compress = compress
+        self.hide_inactive = hide_inactive
+        self.latency = latency
+        self.jitter = jitter
+        self.page_size = page_size
+        self.quota = quota
+        self.quota_window = quota_window
+        self.error_rate = error_rate
+        self.stats = Counter()
+        self._rng = random.Random(seed)
+        self._recent = deque()
+        self._lock = threading.Lock()
+
+    def admit(self):
+        """Apply quota and random errors. Returns (status, headers) or None to proceed."""
+        with self._lock:
+            self.stats["requests"] += 1
+            now = time.monotonic()
+            if self.quota is not None:
+                while self._recent and now - self._recent[0] >= self.quota_window:
+                    self._recent.popleft()
+                if len(self._recent) >= self.quota:
+                    self.stats["throttled"] += 1
+                    retry_after = math.ceil(self.quota_window - (now - self._recent[0]))
+                    return 429, {"Retry-After": str(max(1, retry_after))}
+                self._recent.append(now)
+            if self.error_rate and self._rng.random() < self.error_rate:
+                self.stats["errors"] += 1
+                return self._rng.choice([500, 502, 503]), {}
+            delay = self.latency + (self._rng.uniform(0, self.jitter) if self.jitter else 0)
+        if delay:
+            time.sleep(delay)
+        return None
+
+    def apply_writes(self, items, increment=False):
+        """Apply update/increment items to the dataset. Returns (success, failed) lists."""
+        success, failed = [], []
+        attributes = {a["name"]: a for a in self.dataset.attributes}
+        with self._lock:
+            for item in items:
+                name, day, value = item.get("name"), item.get("date"), item.get("value")
+                attr = attributes.get(name)
+                if attr is None or not attr["manual"]:
+                    failed.append({**item, "error_code": "not_owned", "error": f"Attribute {name} not owned"})
+                    continue
+                values = self.dataset.values[name]
+                existing = next((v for v in values if v["date"] == day), None)
+                if existing is None:
+                    existing = {"date": day, "value": 0 if increment else None}
+                    values.append(existing)
+                    values.sort(key=lambda v: v["date"], reverse=True)
+                existing["value"] = existing["value"] + value if increment else value
+                success.append({"name": name, "date": day, "value": existing["value"]})
+            self.stats["writes"] += len(success)
+        return success, failed
+
+
+class StubRequestHandler(BaseHTTPRequestHandler):
+    server_version = "exist-stub"
+
+    def do_GET(self):
+        state = self.server.state
+        rejection = state.admit()
+        if rejection:
+            status, headers = rejection
+            return self._send_json(status, {"detail": "Request was throttled." if status == 429 else "Error"}, headers)
+
+        url = urlparse(self.path)
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        endpoint = url.path[len(API_PREFIX):] if url.path.startswith(API_PREFIX) else None
+
+        if endpoint == "accounts/profile/":
+            return self._send_json(200, state.dataset.profile)
+        if endpoint == "attributes/":
+            return self._send_page(url, query, select_attributes(state.dataset.attributes, query, state.hide_inactive))
+        if endpoint == "attributes/with-values/":
+            days = min(int(query.get("days", 1)), MAX_DAYS)
+            results = state.dataset.with_values(days, query.get("date_max"))
+            return self._send_page(url, query, select_attributes(list(results), query, state.hide_inactive))
+        if endpoint == "attributes/values/":
+            name = query.get("attribute")
+            if name not in state.dataset.values:
+                return self._send_json(404, {"detail": f"No such attribute: {name}"})
+            return self._send_page(url, query, state.dataset.values_between(name, date_max=query.get("date_max")))
+        return self._send_json(404, {"detail": "Not found."})
+
+    def do_POST(self):
+        state = self.server.state
+        rejection = state.admit()
+        if rejection:
+            status, headers = rejection
+            return self._send_json(status, {"detail": "Request was throttled." if status == 429 else "Error"}, headers)
+
+        url = urlparse(self.path)
+        endpoint = url.path[len(API_PREFIX):] if url.path.startswith(API_PREFIX) else None
+        if endpoint not in WRITE_ENDPOINTS:
+            return self._send_json(404, {"detail": "Not found."})
+        try:
+            items = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        except ValueError:
+            return self._send_json(400, {"detail": "Invalid JSON."})
+        if not isinstance(items, list) or len(items) > MAX_WRITE_BATCH:
+            return self._send_json(400, {"detail": f"Send a list of at most {MAX_WRITE_BATCH} values."})
+        success, failed = state.apply_writes(items, increment=endpoint == "attributes/increment/")
+        self._send_json(200, {"success": success, "failed": failed})
+
+    def _send_page(self, url, query, items):
+        state = self.server.state
+        limit = max(1, min(int(query.get("limit", state.page_size)), state.page_size))
+        page = max(1, int(query.get("page", 1)))
+        start = (page - 1) * limit
+        base = f"http://{self.headers.get('Host')}{url.path}"
+
+        def link(n):
+            return f"{base}?{urlencode({**query, 'page': n, 'limit': limit})}"
+
+        self._send_json(200, {
+            "count": len(items),
+            "next": link(page + 1) if start + limit < len(items) else None,
+            "previous": link(page - 1) if page > 1 else None,
+            "results": items[start:start + limit],
+        })
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        accepted = self.headers.get("Accept-Encoding", "")
+        if self.server.state.compress and "gzip" in accepted and len(body) >= COMPRESS_MIN_BYTES:
+            body = gzip.compress(body, compresslevel=6)
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubExistServer:
+    """Threaded stub server; use as a context manager or start()/stop()."""
+
+    def __init__(self, dataset, host="127.0.0.1", port=0, **fault_options):
+        self.httpd = ThreadingHTTPServer((host, port), StubRequestHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.state = StubState(dataset, **fault_options)
+        self._thread = None
+
+    @property
+    def state(self):
+        return self.httpd.state
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}{API_PREFIX}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self.base_url
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--attributes", type=int, default=50)
+    parser.add_argument("--years", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8700)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every request")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Extra random latency, up to this many seconds")
+    parser.add_argument("--page-size", type=int, default=100, help="Maximum results per page")
+    parser.add_argument("--quota", type=int, default=None, help="Requests allowed per quota window")
+    parser.add_argument("--quota-window", type=float, default=60.0, help="Quota window in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 5xx")
+    parser.add_argument("--no-compress", action="store_true", help="Never gzip response bodies")
+    parser.add_argument("--hide-inactive", action="store_true",
+                        help="Leave inactive attributes out unless include_inactive=true, like Exist.io")
+    args = parser.parse_args()
+
+    dataset = SyntheticDataset(args.attributes, args.years, args.seed, end_date=date.today() - timedelta(days=1))
+    server = StubExistServer(
+        dataset, args.host, args.port,
+        latency=args.latency, jitter=args.jitter, page_size=args.page_size, quota=args.quota,
+        quota_window=args.quota_window, error_rate=args.error_rate, seed=args.seed,
+        compress=not args.no_compress, hide_inactive=args.hide_inactive,
+    )
+    print(f"Stub Exist API on {server.base_url} ({dataset.total_values} values)")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+        print(json.dumps(dict(server.state.stats)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""Deterministic synthetic Exist.io data for benchmarks and load tests.
+
+The same (n_attributes, years, seed, end_date) always produces the same
+attributes and values. Attributes cycle through every value_type, a mix of
+service-backed and manual attributes, and each attribute has its own fill
+rate so some days are missing, the way real histories are sparse.
+"""
+
+import random
+from datetime import date, timedelta
+
+from exist_backup import db
+
+# value_type -> (description, value generator)
+VALUE_TYPES = {
+    0: ("Integer", lambda rng: rng.randint(0, 20000)),
+    1: ("Float", lambda rng: round(rng.uniform(40, 120), 2)),
+    2: ("String", lambda rng: " ".join(rng.choices(WORDS, k=rng.randint(1, 8)))),
+    3: ("Duration (minutes)", lambda rng: rng.randint(0, 720)),
+    4: ("Time of day (min from midnight)", lambda rng: rng.randint(0, 1439)),
+    5: ("Percentage", lambda rng: round(rng.random(), 2)),
+    6: ("Time of day (min from midday)", lambda rng: rng.randint(-720, 719)),
+    7: ("Boolean", lambda rng: rng.randint(0, 1)),
+    8: ("Scale (1-9)", lambda rng: rng.randint(1, 9)),
+}
+
+WORDS = (
+    "park walk rain sun tired happy coffee friend work gym beach read movie "
+    "family sick cold travel office home garden dinner late early run"
+).split()
+
+GROUPS = [
+    ("activity", "Activity"),
+    ("sleep", "Sleep"),
+    ("mood", "Mood"),
+    ("productivity", "Productivity"),
+    ("health", "Health"),
+    ("weather", "Weather"),
+    ("custom", "Custom"),
+]
+
+SERVICES = [("googlefit", "Google Fit"), ("rescuetime", "RescueTime"), ("darksky", "Weather"), None]
+
+
+class SyntheticDataset:
+    """A generated profile, attribute list and value history.
+
+    values[name] holds {"date", "value"} dicts newest first, matching the
+    order of the Exist.io values endpoints.
+    """
+
+    def __init__(self, n_attributes=50, years=3, seed=1, end_date=None):
+        self.n_attributes = n_attributes
+        self.years = years
+        self.seed = seed
+        self.end_date = end_date or date.today() - timedelta(days=1)
+        self.start_date = self.end_date - timedelta(days=365 * years - 1)
+        self.profile = {
+            "username": "benchuser",
+            "first_name": "Bench",
+            "last_name": "User",
+            "timezone": "UTC",
+            "imperial_distance": False,
+        }
+        self.attributes = [self._make_attribute(i) for i in range(n_attributes)]
+        self.values = {attr["name"]: self._make_values(i, attr) for i, attr in enumerate(self.attributes)}
+
+    def _make_attribute(self, i):
+        value_type = i % len(VALUE_TYPES)
+        group_name, group_label = GROUPS[i % len(GROUPS)]
+        service = SERVICES[i % len(SERVICES)]
+        manual = service is None
+        return {
+            "name": f"{group_name}_{i}",
+            "label": f"{group_label} {i}",
+            "group": {"name": group_name, "label": group_label, "priority": i % len(GROUPS) + 1},
+            "priority": i,
+            "value_type": value_type,
+            "value_type_description": VALUE_TYPES[value_type][0],
+            "service": {"name": service[0], "label": service[1]} if service else None,
+            "manual": manual,
+            "active": i % 11 != 10,
+            "template": None,
+        }
+
+    def _make_values(self, i, attr):
+        rng = random.Random(self.seed * 100003 + i)
+        # Service data is dense, manually tracked data is patchy
+        fill_rate = rng.uniform(0.9, 1.0) if not attr["manual"] else rng.uniform(0.3, 0.8)
+        generate = VALUE_TYPES[attr["value_type"]][1]
+        values = []
+        day = self.end_date
+        while day >= self.start_date:
+            if rng.random() < fill_rate:
+                values.append({"date": day.isoformat(), "value": generate(rng)})
+            day -= timedelta(days=1)
+        return values
+
+    @property
+    def total_values(self):
+        return sum(len(v) for v in self.values.values())
+
+    def values_between(self, name, date_min=None, date_max=None):
+        """Values for one attribute within [date_min, date_max], newest first."""
+        date_min = str(date_min) if date_min else None
+        date_max = str(date_max) if date_max else None
+        return [
+            v for v in self.values[name]
+            if (date_max is None or v["date"] <= date_max) and (date_min is None or v["date"] >= date_min)
+        ]
+
+    def with_values(self, days=1, date_max=None):
+        """Attribute dicts with a 'values' array for the last `days` days, like /attributes/with-values/."""
+        date_max = date.fromisoformat(str(date_max)) if date_max else self.end_date
+        date_min = date_max - timedelta(days=min(days, 31) - 1)
+        for attr in self.attributes:
+            result = dict(attr)
+            result["values"] = self.values_between(attr["name"], date_min, date_max)
+            yield result
+
+    def build_db(self, db_path, until=None):
+        """Write the dataset into a database, optionally only values up to `until`."""
+        conn = db.connect(db_path)
+        db.init_db(conn)
+        db.upsert_profile(conn, self.profile)
+        for attr in self.attributes:
+            db.upsert_attribute(conn, attr)
+            db.upsert_values(conn, attr["name"], self.values_between(attr["name"], date_max=until))
+        conn.close()
+
+
+def select_attributes(items, query, hide_inactive=False):
+    """Narrow attribute dicts by the attributes=, groups= and manual= query parameters.
+
+    With hide_inactive, inactive attributes are left out unless the query
+    has include_inactive=true, as Exist.io does.
+    """
+    if hide_inactive and query.get("include_inactive") not in ("true", "1"):
+        items = [a for a in items if a["active"]]
+    if query.get("attributes"):
+        names = set(query["attributes"].split(","))
+        items = [a for a in items if a["name"] in names]
+    if query.get("groups"):
+        groups = set(query["groups"].split(","))
+        items = [a for a in items if a["group"]["name"] in groups]
+    if query.get("manual") in ("true", "1"):
+        items = [a for a in items if a["manual"]]
+    return items
+
+
+class SyntheticClient:
+    """Drop-in stand-in for api.ExistClient serving a SyntheticDataset."""
+
+    def __init__(self, dataset):
+        self.dataset = dataset
+        self.requests = 0
+
+    def get_profile(self):
+        self.requests += 1
+        return dict(self.dataset.profile)
+
+    def get_attributes(self, params=None):
+        self.requests += 1
+        return [dict(a) for a in select_attributes(self.dataset.attributes, params or {})]
+
+    def get_attributes_with_values(self, days=1, date_max=None, params=None):
+        self.requests += 1
+        yield from select_attributes(list(self.dataset.with_values(days, date_max)), params or {})
+
+    def get_attribute_values(self, attribute_name, date_max=None, limit=100):
+        values = self.dataset.values_between(attribute_name, date_max=date_max)
+        self.requests += max(1, -(-len(values) // limit))
+        yield from values
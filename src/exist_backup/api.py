@@ -4,32 +4,91 @@ import sys
 import time
 
 import requests
+from urllib3.util.request import ACCEPT_ENCODING
+
+from . import fastjson, metrics
+from .profiling import hot_path
 
 BASE_URL = "https://exist.io/api/2/"
 TIMEOUT = 30
 DEFAULT_RETRY_AFTER = 60
+MAX_WRITE_BATCH = 35  # values per attributes/update/ or attributes/increment/ request
+
+
+def selection_params(filters):
+    """Query parameters that let attributes/ and with-values/ apply sync selection rules.
+
+    Only rules the API expresses exactly are passed: a lone include list of
+    attribute or group names (separate parameters would AND where the rules
+    OR) and manual = true. Inactive attributes are only returned on request.
+    Callers still check each result with db.attribute_matches.
+    """
+    params = {}
+    includes = [key for key, names in filters.items() if key.startswith("include_") and names]
+    if includes == ["include_attributes"]:
+        params["attributes"] = ",".join(filters["include_attributes"])
+    elif includes == ["include_groups"]:
+        params["groups"] = ",".join(filters["include_groups"])
+    if filters.get("manual") is True:
+        params["manual"] = "true"
+    if filters.get("active") is False:
+        params["include_inactive"] = "true"
+    return params
 
 
 class ExistClient:
     """Client for the Exist.io API v2."""
 
-    def __init__(self, token):
+    def __init__(self, token, base_url=BASE_URL, json_backend="auto"):
+        self.base_url = base_url
+        self.json_backend, self._loads = fastjson.get_loads(json_backend)
         self.session = requests.Session()
         self.session.headers["Authorization"] = f"Token {token}"
         self.session.headers["Accept"] = "application/json"
+        # gzip/deflate, plus br/zstd when urllib3 can decode them (the `fast` extra installs brotli)
+        self.session.headers["Accept-Encoding"] = ACCEPT_ENCODING
 
-    def _request(self, url, params=None):
-        """Make a GET request with rate limit handling."""
+    def _endpoint(self, url):
+        """Endpoint label for metrics, e.g. 'attributes/values/'."""
+        path = url.split("?", 1)[0]
+        return path[len(self.base_url):] if path.startswith(self.base_url) else path
+
+    def _request(self, url, params=None, json_body=None):
+        """Make a GET request (POST when json_body is given) with rate limit handling."""
+        endpoint = self._endpoint(url)
         while True:
-            resp = self.session.get(url, params=params, timeout=TIMEOUT)
+            with metrics.timer("http_request", endpoint=endpoint):
+                if json_body is None:
+                    resp = self.session.get(url, params=params, timeout=TIMEOUT)
+                else:
+                    resp = self.session.post(url, json=json_body, timeout=TIMEOUT)
+            metrics.count("http_responses", endpoint=endpoint, status=resp.status_code)
             if resp.status_code == 429:
                 retry_after = int(resp.headers.get("Retry-After", DEFAULT_RETRY_AFTER))
                 print(f"Rate limited, sleeping {retry_after}s...", file=sys.stderr)
-                time.sleep(retry_after)
+                with metrics.timer("http_throttle_wait", endpoint=endpoint):
+                    time.sleep(retry_after)
                 continue
             resp.raise_for_status()
-            return resp.json()
+            body = resp.content
+            self._count_bytes(resp, body, endpoint)
+            with metrics.timer("json_decode", endpoint=endpoint):
+                return self._loads(body)
+
+    @staticmethod
+    def _count_bytes(resp, body, endpoint):
+        """Count bytes received on the wire and after decompression, per endpoint."""
+        try:
+            wire = resp.raw.tell()
+        except (AttributeError, OSError):
+            wire = 0
+        if not wire:
+            wire = int(resp.headers.get("Content-Length") or len(body))
+        encoding = resp.headers.get("Content-Encoding", "identity")
+        metrics.count("http_bytes_wire", wire, endpoint=endpoint, encoding=encoding)
+        metrics.count("http_bytes_decoded", len(body), endpoint=endpoint)
 
+    @hot_path("paginate")
     def _paginate(self, url, params=None):
         """Auto-follow pagination, yielding each result item."""
         params = dict(params or {})
@@ -42,24 +101,26 @@ class ExistClient:
 
     def get_profile(self):
         """Fetch user profile (single object)."""
-        return self._request(BASE_URL + "accounts/profile/")
+        return self._request(self.base_url + "accounts/profile/")
 
-    def get_attributes(self):
-        """Fetch all attribute metadata (paginated)."""
-        return list(self._paginate(BASE_URL + "attributes/"))
+    def get_attributes(self, params=None):
+        """Fetch all attribute metadata (paginated), optionally narrowed by selection_params."""
+        return list(self._paginate(self.base_url + "attributes/", params))
 
-    def get_attributes_with_values(self, days=1, date_max=None):
+    def get_attributes_with_values(self, days=1, date_max=None, params=None):
         """Fetch all attributes with recent values in bulk (paginated).
 
         Each result includes attribute metadata plus a 'values' array.
         Max 31 days per request.
 
+        `params` are extra query parameters such as selection_params.
+
         Yields individual attribute dicts.
         """
-        params = {"days": min(days, 31)}
+        params = {**(params or {}), "days": min(days, 31)}
         if date_max:
             params["date_max"] = str(date_max)
-        yield from self._paginate(BASE_URL + "attributes/with-values/", params)
+        yield from self._paginate(self.base_url + "attributes/with-values/", params)
 
     def get_attribute_values(self, attribute_name, date_max=None, limit=100):
         """Fetch historical values for one attribute (paginated).
@@ -69,4 +130,39 @@ class ExistClient:
         params = {"attribute": attribute_name, "limit": limit}
         if date_max:
             params["date_max"] = str(date_max)
-        yield from self._paginate(BASE_URL + "attributes/values/", params)
+        yield from self._paginate(self.base_url + "attributes/values/", params)
+
+    def _write(self, endpoint, values):
+        """POST values in batches of MAX_WRITE_BATCH.
+
+        Returns {"success": [...], "failed": [...]} combined over all batches.
+        A batch rejected as a whole puts each of its values in "failed".
+        """
+        result = {"success": [], "failed": []}
+        for start in range(0, len(values), MAX_WRITE_BATCH):
+            batch = values[start:start + MAX_WRITE_BATCH]
+            try:
+                data = self._request(self.base_url + endpoint, json_body=batch)
+            except requests.RequestException as e:
+                result["failed"].extend({**v, "error": str(e)} for v in batch)
+                continue
+            result["success"].extend(data.get("success", []))
+            result["failed"].extend(data.get("failed", []))
+        return result
+
+    def update_attributes(self, values):
+        """Set attribute values. values: list of {"name", "date", "value"} dicts."""
+        return self._write("attributes/update/", values)
+
+    def increment_attributes(self, values):
+        """Add to attribute values. values: list of {"name", "date", "value"} dicts."""
+        return self._write("attributes/increment/", values)
+
+
+def client_from_config(config):
+    """An ExistClient for the token, api_url and json_backend in `config`."""
+    return ExistClient(
+        config["auth"]["token"],
+        base_url=config["sync"].get("api_url", BASE_URL),
+        json_backend=config["sync"].get("json_backend", "auto"),
+    )
@@ -1,29 +1,137 @@
-"""Click CLI: sync, export, and status subcommands."""
+"""Click CLI: sync, push, export, import, status, records, summary, search, migrate, maintain, snapshot, and api subcommands."""
 
-from datetime import date
+import time
+from datetime import date, timedelta
+from pathlib import Path
 
 import click
 
 from . import config as config_module
-from . import db, sync as sync_module
-from .export import export_date_range
+from . import db, importer, maintenance, metrics, planner, server, snapshot as snapshot_module, sync as sync_module
+from . import push as push_module, records as records_module, rollups, verify as verify_module
+from .export import run_export, watch_export
+from .fastjson import JSONBackendError
+from .formatting import format_value
+from .profiling import Profiler
+from .sinks import SinkError
+
+# Streaks listed by `status`; `records` shows everything
+STATUS_STREAKS = 5
+# Days summarized by `summary` when --from is not given
+SUMMARY_DAYS = 30
+# Value types whose averages are shown rounded to whole units
+WHOLE_UNIT_TYPES = (0, 3, 8)
 
 
 @click.group()
 @click.option("--config", "-c", "config_path", default=None, help="Path to config.toml")
+@click.option("--metrics-json", default=None, metavar="PATH",
+              help="Write timing/counter metrics as JSON when the command finishes ('-' for stdout)")
+@click.option("--prometheus-textfile", default=None, metavar="PATH",
+              help="Write metrics as a Prometheus textfile (node_exporter textfile collector)")
+@click.option("--profile", "profile_path", default=None, metavar="PATH",
+              help="Profile the command and write the result to PATH")
+@click.option("--profile-mode", type=click.Choice(["deterministic", "sampling"]), default="deterministic",
+              show_default=True, help="cProfile (pstats file) or stack sampling (speedscope JSON)")
+@click.option("--profile-interval", type=float, default=1.0, show_default=True,
+              help="Sampling interval in milliseconds")
+@click.option("--trace-alloc", is_flag=True, help="With --profile, also track allocations with tracemalloc")
 @click.pass_context
-def cli(ctx, config_path):
+def cli(ctx, config_path, metrics_json, prometheus_textfile, profile_path, profile_mode,
+        profile_interval, trace_alloc):
     """Exist.io backup and Obsidian export tool."""
     ctx.ensure_object(dict)
     ctx.obj["config"] = config_module.load_config(config_path)
 
+    metrics.reset()
+    if metrics_json:
+        ctx.call_on_close(lambda: metrics.write_json(metrics_json))
+    if prometheus_textfile:
+        ctx.call_on_close(lambda: metrics.write_prometheus(prometheus_textfile))
+
+    if profile_path:
+        profiler = Profiler(profile_path, profile_mode, profile_interval, trace_alloc,
+                            name=f"exist-backup {ctx.invoked_subcommand}")
+        profiler.start()
+        ctx.call_on_close(profiler.stop)
+
 
 @cli.command()
 @click.option("--full", is_flag=True, help="Force full historical sync")
+@click.option("--verify", is_flag=True,
+              help="Compare monthly checksums with Exist.io and re-sync only the blocks that differ")
+@click.option("--since", type=click.DateTime(formats=["%Y-%m-%d"]), default=None,
+              help="With --verify, only check from this date (YYYY-MM-DD)")
+@click.option("--until", type=click.DateTime(formats=["%Y-%m-%d"]), default=None,
+              help="With --verify, only check up to this date (YYYY-MM-DD), defaults to yesterday")
+@click.option("--plan", "show_plan", is_flag=True,
+              help="Show the strategy per attribute and the estimated requests and time, without fetching")
+@click.option("--today", is_flag=True,
+              help="Only refresh today's in-progress values (cheap enough to run every few minutes)")
 @click.pass_context
-def sync(ctx, full):
+def sync(ctx, full, verify, since, until, show_plan, today):
     """Sync data from Exist.io API to local database."""
-    result = sync_module.run_sync(ctx.obj["config"], full=full)
+    modes = [flag for flag, on in (("--plan", show_plan), ("--today", today), ("--verify", verify)) if on]
+    if len(modes) > 1:
+        raise click.UsageError(f"{' and '.join(modes)} cannot be combined")
+    if full and (today or verify):
+        raise click.UsageError(f"--full does not apply to {modes[0]}")
+    if (since or until) and not verify:
+        raise click.UsageError("--since and --until only apply to --verify")
+    if show_plan:
+        _print_plan(ctx.obj["config"], full)
+        return
+    try:
+        if today:
+            result = sync_module.run_today(ctx.obj["config"])
+        elif verify:
+            result = verify_module.run_verify(
+                ctx.obj["config"], since=since.date() if since else None, until=until.date() if until else None
+            )
+        else:
+            result = sync_module.run_sync(ctx.obj["config"], full=full)
+    except JSONBackendError as e:
+        raise click.ClickException(str(e))
+    if result["status"] == "error":
+        raise SystemExit(1)
+
+
+def _print_plan(config, full):
+    conn = db.connect_readonly(config["sync"]["database"], **db.connection_options(config["sync"]))
+    plan = planner.build_plan(conn, full=full, filters=db.sync_filters_from_config(config["sync"]))
+    cost = planner.estimate(conn, plan)
+    conn.close()
+
+    click.echo(f"Sync plan ({'full' if full else 'incremental'}) through {plan['date_max']}")
+    if plan["bulk_days"]:
+        click.echo(f"Bulk window:      {plan['bulk_days']} days")
+    for entry in plan["attributes"]:
+        if entry["strategy"] == planner.CURRENT:
+            continue
+        since = f"after {entry['since']}" if entry["since"] else "no stored values"
+        click.echo(f"  {entry['name']:<28} {entry['strategy']:<5} {entry['days']:>5} days  "
+                   f"{entry['requests']:>4} requests  ({since})")
+    current = sum(1 for e in plan["attributes"] if e["strategy"] == planner.CURRENT)
+    if current:
+        click.echo(f"  ({current} attributes up to date)")
+    click.echo("Requests:")
+    for endpoint, count in plan["requests"].items():
+        click.echo(f"  {endpoint:<28} {count}")
+    click.echo(f"Total requests:   {cost['requests']}")
+    basis = f"timings from {cost['history']} past syncs" if cost["history"] else "default timings"
+    click.echo(f"Estimated time:   {cost['seconds']:.0f}s ({cost['request_seconds']:.0f}s requests, "
+               f"{cost['throttle_seconds']:.0f}s rate limits; {basis})")
+
+
+@cli.command()
+@click.option("--dry-run", is_flag=True, help="List the changed values without sending them")
+@click.pass_context
+def push(ctx, dry_run):
+    """Send locally changed values of manual attributes to Exist.io."""
+    try:
+        result = push_module.run_push(ctx.obj["config"], dry_run=dry_run)
+    except JSONBackendError as e:
+        raise click.ClickException(str(e))
     if result["status"] == "error":
         raise SystemExit(1)
 
@@ -33,17 +141,94 @@ def sync(ctx, full):
               help="Start date (YYYY-MM-DD)")
 @click.option("--to", "date_to", type=click.DateTime(formats=["%Y-%m-%d"]), default=None,
               help="End date (YYYY-MM-DD), defaults to today")
+@click.option("--include-attribute", "include_attributes", multiple=True,
+              help="Only export this attribute (repeatable)")
+@click.option("--exclude-attribute", "exclude_attributes", multiple=True,
+              help="Never export this attribute (repeatable)")
+@click.option("--include-group", "include_groups", multiple=True,
+              help="Only export attributes in this group, e.g. sleep (repeatable)")
+@click.option("--exclude-group", "exclude_groups", multiple=True,
+              help="Never export attributes in this group (repeatable)")
+@click.option("--include-service", "include_services", multiple=True,
+              help="Only export attributes from this service, e.g. fitbit (repeatable)")
+@click.option("--exclude-service", "exclude_services", multiple=True,
+              help="Never export attributes from this service (repeatable)")
+@click.option("--sink", "sink_names", multiple=True,
+              help="Output to write: markdown, csv, json or module:Class (repeatable, overrides [export] sinks)")
+@click.option("--watch", is_flag=True,
+              help="After exporting, keep re-rendering the notes of days that change in the database")
+@click.option("--interval", type=float, default=1.0, show_default=True,
+              help="With --watch, seconds between checks for database changes")
 @click.pass_context
-def export(ctx, date_from, date_to):
-    """Export data as Obsidian markdown files."""
+def export(ctx, date_from, date_to, sink_names, watch, interval, **filters):
+    """Export data as Obsidian markdown files (and other configured sinks).
+
+    Filter flags replace the matching include_*/exclude_* keys from [export].
+    With --watch and no --to, days after today are followed as they arrive.
+    """
+    config = ctx.obj["config"]
+    overrides = {key: list(names) for key, names in filters.items() if names}
+    if overrides:
+        config = {**config, "export": {**config["export"], **overrides}}
+
+    explicit_to = date_to is not None
     if date_to is None:
         date_to = date.today()
     else:
         date_to = date_to.date()
 
     date_from = date_from.date()
-    count = export_date_range(ctx.obj["config"], date_from, date_to)
-    click.echo(f"Exported {count} daily notes.")
+    if watch:
+        # Changes committed while the initial export runs are picked up by the watcher
+        conn = db.connect_readonly(config["sync"]["database"], **db.connection_options(config["sync"]))
+        since_seq = db.get_change_seq(conn)
+        conn.close()
+    try:
+        results = run_export(config, date_from, date_to, sink_names)
+    except SinkError as e:
+        raise click.ClickException(str(e))
+    for name, count in results.items():
+        if name == "markdown":
+            click.echo(f"Exported {count} daily notes.")
+        else:
+            click.echo(f"Exported {count} days to {name}.")
+
+    if watch:
+        try:
+            watch_export(config, date_from, date_to if explicit_to else None, interval, since_seq=since_seq)
+        except KeyboardInterrupt:
+            pass
+
+
+@cli.command("import")
+@click.argument("archive", type=click.Path(exists=True, dir_okay=False, path_type=Path))
+@click.option("--batch-size", default=importer.DEFAULT_BATCH_SIZE, show_default=True,
+              help="Values written per transaction")
+@click.pass_context
+def import_(ctx, archive, batch_size):
+    """Load an Exist.io CSV data export (zip or .csv) into the database."""
+    config = ctx.obj["config"]
+    conn = db.connect(config["sync"]["database"], **db.connection_options(config["sync"]))
+    db.init_db(conn)
+    start = time.perf_counter()
+    report = importer.import_archive(conn, archive, batch_size=batch_size)
+    records_module.rebuild(conn, config.get("records", {}).get("goals", {}))
+    elapsed = time.perf_counter() - start
+    conn.close()
+
+    click.echo(
+        f"Imported {report['values']:,} values for {report['attributes']} attributes "
+        f"from {report['files']} files in {elapsed:.1f}s."
+    )
+    if report["skipped"]:
+        click.echo(f"Skipped {report['skipped']:,} empty or invalid cells.")
+    if report["placeholders"]:
+        click.echo(
+            f"Added placeholder metadata for {report['placeholders']} attributes; "
+            "the next sync replaces it."
+        )
+    if report["watermark"]:
+        click.echo(f"Latest imported date: {report['watermark']}. Run `exist-backup sync` to catch up.")
 
 
 @cli.command()
@@ -51,9 +236,9 @@ def export(ctx, date_from, date_to):
 def status(ctx):
     """Show last sync time, total attributes, total values, date range covered."""
     config = ctx.obj["config"]
-    conn = db.connect(config["sync"]["database"])
-    db.init_db(conn)
+    conn = db.connect_readonly(config["sync"]["database"], **db.connection_options(config["sync"]))
     stats = db.get_sync_status(conn)
+    all_records = records_module.get_records(conn)
     conn.close()
 
     click.echo(f"Last sync:        {stats['last_sync'] or 'never'}")
@@ -63,3 +248,261 @@ def status(ctx):
         click.echo(f"Date range:       {stats['date_min']} to {stats['date_max']}")
     else:
         click.echo("Date range:       (no data)")
+
+    streaks = sorted(
+        (r for r in all_records.values() if r["longest_streak"]),
+        key=lambda r: -r["longest_streak"],
+    )[:STATUS_STREAKS]
+    if streaks:
+        click.echo("Longest streaks:")
+        for record in streaks:
+            current = f", current {record['current_streak']}" if record["current_streak"] else ""
+            click.echo(
+                f"  {record['label']:<20} {record['longest_streak']} days "
+                f"({record['longest_streak_start']} to {record['longest_streak_end']}){current}"
+            )
+
+
+@cli.command()
+@click.option("--rebuild", is_flag=True, help="Recompute all records from the full history first")
+@click.pass_context
+def records(ctx, rebuild):
+    """Show personal records (highs, lows) and streaks for every attribute."""
+    config = ctx.obj["config"]
+    db_path = config["sync"]["database"]
+    options = db.connection_options(config["sync"])
+    if rebuild:
+        conn = db.connect(db_path, **options)
+        db.init_db(conn)
+        count = records_module.rebuild(conn, config.get("records", {}).get("goals", {}))
+        conn.close()
+        click.echo(f"Rebuilt records for {count} attributes.", err=True)
+
+    conn = db.connect_readonly(db_path, **options)
+    profile = db.get_profile(conn)
+    all_records = records_module.get_records(conn)
+    conn.close()
+
+    for record in all_records.values():
+        parts = []
+        if record["max_date"]:
+            high = format_value(record["max_value"], record["value_type"], profile)
+            low = format_value(record["min_value"], record["value_type"], profile)
+            parts.append(f"high {high} ({record['max_date']}), low {low} ({record['min_date']})")
+        if record["longest_streak"]:
+            parts.append(
+                f"longest streak {record['longest_streak']} days from {record['longest_streak_start']}, "
+                f"current {record['current_streak']}"
+            )
+        if parts:
+            click.echo(f"{record['label']}: {'; '.join(parts)}")
+
+
+@cli.command()
+@click.option("--from", "date_from", type=click.DateTime(formats=["%Y-%m-%d"]), default=None,
+              help=f"Start date (YYYY-MM-DD), defaults to {SUMMARY_DAYS} days before --to")
+@click.option("--to", "date_to", type=click.DateTime(formats=["%Y-%m-%d"]), default=None,
+              help="End date (YYYY-MM-DD), defaults to yesterday")
+@click.option("--attribute", "include_attributes", multiple=True, help="Only this attribute (repeatable)")
+@click.option("--group", "include_groups", multiple=True, help="Only attributes in this group (repeatable)")
+@click.option("--rebuild", is_flag=True, help="Recompute all rollups from the stored values first")
+@click.option("--verify", is_flag=True, help="Check the rollups against a full recomputation instead")
+@click.pass_context
+def summary(ctx, date_from, date_to, rebuild, verify, **filters):
+    """Averages, lows and highs of numeric attributes over a date range, read from the rollup tables."""
+    config = ctx.obj["config"]
+    db_path = config["sync"]["database"]
+    options = db.connection_options(config["sync"])
+    if rebuild:
+        conn = db.connect(db_path, **options)
+        db.init_db(conn)
+        count = db.rebuild_rollups(conn)
+        conn.close()
+        click.echo(f"Rebuilt {count} rollup rows.", err=True)
+
+    conn = db.connect_readonly(db_path, **options)
+    if verify:
+        mismatches = rollups.verify(conn)
+        conn.close()
+        for m in mismatches:
+            click.echo(f"{m['name']} {m['period']} from {m['start']}: stored {m['stored']}, expected {m['expected']}")
+        if mismatches:
+            click.echo(f"{len(mismatches)} rollup rows differ from a full recomputation "
+                       "(run `summary --rebuild` to fix).", err=True)
+            raise SystemExit(1)
+        click.echo("Rollups match a full recomputation.", err=True)
+        return
+
+    date_to = date_to.date() if date_to else date.today() - timedelta(days=1)
+    date_from = date_from.date() if date_from else date_to - timedelta(days=SUMMARY_DAYS - 1)
+    profile = db.get_profile(conn)
+    stats = rollups.summarize(conn, date_from, date_to, {key: list(v) for key, v in filters.items() if v})
+    conn.close()
+
+    click.echo(f"Summary {date_from} to {date_to}")
+    for stat in stats.values():
+        value_type = stat["value_type"]
+        if value_type == records_module.BOOLEAN_TYPE:
+            click.echo(f"  {stat['label']:<24} yes on {int(stat['sum'])} of {stat['count']} days ({stat['mean']:.0%})")
+            continue
+        mean = round(stat["mean"]) if value_type in WHOLE_UNIT_TYPES else stat["mean"]
+        avg, low, high = (format_value(v, value_type, profile) for v in (mean, stat["min"], stat["max"]))
+        click.echo(f"  {stat['label']:<24} avg {avg}, low {low}, high {high} ({stat['count']} days)")
+
+
+@cli.command()
+@click.argument("query")
+@click.option("--limit", default=20, show_default=True, help="Maximum number of results")
+@click.option("--reindex", is_flag=True, help="Rebuild the full-text index before searching")
+@click.pass_context
+def search(ctx, query, limit, reindex):
+    """Full-text search over text attributes (notes, locations, ...)."""
+    config = ctx.obj["config"]
+    db_path = config["sync"]["database"]
+    options = db.connection_options(config["sync"])
+    if reindex:
+        conn = db.connect(db_path, **options)
+        db.init_db(conn)
+        count = db.rebuild_search_index(conn)
+        conn.close()
+        click.echo(f"Indexed {count} text values.", err=True)
+    conn = db.connect_readonly(db_path, **options)
+
+    start = time.perf_counter()
+    rows = db.search_values(conn, query, limit=limit)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    conn.close()
+
+    for row in rows:
+        click.echo(f"{row['date']}  {row['label']}: {row['snippet']}")
+    click.echo(f"{len(rows)} results in {elapsed_ms:.1f} ms", err=True)
+
+
+@cli.command()
+@click.pass_context
+def migrate(ctx):
+    """Convert the database to the compact storage layout and report savings."""
+    config = ctx.obj["config"]
+    conn = db.connect(config["sync"]["database"], **db.connection_options(config["sync"]))
+    report = db.migrate_to_compact(conn)
+    db.init_db(conn)
+    conn.close()
+
+    if report is None:
+        click.echo("Database already uses the compact storage layout.")
+        return
+
+    before, after = report["before"], report["after"]
+    click.echo(f"Migrated {report['rows']} values.")
+    click.echo(f"Size on disk:           {before['size_bytes']:,} -> {after['size_bytes']:,} bytes")
+    click.echo(f"365-day range query:    {before['range_query_ms']} -> {after['range_query_ms']} ms")
+    click.echo(
+        f"Single attribute range: {before['attribute_range_query_ms']} -> {after['attribute_range_query_ms']} ms"
+    )
+
+
+@cli.command()
+@click.option("--full-vacuum", is_flag=True,
+              help="Rebuild the whole file with VACUUM (also enables incremental vacuum on older databases)")
+@click.option("--analyze", is_flag=True, help="Run a full ANALYZE instead of PRAGMA optimize")
+@click.pass_context
+def maintain(ctx, full_vacuum, analyze):
+    """Checkpoint the WAL, refresh statistics, vacuum, and report query plans."""
+    config = ctx.obj["config"]
+    db_path = config["sync"]["database"]
+    conn = db.connect(db_path, **db.connection_options(config["sync"]))
+    db.init_db(conn)
+    report = maintenance.maintain(conn, db_path, full_vacuum=full_vacuum, analyze=analyze)
+    conn.close()
+
+    before, after = report["before"], report["after"]
+    click.echo(f"Steps:            {', '.join(report['steps'])}")
+    click.echo(f"Database:         {before['db_bytes']:,} -> {after['db_bytes']:,} bytes")
+    click.echo(f"WAL:              {before['wal_bytes']:,} -> {after['wal_bytes']:,} bytes")
+    click.echo(f"Free pages:       {before['freelist_pages']} -> {after['freelist_pages']}")
+    click.echo(f"Reclaimed:        {report['reclaimed_bytes']:,} bytes")
+    if report["auto_vacuum"] != "incremental":
+        click.echo("Incremental vacuum is off for this database; run once with --full-vacuum to enable it.")
+    if report["checkpoint"]["busy"]:
+        click.echo("WAL checkpoint was blocked by another connection; the WAL was not truncated.")
+    for query in report["queries"]:
+        flag = "  FULL SCAN" if query["full_scan"] else ""
+        click.echo(f"{query['name']:<17} {query['ms']:>8.2f} ms{flag}")
+        for step in query["plan"]:
+            click.echo(f"    {step}")
+
+
+@cli.group()
+def snapshot():
+    """Online, deduplicated, compressed backups of the database."""
+
+
+@snapshot.command("create")
+@click.pass_context
+def snapshot_create(ctx):
+    """Take a snapshot now (and prune beyond [snapshot] keep)."""
+    snapshot_module.create_snapshot(ctx.obj["config"])
+
+
+@snapshot.command("list")
+@click.pass_context
+def snapshot_list(ctx):
+    """List stored snapshots, oldest first."""
+    store = snapshot_module.get_store(ctx.obj["config"])
+    for manifest in store.list_snapshots():
+        click.echo(
+            f"{manifest['id']}  {manifest['size']:>12,} bytes  "
+            f"{len(manifest['chunks'])} chunks ({manifest['new_chunks']} new)"
+        )
+
+
+@snapshot.command("verify")
+@click.argument("snapshot_id", required=False)
+@click.pass_context
+def snapshot_verify(ctx, snapshot_id):
+    """Verify a snapshot (default: newest) can be restored intact."""
+    store = snapshot_module.get_store(ctx.obj["config"])
+    try:
+        manifest = store.verify(snapshot_id)
+    except snapshot_module.SnapshotError as e:
+        raise click.ClickException(str(e))
+    click.echo(f"Snapshot {manifest['id']} OK")
+
+
+@snapshot.command("restore")
+@click.argument("snapshot_id", required=False)
+@click.option("--to", "target", default=None, help="Restore to this path instead of the configured database")
+@click.option("--yes", is_flag=True, help="Overwrite the target without asking")
+@click.pass_context
+def snapshot_restore(ctx, snapshot_id, target, yes):
+    """Restore a snapshot (default: newest) over the database."""
+    config = ctx.obj["config"]
+    target = target or config["sync"]["database"]
+    store = snapshot_module.get_store(config)
+    if Path(target).exists() and not yes:
+        click.confirm(f"Overwrite {target}?", abort=True)
+    try:
+        manifest = store.restore(snapshot_id, target)
+    except snapshot_module.SnapshotError as e:
+        raise click.ClickException(str(e))
+    click.echo(f"Restored snapshot {manifest['id']} to {target}")
+
+
+@snapshot.command("prune")
+@click.option("--keep", type=int, default=None, help="Snapshots to keep (default from [snapshot] keep)")
+@click.pass_context
+def snapshot_prune(ctx, keep):
+    """Delete old snapshots and unreferenced chunks."""
+    config = ctx.obj["config"]
+    keep = keep if keep is not None else int(config["snapshot"]["keep"])
+    snapshots_removed, chunks_removed = snapshot_module.get_store(config).prune(keep)
+    click.echo(f"Removed {snapshots_removed} snapshots and {chunks_removed} chunks.")
+
+
+@cli.command()
+@click.option("--host", default=None, help="Interface to bind (default from [api] config)")
+@click.option("--port", type=int, default=None, help="Port to listen on (default from [api] config)")
+@click.pass_context
+def api(ctx, host, port):
+    """Serve a read-only JSON query API over the local database."""
+    server.serve(ctx.obj["config"], host=host, port=port)
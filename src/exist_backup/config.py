@@ -7,8 +7,19 @@ from pathlib import Path
 
 DEFAULT_CONFIG = {
     "auth": {"token": ""},
-    "sync": {"database": "/data/exist.db"},
+    "sync": {
+        "database": "/data/exist.db",
+        "api_url": "https://exist.io/api/2/",
+        "busy_timeout_ms": 5000,
+        "mmap_mb": 256,
+        "json_backend": "auto",
+    },
     "export": {"output_dir": "/export", "template": "daily"},
+    "api": {"host": "127.0.0.1", "port": 8765, "cache_size": 256, "pool_size": 4},
+    "snapshot": {"dir": "/data/snapshots", "keep": 14, "chunk_kb": 64},
+    "maintenance": {"auto": False, "wal_mb": 64, "freelist_pct": 10},
+    "records": {"goals": {}},
+    "push": {"increment": []},
 }
 
 
@@ -25,12 +36,12 @@ def load_config(config_path=None):
 
     config_path = Path(config_path)
 
-    config = dict(DEFAULT_CONFIG)
+    config = {section: dict(values) for section, values in DEFAULT_CONFIG.items()}
     if config_path.exists():
         with open(config_path, "rb") as f:
             file_config = tomllib.load(f)
         # Merge sections
-        for section in ("auth", "sync", "export"):
+        for section in DEFAULT_CONFIG:
             if section in file_config:
                 config[section] = {**DEFAULT_CONFIG.get(section, {}), **file_config[section]}
 
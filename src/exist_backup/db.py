@@ -1,10 +1,17 @@
 """SQLite database schema and query helpers."""
 
 import json
+import queue
 import sqlite3
-from datetime import UTC, datetime
+import sys
+import time
+from contextlib import contextmanager
+from datetime import UTC, date, datetime, timedelta
 from pathlib import Path
 
+from . import metrics
+from .profiling import hot_path
+
 SCHEMA = """
 CREATE TABLE IF NOT EXISTS user_profile (
     username TEXT PRIMARY KEY,
@@ -29,14 +36,6 @@ CREATE TABLE IF NOT EXISTS attributes (
     updated_at TEXT NOT NULL
 );
 
-CREATE TABLE IF NOT EXISTS attribute_values (
-    attribute_name TEXT NOT NULL,
-    date TEXT NOT NULL,
-    value TEXT,
-    PRIMARY KEY (attribute_name, date),
-    FOREIGN KEY (attribute_name) REFERENCES attributes(name)
-);
-
 CREATE TABLE IF NOT EXISTS sync_log (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     timestamp TEXT NOT NULL,
@@ -46,25 +45,655 @@ CREATE TABLE IF NOT EXISTS sync_log (
     status TEXT NOT NULL,
     error_message TEXT
 );
+
+CREATE TABLE IF NOT EXISTS sync_metrics (
+    sync_id INTEGER NOT NULL REFERENCES sync_log(id),
+    name TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    seconds REAL,
+    PRIMARY KEY (sync_id, name)
+);
+"""
+
+# Values are keyed by integer attribute id and day number (days since
+# 1970-01-01) in a WITHOUT ROWID table. Numeric values are stored as
+# INTEGER/REAL; anything that wouldn't round-trip exactly stays TEXT.
+VALUES_SCHEMA = """
+CREATE TABLE IF NOT EXISTS attribute_ids (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS attribute_data (
+    attribute_id INTEGER NOT NULL REFERENCES attribute_ids(id),
+    day INTEGER NOT NULL,
+    value,
+    PRIMARY KEY (attribute_id, day)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS attribute_data_day ON attribute_data (day);
+
+-- Day number -> ISO date lookup, cheaper than date() per row on large scans
+CREATE TABLE IF NOT EXISTS calendar (
+    day INTEGER PRIMARY KEY,
+    date TEXT NOT NULL
+);
+"""
+
+# Compatibility view with the original (attribute_name, date, value TEXT)
+# shape, writable through an INSTEAD OF trigger.
+VALUES_VIEW = """
+CREATE VIEW IF NOT EXISTS attribute_values AS
+SELECT n.name AS attribute_name, k.date AS date, CAST(d.value AS TEXT) AS value
+FROM attribute_data d
+JOIN attribute_ids n ON n.id = d.attribute_id
+JOIN calendar k ON k.day = d.day;
+
+CREATE TRIGGER IF NOT EXISTS attribute_values_insert INSTEAD OF INSERT ON attribute_values
+BEGIN
+    INSERT INTO attribute_ids (name) SELECT NEW.attribute_name
+    WHERE NOT EXISTS (SELECT 1 FROM attribute_ids WHERE name = NEW.attribute_name);
+    INSERT OR REPLACE INTO calendar (day, date)
+    VALUES (CAST(julianday(NEW.date) - 2440587.5 AS INTEGER), date(NEW.date));
+    INSERT OR REPLACE INTO attribute_data (attribute_id, day, value)
+    VALUES (
+        (SELECT id FROM attribute_ids WHERE name = NEW.attribute_name),
+        CAST(julianday(NEW.date) - 2440587.5 AS INTEGER),
+        {native_value}
+    );
+    INSERT OR REPLACE INTO day_changes (day, seq)
+    VALUES (
+        CAST(julianday(NEW.date) - 2440587.5 AS INTEGER),
+        (SELECT coalesce(max(seq), 0) + 1 FROM day_changes)
+    );
+{rollups}
+END;
 """
 
+# Full-text index over string-typed (value_type 2) values, kept in step with
+# attribute_data by triggers. The FTS rowid is derived from (day, attribute_id).
+SEARCH_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS value_search USING fts5(
+    value,
+    attribute_name UNINDEXED,
+    date UNINDEXED,
+    tokenize = 'unicode61 remove_diacritics 2'
+);
+
+CREATE TRIGGER IF NOT EXISTS value_search_insert AFTER INSERT ON attribute_data
+WHEN NEW.value IS NOT NULL
+    AND (SELECT a.value_type FROM attributes a JOIN attribute_ids n ON n.name = a.name
+         WHERE n.id = NEW.attribute_id) = 2
+BEGIN
+    INSERT INTO value_search (rowid, value, attribute_name, date)
+    VALUES (
+        NEW.day * 1048576 + NEW.attribute_id,
+        NEW.value,
+        (SELECT name FROM attribute_ids WHERE id = NEW.attribute_id),
+        date(NEW.day * 86400, 'unixepoch')
+    );
+END;
+
+CREATE TRIGGER IF NOT EXISTS value_search_delete AFTER DELETE ON attribute_data
+BEGIN
+    DELETE FROM value_search WHERE rowid = OLD.day * 1048576 + OLD.attribute_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS value_search_update AFTER UPDATE ON attribute_data
+BEGIN
+    DELETE FROM value_search WHERE rowid = OLD.day * 1048576 + OLD.attribute_id;
+    INSERT INTO value_search (rowid, value, attribute_name, date)
+    SELECT NEW.day * 1048576 + NEW.attribute_id, NEW.value, n.name, date(NEW.day * 86400, 'unixepoch')
+    FROM attribute_ids n JOIN attributes a ON a.name = n.name
+    WHERE n.id = NEW.attribute_id AND a.value_type = 2 AND NEW.value IS NOT NULL;
+END;
+"""
+
+# Per-attribute personal records and streaks, maintained by records.py.
+# processed_day is the last day folded in; days are day numbers like attribute_data.
+RECORDS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS attribute_records (
+    attribute_id INTEGER PRIMARY KEY REFERENCES attribute_ids(id),
+    goal REAL,
+    processed_day INTEGER NOT NULL,
+    max_value, max_day INTEGER,
+    min_value, min_day INTEGER,
+    current_streak INTEGER NOT NULL DEFAULT 0,
+    current_streak_start INTEGER,
+    longest_streak INTEGER NOT NULL DEFAULT 0,
+    longest_streak_start INTEGER,
+    last_hit_day INTEGER
+);
+"""
+
+# Last value of each manual attribute known to be on Exist.io (from sync or a
+# successful push). Local values that differ are what `push` sends.
+MANUAL_SYNC_SCHEMA = """
+CREATE TABLE IF NOT EXISTS manual_sync_state (
+    attribute_id INTEGER NOT NULL,
+    day INTEGER NOT NULL,
+    value,
+    synced_at TEXT NOT NULL,
+    last_error TEXT,
+    PRIMARY KEY (attribute_id, day)
+) WITHOUT ROWID;
+"""
+
+# Days whose values changed, stamped with an increasing sequence number by
+# the write paths (write_value_rows, mark_days_changed, the attribute_values
+# view trigger), so `export --watch` can find what to re-render without
+# rescanning. One row per day: a later change re-stamps it. Stamping once
+# per batch rather than per row from an attribute_data trigger keeps bulk
+# imports fast.
+CHANGES_SCHEMA = """
+CREATE TABLE IF NOT EXISTS day_changes (
+    day INTEGER PRIMARY KEY,
+    seq INTEGER NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS day_changes_seq ON day_changes (seq);
+"""
 
-def connect(db_path):
-    """Open a connection to the SQLite database."""
+# Days written by `sync --today` while still in progress. They don't count
+# towards an attribute's watermark until a regular sync has fetched them
+# complete, so that sync still picks up their final values.
+PARTIAL_DAYS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS partial_days (
+    day INTEGER PRIMARY KEY
+);
+"""
+
+# Per-attribute aggregates of numeric values by week (Monday start), month and
+# year, keyed by the period's first day number. The write paths refresh the
+# periods a batch touched (refresh_rollups, the attribute_values view
+# trigger): weeks and months from attribute_data, years from their months.
+ROLLUPS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS attribute_rollups (
+    attribute_id INTEGER NOT NULL,
+    period TEXT NOT NULL,
+    start_day INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    sum REAL NOT NULL,
+    min NOT NULL,
+    max NOT NULL,
+    sum_sq REAL NOT NULL,
+    PRIMARY KEY (attribute_id, period, start_day)
+) WITHOUT ROWID;
+"""
+
+ROLLUP_PERIODS = ("week", "month", "year")
+# Integer, float, duration, percentage, boolean, scale; times of day wrap at midnight and text has no sum
+ROLLUP_TYPES = (0, 1, 3, 5, 7, 8)
+
+# Bumped whenever init_db creates something new, so read-only openers know to run it first
+SCHEMA_VERSION = 6
+
+DEFAULT_BUSY_TIMEOUT_MS = 5000
+DEFAULT_MMAP_MB = 256
+
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+# Shared FROM clause / columns for reading values back in their original shape
+_VALUES_FROM = (
+    "attribute_data d JOIN attribute_ids n ON n.id = d.attribute_id JOIN calendar k ON k.day = d.day"
+)
+_DATE_COLUMN = "k.date"
+
+
+def native_value(expr):
+    """SQL expression storing expr as INTEGER/REAL when that round-trips to the same text."""
+    return (
+        f"CASE WHEN CAST(CAST({expr} AS INTEGER) AS TEXT) = {expr} THEN CAST({expr} AS INTEGER) "
+        f"WHEN CAST(CAST({expr} AS REAL) AS TEXT) = {expr} THEN CAST({expr} AS REAL) "
+        f"ELSE {expr} END"
+    )
+
+
+def date_to_day(value):
+    """Convert an ISO date string (or date) to a day number."""
+    return date.fromisoformat(str(value)).toordinal() - EPOCH_ORDINAL
+
+
+def day_to_date(day):
+    """Convert a day number back to an ISO date string."""
+    return date.fromordinal(day + EPOCH_ORDINAL).isoformat()
+
+
+def period_bounds(day, period):
+    """(first, last) day numbers of the week (Monday to Sunday), month or year containing a day."""
+    if period == "week":
+        # Day 0 (1970-01-01) was a Thursday
+        first = day - (day + 3) % 7
+        return first, first + 6
+    value = date.fromordinal(day + EPOCH_ORDINAL)
+    if period == "month":
+        first = value.replace(day=1)
+        last = (first + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+    else:
+        first, last = value.replace(month=1, day=1), value.replace(month=12, day=31)
+    return first.toordinal() - EPOCH_ORDINAL, last.toordinal() - EPOCH_ORDINAL
+
+
+def _period_start_sql(day, period):
+    """SQL for period_bounds(day, period)[0]."""
+    if period == "week":
+        return f"(({day}) - (({day}) + 3) % 7)"
+    return f"CAST(julianday(({day}) * 86400, 'unixepoch', 'start of {period}') - 2440587.5 AS INTEGER)"
+
+
+def _period_end_sql(day, period):
+    """SQL for period_bounds(day, period)[1]."""
+    if period == "week":
+        return f"(({day}) - (({day}) + 3) % 7 + 6)"
+    return (f"CAST(julianday(({day}) * 86400, 'unixepoch', 'start of {period}', '+1 {period}', '-1 day') "
+            "- 2440587.5 AS INTEGER)")
+
+
+_NUMERIC_ATTRIBUTE_IDS = (
+    "SELECT n.id FROM attribute_ids n JOIN attributes a ON a.name = n.name "
+    f"WHERE a.value_type IN ({', '.join(map(str, ROLLUP_TYPES))})"
+)
+
+
+def _rollup_refresh_sql(period, attribute_id, start, end):
+    """DELETE and INSERT statements recomputing an attribute's rollups of the periods in [start, end].
+
+    start and end must be period boundaries. Weeks and months are grouped
+    from attribute_data, years from their month rows, so months must be
+    refreshed first.
+    """
+    delete = (f"DELETE FROM attribute_rollups WHERE attribute_id = {attribute_id} "
+              f"AND period = '{period}' AND start_day BETWEEN {start} AND {end}")
+    insert = "INSERT INTO attribute_rollups (attribute_id, period, start_day, count, sum, min, max, sum_sq) "
+    if period == "year":
+        insert += (f"SELECT attribute_id, 'year', {_period_start_sql('start_day', period)} AS year_start, "
+                   "sum(count), sum(sum), min(min), max(max), sum(sum_sq) FROM attribute_rollups "
+                   f"WHERE attribute_id = {attribute_id} AND period = 'month' "
+                   f"AND start_day BETWEEN {start} AND {end} GROUP BY year_start")
+    else:
+        insert += (f"SELECT attribute_id, '{period}', {_period_start_sql('day', period)} AS period_start, "
+                   "count(*), sum(value), min(value), max(value), sum(value * value) FROM attribute_data "
+                   f"WHERE attribute_id = {attribute_id} AND day BETWEEN {start} AND {end} "
+                   f"AND typeof(value) IN ('integer', 'real') AND attribute_id IN ({_NUMERIC_ATTRIBUTE_IDS}) "
+                   "GROUP BY period_start")
+    return delete, insert
+
+
+def _rollup_trigger_sql():
+    """Statements for the attribute_values view trigger refreshing the new value's periods."""
+    attribute_id = "(SELECT id FROM attribute_ids WHERE name = NEW.attribute_name)"
+    day = "CAST(julianday(NEW.date) - 2440587.5 AS INTEGER)"
+    statements = []
+    for period in ROLLUP_PERIODS:
+        statements.extend(_rollup_refresh_sql(
+            period, attribute_id, _period_start_sql(day, period), _period_end_sql(day, period)
+        ))
+    return "".join(f"    {statement};\n" for statement in statements)
+
+
+def connection_options(sync_config):
+    """Connection tuning from the [sync] config section, as connect()/connect_readonly() keyword args."""
+    return {
+        "busy_timeout_ms": int(sync_config.get("busy_timeout_ms", DEFAULT_BUSY_TIMEOUT_MS)),
+        "mmap_mb": int(sync_config.get("mmap_mb", DEFAULT_MMAP_MB)),
+    }
+
+
+def connect(db_path, check_same_thread=True, busy_timeout_ms=DEFAULT_BUSY_TIMEOUT_MS, mmap_mb=0):
+    """Open a read-write connection to the SQLite database."""
     Path(db_path).parent.mkdir(parents=True, exist_ok=True)
-    conn = sqlite3.connect(db_path)
+    conn = sqlite3.connect(db_path, check_same_thread=check_same_thread, timeout=busy_timeout_ms / 1000)
     conn.row_factory = sqlite3.Row
+    if mmap_mb:
+        conn.execute(f"PRAGMA mmap_size={int(mmap_mb) * 1024 * 1024}")
+    # Only takes effect for new databases (or at the next VACUUM), so must precede WAL setup
+    conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
     conn.execute("PRAGMA journal_mode=WAL")
     conn.execute("PRAGMA foreign_keys=ON")
+    # INSERT OR REPLACE must fire the delete trigger that keeps value_search in sync
+    conn.execute("PRAGMA recursive_triggers=ON")
+    return conn
+
+
+def connect_readonly(db_path, check_same_thread=True, busy_timeout_ms=DEFAULT_BUSY_TIMEOUT_MS,
+                     mmap_mb=DEFAULT_MMAP_MB):
+    """Open a read-only connection for export, status and the query API.
+
+    The file is opened with mode=ro and query_only, so it can never take a
+    write lock; under WAL it reads a consistent snapshot while a sync
+    commits. Range scans go through mmap_size bytes of memory-mapped I/O.
+    A missing or outdated database is created/upgraded first with a
+    regular connection.
+    """
+    if not Path(db_path).exists() or _schema_version(db_path, busy_timeout_ms) < SCHEMA_VERSION:
+        conn = connect(db_path, busy_timeout_ms=busy_timeout_ms)
+        init_db(conn)
+        conn.close()
+    conn = sqlite3.connect(
+        f"{Path(db_path).resolve().as_uri()}?mode=ro",
+        uri=True,
+        check_same_thread=check_same_thread,
+        timeout=busy_timeout_ms / 1000,
+    )
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA query_only=ON")
+    if mmap_mb:
+        conn.execute(f"PRAGMA mmap_size={int(mmap_mb) * 1024 * 1024}")
     return conn
 
 
+def _schema_version(db_path, busy_timeout_ms):
+    conn = sqlite3.connect(
+        f"{Path(db_path).resolve().as_uri()}?mode=ro", uri=True, timeout=busy_timeout_ms / 1000
+    )
+    try:
+        return conn.execute("PRAGMA user_version").fetchone()[0]
+    finally:
+        conn.close()
+
+
+class ReadPool:
+    """A small pool of read-only connections shared between threads."""
+
+    def __init__(self, db_path, size=4, **options):
+        self.db_path = db_path
+        self.size = size
+        self.options = options
+        self._idle = queue.LifoQueue()
+        self._slots = queue.Queue()
+        for _ in range(size):
+            self._slots.put(None)
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection, blocking while all `size` are in use."""
+        self._slots.get()
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            try:
+                conn = connect_readonly(self.db_path, check_same_thread=False, **self.options)
+            except BaseException:
+                self._slots.put(None)
+                raise
+        try:
+            yield conn
+        finally:
+            self._idle.put(conn)
+            self._slots.put(None)
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
 def init_db(conn):
-    """Create tables if they don't exist."""
+    """Create tables if they don't exist.
+
+    Databases using the original text-keyed attribute_values table are
+    migrated to the compact layout, and the full-text index is back-filled
+    the first time it is created.
+    """
     conn.executescript(SCHEMA)
+    report = migrate_to_compact(conn)
+    conn.executescript(VALUES_SCHEMA)
+    had_changes = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'day_changes'").fetchone()
+    conn.executescript(CHANGES_SCHEMA)
+    had_rollups = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'attribute_rollups'").fetchone()
+    conn.executescript(ROLLUPS_SCHEMA)
+    if not had_changes or not had_rollups:
+        # Older view triggers don't stamp day_changes or refresh rollups
+        conn.execute("DROP TRIGGER IF EXISTS attribute_values_insert")
+    if report:
+        print(
+            "Migrated database to compact storage: "
+            f"{report['before']['size_bytes']:,} -> {report['after']['size_bytes']:,} bytes",
+            file=sys.stderr,
+        )
+    conn.executescript(VALUES_VIEW.format(native_value=native_value("NEW.value"), rollups=_rollup_trigger_sql()))
+    if not had_rollups:
+        rebuild_rollups(conn)
+
+    had_search = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE name = 'value_search'"
+    ).fetchone()
+    conn.executescript(SEARCH_SCHEMA)
+    if not had_search:
+        rebuild_search_index(conn)
+    conn.executescript(RECORDS_SCHEMA)
+
+    had_manual_state = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE name = 'manual_sync_state'"
+    ).fetchone()
+    conn.executescript(MANUAL_SYNC_SCHEMA)
+    if not had_manual_state:
+        # Everything stored so far came from Exist.io, so it is the baseline for push
+        conn.execute(
+            """INSERT INTO manual_sync_state (attribute_id, day, value, synced_at)
+            SELECT d.attribute_id, d.day, d.value, ? FROM attribute_data d
+            JOIN attribute_ids n ON n.id = d.attribute_id
+            JOIN attributes a ON a.name = n.name WHERE a.manual = 1""",
+            (datetime.now(UTC).isoformat(),),
+        )
+    conn.executescript(PARTIAL_DAYS_SCHEMA)
+    conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+    conn.commit()
+
+
+def database_size(conn):
+    """Size of the main database file in bytes (excluding the WAL)."""
+    page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    return page_count * page_size
+
+
+def _has_legacy_values(conn):
+    row = conn.execute("SELECT type FROM sqlite_master WHERE name = 'attribute_values'").fetchone()
+    return row is not None and row[0] == "table"
+
+
+def _time_range_queries(conn, legacy, days=365):
+    """Best-of-3 milliseconds for range queries over the last `days` days of data.
+
+    Times one query across all attributes and one for a single attribute.
+    """
+    if legacy:
+        row = conn.execute("SELECT MAX(date), MIN(attribute_name) FROM attribute_values").fetchone()
+    else:
+        row = conn.execute(
+            "SELECT (SELECT date FROM calendar WHERE day = (SELECT MAX(day) FROM attribute_data)), "
+            "(SELECT MIN(name) FROM attribute_ids)"
+        ).fetchone()
+    max_date, attribute_name = row[0], row[1]
+    if max_date is None:
+        return {"range_query_ms": 0.0, "attribute_range_query_ms": 0.0}
+    date_from = (date.fromisoformat(max_date) - timedelta(days=days - 1)).isoformat()
+
+    if legacy:
+        def all_attributes():
+            conn.execute(
+                "SELECT attribute_name, date, value FROM attribute_values "
+                "WHERE date >= ? AND date <= ? ORDER BY date",
+                (date_from, max_date),
+            ).fetchall()
+
+        def one_attribute():
+            conn.execute(
+                "SELECT attribute_name, date, value FROM attribute_values "
+                "WHERE attribute_name = ? AND date >= ? AND date <= ? ORDER BY date",
+                (attribute_name, date_from, max_date),
+            ).fetchall()
+    else:
+        def all_attributes():
+            get_values_for_date_range(conn, date_from, max_date)
+
+        def one_attribute():
+            query_values(conn, attribute_name, date_from, max_date)
+
+    def best_of_3(query):
+        timings = []
+        for _ in range(3):
+            start = time.perf_counter()
+            query()
+            timings.append((time.perf_counter() - start) * 1000)
+        return round(min(timings), 2)
+
+    return {
+        "range_query_ms": best_of_3(all_attributes),
+        "attribute_range_query_ms": best_of_3(one_attribute),
+    }
+
+
+def migrate_to_compact(conn):
+    """Move a legacy attribute_values table into the compact layout.
+
+    Copies every row into attribute_data, replaces the table with the
+    compatibility view, and vacuums. Returns a before/after report of
+    database size and 365-day range-query latency (all attributes and a
+    single attribute), or None if the database already uses the compact
+    layout.
+    """
+    if not _has_legacy_values(conn):
+        return None
+
+    before = {"size_bytes": database_size(conn), **_time_range_queries(conn, legacy=True)}
+
+    conn.executescript(VALUES_SCHEMA)
+    with conn:
+        conn.execute(
+            """INSERT INTO attribute_ids (name)
+            SELECT name FROM attributes UNION SELECT DISTINCT attribute_name FROM attribute_values
+            EXCEPT SELECT name FROM attribute_ids"""
+        )
+        cur = conn.execute(
+            f"""INSERT OR REPLACE INTO attribute_data (attribute_id, day, value)
+            SELECT n.id, CAST(julianday(v.date) - 2440587.5 AS INTEGER), {native_value("v.value")}
+            FROM attribute_values v JOIN attribute_ids n ON n.name = v.attribute_name"""
+        )
+        rows = cur.rowcount
+        conn.execute(
+            "INSERT OR IGNORE INTO calendar (day, date) "
+            "SELECT DISTINCT day, date(day * 86400, 'unixepoch') FROM attribute_data"
+        )
+        conn.execute("DROP TABLE attribute_values")
+        # FTS rowids were derived from the old table; init_db rebuilds the index
+        conn.execute("DROP TABLE IF EXISTS value_search")
+    conn.execute("VACUUM")
+
+    after = {"size_bytes": database_size(conn), **_time_range_queries(conn, legacy=False)}
+    return {"rows": rows, "before": before, "after": after}
+
+
+def rebuild_search_index(conn):
+    """Re-populate the full-text index from all string-typed values.
+
+    Returns the number of indexed values.
+    """
+    conn.execute("DELETE FROM value_search")
+    cur = conn.execute(
+        f"""INSERT INTO value_search (rowid, value, attribute_name, date)
+        SELECT d.day * 1048576 + d.attribute_id, d.value, n.name, {_DATE_COLUMN}
+        FROM {_VALUES_FROM} JOIN attributes a ON a.name = n.name
+        WHERE a.value_type = 2 AND d.value IS NOT NULL"""
+    )
     conn.commit()
+    return cur.rowcount
 
 
+def recompute_rollups(conn, attribute_id=None):
+    """Compute rollup rows from scratch with one grouped scan per period, independent of refresh_rollups.
+
+    Returns a cursor of (attribute_id, period, start_day, count, sum, min, max, sum_sq) rows.
+    """
+    where = "typeof(value) IN ('integer', 'real') AND attribute_id IN (" + _NUMERIC_ATTRIBUTE_IDS + ")"
+    params = []
+    if attribute_id is not None:
+        where += " AND attribute_id = ?"
+        params = [attribute_id] * len(ROLLUP_PERIODS)
+    return conn.execute(
+        " UNION ALL ".join(
+            f"SELECT attribute_id, '{period}', {_period_start_sql('day', period)} AS start_day, "
+            "count(*), sum(value), min(value), max(value), sum(value * value) "
+            f"FROM attribute_data WHERE {where} GROUP BY attribute_id, start_day"
+            for period in ROLLUP_PERIODS
+        ),
+        params,
+    )
+
+
+def rebuild_rollups(conn, attribute_id=None):
+    """Replace all rollup rows (or one attribute's) with a full recomputation.
+
+    Returns the number of rows written.
+    """
+    if attribute_id is None:
+        conn.execute("DELETE FROM attribute_rollups")
+    else:
+        conn.execute("DELETE FROM attribute_rollups WHERE attribute_id = ?", (attribute_id,))
+    cur = conn.executemany(
+        "INSERT INTO attribute_rollups (attribute_id, period, start_day, count, sum, min, max, sum_sq) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        recompute_rollups(conn, attribute_id).fetchall(),
+    )
+    conn.commit()
+    return cur.rowcount
+
+
+def refresh_rollups(conn, keys):
+    """Recompute the week, month and year rollups of the periods (attribute_id, day) keys fall into.
+
+    Only periods containing a written or deleted value are touched, each
+    once per call however many of its days changed; adjacent periods of
+    an attribute are recomputed together by one grouped statement. No commit.
+    """
+    numeric = {row[0] for row in conn.execute(_NUMERIC_ATTRIBUTE_IDS)}
+    keys = {(attribute_id, day) for attribute_id, day in keys if attribute_id in numeric}
+    days = sorted({day for _, day in keys})
+    for period in ROLLUP_PERIODS:
+        bounds, current = {}, (None, -1)
+        for day in days:
+            if day > current[1]:
+                current = period_bounds(day, period)
+            bounds[day] = current
+        runs = []
+        for attribute_id, first, last in sorted({(a, *bounds[day]) for a, day in keys}):
+            if runs and runs[-1]["id"] == attribute_id and runs[-1]["end"] == first - 1:
+                runs[-1]["end"] = last
+            else:
+                runs.append({"id": attribute_id, "start": first, "end": last})
+        for statement in _rollup_refresh_sql(period, ":id", ":start", ":end"):
+            conn.executemany(statement, runs)
+        metrics.count("rollup_runs_refreshed", len(runs), period=period)
+
+
+def search_values(conn, query, limit=20):
+    """Full-text search over string values, best matches first.
+
+    query uses FTS5 syntax (e.g. ``park*``, ``"good day"``, ``tired OR sick``);
+    if it fails to parse, each word is searched literally instead.
+    Returns rows with date, attribute_name, label, snippet and rank.
+    """
+    sql = """SELECT value_search.date AS date,
+               value_search.attribute_name AS attribute_name,
+               COALESCE(a.label, value_search.attribute_name) AS label,
+               snippet(value_search, 0, '[', ']', '...', 12) AS snippet,
+               value_search.rank AS rank
+        FROM value_search LEFT JOIN attributes a ON a.name = value_search.attribute_name
+        WHERE value_search MATCH ?
+        ORDER BY value_search.rank
+        LIMIT ?"""
+    try:
+        return conn.execute(sql, (query, limit)).fetchall()
+    except sqlite3.OperationalError:
+        literal = " ".join('"' + word.replace('"', '""') + '"' for word in query.split())
+        return conn.execute(sql, (literal, limit)).fetchall()
+
+
+@metrics.timed("db_write", op="upsert_profile")
 def upsert_profile(conn, profile):
     """Insert or replace user profile."""
     conn.execute(
@@ -74,56 +703,214 @@ def upsert_profile(conn, profile):
     conn.commit()
 
 
+_ATTRIBUTE_COLUMNS = (
+    "name", "label", "group_name", "group_label", "group_priority", "priority",
+    "value_type", "value_type_description", "service_name", "service_label",
+    "manual", "active", "template",
+)
+
+
+def _attribute_row(attr):
+    """attributes column values (without updated_at) for an API attribute dict."""
+    service = attr.get("service") or {}
+    return (
+        attr["name"],
+        attr["label"],
+        attr["group"]["name"],
+        attr["group"]["label"],
+        attr["group"]["priority"],
+        attr["priority"],
+        attr["value_type"],
+        attr["value_type_description"],
+        service.get("name") if service else None,
+        service.get("label") if service else None,
+        int(attr.get("manual", False)),
+        int(attr.get("active", True)),
+        attr.get("template"),
+    )
+
+
+def attribute_unchanged(conn, attr):
+    """True if the stored metadata row for an API attribute dict is identical."""
+    row = conn.execute(
+        f"SELECT {', '.join(_ATTRIBUTE_COLUMNS)} FROM attributes WHERE name = ?", (attr["name"],)
+    ).fetchone()
+    return row is not None and tuple(row) == _attribute_row(attr)
+
+
+@metrics.timed("db_write", op="upsert_attribute")
 def upsert_attribute(conn, attr):
-    """Insert or replace a single attribute metadata row."""
+    """Insert or replace a single attribute metadata row.
+
+    When an attribute becomes manual, its stored values become the synced
+    baseline for push. When its value type changes, or values were stored
+    before its metadata, its rollups are recomputed.
+    """
+    previous = conn.execute("SELECT manual, value_type FROM attributes WHERE name = ?", (attr["name"],)).fetchone()
     conn.execute(
-        """INSERT OR REPLACE INTO attributes
-        (name, label, group_name, group_label, group_priority, priority,
-         value_type, value_type_description, service_name, service_label,
-         manual, active, template, updated_at)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-        (
-            attr["name"],
-            attr["label"],
-            attr["group"]["name"],
-            attr["group"]["label"],
-            attr["group"]["priority"],
-            attr["priority"],
-            attr["value_type"],
-            attr["value_type_description"],
-            attr.get("service", {}).get("name") if attr.get("service") else None,
-            attr.get("service", {}).get("label") if attr.get("service") else None,
-            int(attr.get("manual", False)),
-            int(attr.get("active", True)),
-            attr.get("template"),
-            datetime.now(UTC).isoformat(),
-        ),
+        f"""INSERT OR REPLACE INTO attributes
+        ({', '.join(_ATTRIBUTE_COLUMNS)}, updated_at)
+        VALUES ({', '.join('?' * len(_ATTRIBUTE_COLUMNS))}, ?)""",
+        (*_attribute_row(attr), datetime.now(UTC).isoformat()),
     )
+    if attr.get("manual") and not (previous and previous[0]):
+        conn.execute(
+            """INSERT OR IGNORE INTO manual_sync_state (attribute_id, day, value, synced_at)
+            SELECT d.attribute_id, d.day, d.value, ? FROM attribute_data d
+            JOIN attribute_ids n ON n.id = d.attribute_id WHERE n.name = ?""",
+            (datetime.now(UTC).isoformat(), attr["name"]),
+        )
+    if previous is None or previous[1] != attr["value_type"]:
+        stored = conn.execute("SELECT id FROM attribute_ids WHERE name = ?", (attr["name"],)).fetchone()
+        if stored:
+            rebuild_rollups(conn, stored[0])
     conn.commit()
 
 
+def get_attribute_id(conn, attribute_name):
+    """Return the integer id for an attribute name, allocating one if needed."""
+    row = conn.execute("SELECT id FROM attribute_ids WHERE name = ?", (attribute_name,)).fetchone()
+    if row:
+        return row[0]
+    return conn.execute("INSERT INTO attribute_ids (name) VALUES (?)", (attribute_name,)).lastrowid
+
+
+@hot_path("upsert_values")
+@metrics.timed("db_write", op="upsert_values")
 def upsert_values(conn, attribute_name, values):
-    """Bulk insert or replace attribute values.
+    """Bulk insert or replace attribute values fetched from Exist.io.
 
-    values: list of dicts with 'date' and 'value' keys.
+    values: list of dicts with 'date' and 'value' keys. For manual
+    attributes the values are also recorded as the synced state for push.
     Returns count of rows upserted.
     """
-    rows = [(attribute_name, v["date"], v["value"]) for v in values]
+    attribute_id = get_attribute_id(conn, attribute_name)
+    rows = [{"id": attribute_id, "day": date_to_day(v["date"]), "value": v["value"]} for v in values]
+    write_value_rows(conn, rows)
+    manual = conn.execute("SELECT manual FROM attributes WHERE name = ?", (attribute_name,)).fetchone()
+    if manual and manual[0]:
+        mark_synced(conn, rows)
+    conn.commit()
+    return len(rows)
+
+
+@metrics.timed("db_write", op="upsert_changed_values")
+def upsert_changed_values(conn, attribute_name, values):
+    """Write only the values that differ from what is stored; returns how many changed.
+
+    Unchanged rows cost a lookup but no write, so frequent refreshes of the
+    same day don't churn pages, the WAL or day_changes.
+    """
+    attribute_id = get_attribute_id(conn, attribute_name)
+    rows = [{"id": attribute_id, "day": date_to_day(v["date"]), "value": v["value"]} for v in values]
     conn.executemany(
-        "INSERT OR REPLACE INTO attribute_values (attribute_name, date, value) VALUES (?, ?, ?)",
-        rows,
+        "INSERT OR IGNORE INTO calendar (day, date) VALUES (?, ?)",
+        [(day, day_to_date(day)) for day in {row["day"] for row in rows}],
     )
+    changed_days = set()
+    for row in rows:
+        cur = conn.execute(
+            "INSERT INTO attribute_data (attribute_id, day, value) "
+            f"VALUES (:id, :day, {native_value(':value')}) "
+            "ON CONFLICT (attribute_id, day) DO UPDATE SET value = excluded.value "
+            "WHERE value IS NOT excluded.value",
+            row,
+        )
+        if cur.rowcount:
+            changed_days.add(row["day"])
+    mark_days_changed(conn, changed_days)
+    refresh_rollups(conn, {(attribute_id, day) for day in changed_days})
+    manual = conn.execute("SELECT manual FROM attributes WHERE name = ?", (attribute_name,)).fetchone()
+    if changed_days and manual and manual[0]:
+        mark_synced(conn, [row for row in rows if row["day"] in changed_days])
+    metrics.count("db_rows_written", len(changed_days))
     conn.commit()
-    return len(rows)
+    return len(changed_days)
+
+
+def mark_partial_day(conn, day):
+    """Record a day number as written while still in progress (no commit)."""
+    conn.execute("INSERT OR IGNORE INTO partial_days (day) VALUES (?)", (day,))
+
+
+def clear_partial_days(conn, through_day):
+    """Forget partial days up to through_day once a regular sync has fetched them."""
+    conn.execute("DELETE FROM partial_days WHERE day <= ?", (through_day,))
+    conn.commit()
+
+
+def write_value_rows(conn, rows):
+    """Insert or replace {id, day, value} rows without committing."""
+    days = {row["day"] for row in rows}
+    conn.executemany(
+        "INSERT OR IGNORE INTO calendar (day, date) VALUES (?, ?)",
+        [(day, day_to_date(day)) for day in days],
+    )
+    conn.executemany(
+        "INSERT OR REPLACE INTO attribute_data (attribute_id, day, value) "
+        f"VALUES (:id, :day, {native_value(':value')})",
+        rows,
+    )
+    mark_days_changed(conn, days)
+    refresh_rollups(conn, {(row["id"], row["day"]) for row in rows})
+    metrics.count("db_rows_written", len(rows))
+
+
+def mark_days_changed(conn, days):
+    """Stamp day numbers in day_changes with the next sequence number (no commit)."""
+    if not days:
+        return
+    seq = conn.execute("SELECT coalesce(max(seq), 0) + 1 FROM day_changes").fetchone()[0]
+    conn.executemany(
+        "INSERT OR REPLACE INTO day_changes (day, seq) VALUES (?, ?)", [(day, seq) for day in days]
+    )
+
+
+def mark_synced(conn, rows):
+    """Record {id, day, value} rows as the values Exist.io holds (no commit)."""
+    synced_at = datetime.now(UTC).isoformat()
+    conn.executemany(
+        "INSERT OR REPLACE INTO manual_sync_state (attribute_id, day, value, synced_at) "
+        f"VALUES (:id, :day, {native_value(':value')}, :synced_at)",
+        [{**row, "synced_at": synced_at} for row in rows],
+    )
+
+
+def mark_push_failed(conn, rows):
+    """Keep the synced value of {id, day, error} rows but note why pushing failed (no commit)."""
+    synced_at = datetime.now(UTC).isoformat()
+    conn.executemany(
+        "INSERT INTO manual_sync_state (attribute_id, day, value, synced_at, last_error) "
+        "VALUES (:id, :day, NULL, :synced_at, :error) "
+        "ON CONFLICT (attribute_id, day) DO UPDATE SET last_error = excluded.last_error",
+        [{**row, "synced_at": synced_at} for row in rows],
+    )
+
+
+def get_pending_manual_values(conn):
+    """Local values of manual attributes that differ from the last synced state.
+
+    Returns rows with attribute_id, name, day, date, value (local) and
+    synced_value (None if Exist.io has never seen a value for that day).
+    """
+    return conn.execute(
+        f"""SELECT d.attribute_id, n.name, d.day, {_DATE_COLUMN} AS date, d.value, s.value AS synced_value
+        FROM {_VALUES_FROM} JOIN attributes a ON a.name = n.name
+        LEFT JOIN manual_sync_state s ON s.attribute_id = d.attribute_id AND s.day = d.day
+        WHERE a.manual = 1 AND d.value IS NOT s.value
+        ORDER BY d.day, n.name"""
+    ).fetchall()
 
 
 def get_last_sync_date(conn, attribute_name):
     """Get the most recent date we have stored for an attribute."""
     row = conn.execute(
-        "SELECT MAX(date) as max_date FROM attribute_values WHERE attribute_name = ?",
+        "SELECT MAX(d.day) as max_day FROM attribute_data d "
+        "WHERE d.attribute_id = (SELECT id FROM attribute_ids WHERE name = ?) "
+        "AND d.day NOT IN (SELECT day FROM partial_days)",
         (attribute_name,),
     ).fetchone()
-    return row["max_date"] if row and row["max_date"] else None
+    return day_to_date(row["max_day"]) if row and row["max_day"] is not None else None
 
 
 def get_oldest_last_sync_date(conn):
@@ -133,10 +920,11 @@ def get_oldest_last_sync_date(conn):
     the most stale attribute is. Returns None if no values exist.
     """
     row = conn.execute(
-        "SELECT MIN(max_date) as oldest FROM "
-        "(SELECT MAX(date) as max_date FROM attribute_values GROUP BY attribute_name)"
+        "SELECT MIN(max_day) as oldest FROM "
+        "(SELECT MAX(day) as max_day FROM attribute_data "
+        "WHERE day NOT IN (SELECT day FROM partial_days) GROUP BY attribute_id)"
     ).fetchone()
-    return row["oldest"] if row and row["oldest"] else None
+    return day_to_date(row["oldest"]) if row and row["oldest"] is not None else None
 
 
 def get_global_last_sync(conn):
@@ -153,48 +941,222 @@ def get_profile(conn):
     return json.loads(row["data"]) if row else None
 
 
+@metrics.timed("db_write", op="write_sync_log")
 def write_sync_log(conn, sync_type, attributes_synced, values_synced, status, error_message=None):
-    """Record a sync run in the log."""
-    conn.execute(
+    """Record a sync run in the log. Returns the new sync_log id."""
+    cur = conn.execute(
         """INSERT INTO sync_log (timestamp, sync_type, attributes_synced, values_synced, status, error_message)
         VALUES (?, ?, ?, ?, ?, ?)""",
         (datetime.now(UTC).isoformat(), sync_type, attributes_synced, values_synced, status, error_message),
     )
     conn.commit()
+    return cur.lastrowid
+
+
+def write_sync_metrics(conn, sync_id, data):
+    """Persist a metrics summary (see metrics.since) for a sync_log entry."""
+    rows = [(sync_id, name, "timer", t["count"], t["seconds"]) for name, t in data["timers"].items()]
+    rows += [(sync_id, name, "counter", value, None) for name, value in data["counters"].items()]
+    conn.executemany(
+        "INSERT OR REPLACE INTO sync_metrics (sync_id, name, kind, count, seconds) VALUES (?, ?, ?, ?, ?)",
+        rows,
+    )
+    conn.commit()
+
+
+def get_change_seq(conn):
+    """The latest day_changes sequence number (0 if nothing has changed yet)."""
+    return conn.execute("SELECT coalesce(max(seq), 0) FROM day_changes").fetchone()[0]
+
+
+def get_changed_dates(conn, since_seq):
+    """Dates (YYYY-MM-DD, ascending) changed after since_seq, and the latest seq."""
+    rows = conn.execute("SELECT day, seq FROM day_changes WHERE seq > ? ORDER BY day", (since_seq,)).fetchall()
+    latest = max((row[1] for row in rows), default=since_seq)
+    return [day_to_date(row[0]) for row in rows], latest
+
+
+def get_sync_metrics(conn, sync_id):
+    """Load the persisted metrics for one sync run."""
+    return conn.execute(
+        "SELECT name, kind, count, seconds FROM sync_metrics WHERE sync_id = ? ORDER BY name",
+        (sync_id,),
+    ).fetchall()
+
+
+# Attribute filter keys (shared by the [export] config and CLI flags) -> attributes column
+FILTER_COLUMNS = {
+    "attributes": "name",
+    "groups": "group_name",
+    "services": "service_name",
+}
+FILTER_KEYS = tuple(f"{mode}_{kind}" for mode in ("include", "exclude") for kind in FILTER_COLUMNS)
+
+
+# Boolean attribute flags a filter can also require ([sync] selection rules)
+FILTER_FLAGS = ("manual", "active")
+
+
+def filters_from_config(section):
+    """Pick the non-empty include_*/exclude_* filter lists out of a config section."""
+    return {key: list(section[key]) for key in FILTER_KEYS if section.get(key)}
+
+
+def sync_filters_from_config(section):
+    """Sync selection rules: the include_*/exclude_* lists plus manual/active flags that are set."""
+    filters = filters_from_config(section)
+    for flag in FILTER_FLAGS:
+        if section.get(flag) is not None:
+            filters[flag] = bool(section[flag])
+    return filters
+
+
+def filter_clause(filters, alias="a"):
+    """Build a WHERE fragment over the attributes table for include/exclude filters.
+
+    An attribute is kept if it matches any include list (or there are none),
+    matches no exclude list and has every flag in FILTER_FLAGS that is set.
+    Returns (sql, params), or (None, []) if there is nothing to filter.
+    """
+    includes, include_params, clauses, params = [], [], [], []
+    for key, names in (filters or {}).items():
+        if key in FILTER_FLAGS:
+            clauses.append(f"{alias}.{key} = ?")
+            params.append(int(names))
+            continue
+        if not names:
+            continue
+        mode, kind = key.split("_", 1)
+        column = f"{alias}.{FILTER_COLUMNS[kind]}"
+        placeholders = ", ".join("?" * len(names))
+        if mode == "include":
+            includes.append(f"{column} IN ({placeholders})")
+            include_params.extend(names)
+        else:
+            clauses.append(f"({column} IS NULL OR {column} NOT IN ({placeholders}))")
+            params.extend(names)
+    if includes:
+        clauses.insert(0, "(" + " OR ".join(includes) + ")")
+        params[:0] = include_params
+    if not clauses:
+        return None, []
+    return " AND ".join(clauses), params
+
 
+def attribute_matches(attr, filters):
+    """Whether an API attribute dict passes filters, with the same rules as filter_clause."""
+    row = dict(zip(_ATTRIBUTE_COLUMNS, _attribute_row(attr)))
+    included = None
+    for key, names in (filters or {}).items():
+        if key in FILTER_FLAGS:
+            if row[key] != int(names):
+                return False
+            continue
+        if not names:
+            continue
+        mode, kind = key.split("_", 1)
+        found = row[FILTER_COLUMNS[kind]] in names
+        if mode == "exclude" and found:
+            return False
+        if mode == "include":
+            included = included or found
+    return included is not False
 
-def get_all_attributes(conn):
-    """Get all attribute metadata rows, ordered by group then priority."""
+
+def _attribute_id_filter(filters):
+    """Return (sql, params) restricting d.attribute_id to the filtered attributes."""
+    where, params = filter_clause(filters)
+    if where is None:
+        return None, []
+    return (
+        "d.attribute_id IN (SELECT n2.id FROM attribute_ids n2 "
+        f"JOIN attributes a ON a.name = n2.name WHERE {where})",
+        params,
+    )
+
+
+def get_all_attributes(conn, filters=None):
+    """Get attribute metadata rows, ordered by group then priority.
+
+    `filters` is a dict of include_*/exclude_* name lists (see FILTER_KEYS).
+    """
+    where, params = filter_clause(filters)
+    where = f" WHERE {where}" if where else ""
     return conn.execute(
-        "SELECT * FROM attributes ORDER BY group_priority, priority"
+        f"SELECT * FROM attributes a{where} ORDER BY group_priority, priority", params
     ).fetchall()
 
 
-def get_values_for_date(conn, date_str):
-    """Get all attribute values for a specific date."""
+def get_values_for_date(conn, date_str, filters=None):
+    """Get attribute values for a specific date, optionally filtered by attribute."""
+    clauses, params = ["d.day = ?"], [date_to_day(date_str)]
+    id_filter, id_params = _attribute_id_filter(filters)
+    if id_filter:
+        clauses.append(id_filter)
+        params.extend(id_params)
     return conn.execute(
-        "SELECT attribute_name, value FROM attribute_values WHERE date = ?",
-        (date_str,),
+        "SELECT n.name AS attribute_name, CAST(d.value AS TEXT) AS value "
+        "FROM attribute_data d JOIN attribute_ids n ON n.id = d.attribute_id "
+        f"WHERE {' AND '.join(clauses)}",
+        params,
     ).fetchall()
 
 
-def get_values_for_date_range(conn, date_from, date_to):
-    """Get all attribute values in a date range."""
+def get_values_for_date_range(conn, date_from, date_to, filters=None):
+    """Get attribute values in a date range, optionally filtered by attribute."""
+    return iter_values_for_date_range(conn, date_from, date_to, filters).fetchall()
+
+
+def iter_values_for_date_range(conn, date_from, date_to, filters=None):
+    """Like get_values_for_date_range, but returns the cursor to stream rows in day order."""
+    clauses = ["d.day >= ?", "d.day <= ?"]
+    params = [date_to_day(date_from), date_to_day(date_to)]
+    id_filter, id_params = _attribute_id_filter(filters)
+    if id_filter:
+        clauses.append(id_filter)
+        params.extend(id_params)
     return conn.execute(
-        "SELECT attribute_name, date, value FROM attribute_values WHERE date >= ? AND date <= ? ORDER BY date",
-        (date_from, date_to),
+        f"SELECT n.name AS attribute_name, {_DATE_COLUMN} AS date, CAST(d.value AS TEXT) AS value "
+        f"FROM {_VALUES_FROM} WHERE {' AND '.join(clauses)} ORDER BY d.day",
+        params,
+    )
+
+
+def query_values(conn, attribute_name=None, date_from=None, date_to=None):
+    """Get attribute values, optionally filtered by attribute and date bounds."""
+    clauses = []
+    params = []
+    if attribute_name:
+        clauses.append("n.name = ?")
+        params.append(attribute_name)
+    if date_from:
+        clauses.append("d.day >= ?")
+        params.append(date_to_day(date_from))
+    if date_to:
+        clauses.append("d.day <= ?")
+        params.append(date_to_day(date_to))
+    where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+    return conn.execute(
+        f"SELECT n.name AS attribute_name, {_DATE_COLUMN} AS date, CAST(d.value AS TEXT) AS value "
+        f"FROM {_VALUES_FROM}{where} ORDER BY d.day, n.name",
+        params,
     ).fetchall()
 
 
+def get_data_version(conn):
+    """Return PRAGMA data_version, which changes when another connection commits."""
+    return conn.execute("PRAGMA data_version").fetchone()[0]
+
+
 def get_sync_status(conn):
     """Get summary stats for the status command."""
     stats = {}
     row = conn.execute("SELECT COUNT(*) as cnt FROM attributes").fetchone()
     stats["total_attributes"] = row["cnt"]
-    row = conn.execute("SELECT COUNT(*) as cnt FROM attribute_values").fetchone()
+    row = conn.execute("SELECT COUNT(*) as cnt FROM attribute_data").fetchone()
     stats["total_values"] = row["cnt"]
-    row = conn.execute("SELECT MIN(date) as min_d, MAX(date) as max_d FROM attribute_values").fetchone()
-    stats["date_min"] = row["min_d"]
-    stats["date_max"] = row["max_d"]
+    row = conn.execute("SELECT MIN(day) as min_d, MAX(day) as max_d FROM attribute_data").fetchone()
+    stats["date_min"] = day_to_date(row["min_d"]) if row["min_d"] is not None else None
+    stats["date_max"] = day_to_date(row["max_d"]) if row["max_d"] is not None else None
     stats["last_sync"] = get_global_last_sync(conn)
     return stats
@@ -1,29 +1,46 @@
 """Obsidian markdown export from SQLite database."""
 
+import hashlib
+import json
 import os
+import sys
+import threading
 from collections import OrderedDict
-from datetime import date, timedelta
+from datetime import date
+from itertools import groupby
+from operator import itemgetter
 from pathlib import Path
 
 from jinja2 import Environment, FileSystemLoader, select_autoescape
 
-from . import db, formatting
+from . import db, formatting, metrics, records, sinks
+from .profiling import hot_path
 
 # Directory containing built-in templates
 TEMPLATES_DIR = Path(__file__).parent / "templates"
 
+BUILTIN_TEMPLATES = ("daily", "weekly", "block")
+DEFAULT_NOTE_PATH = "{year}/{date}.md"
+DEFAULT_BLOCK_START = "%% exist:start %%"
+DEFAULT_BLOCK_END = "%% exist:end %%"
 
-def query_day(conn, date_str):
-    """Query all data for a single day, grouped for template rendering.
+# Per-output-dir record of merged block hashes, so unchanged notes are skipped unread
+MERGE_STATE_FILE = ".exist-merge-state.json"
 
-    Returns dict with keys: date, groups (OrderedDict of group_label -> list of attr dicts).
-    """
-    attributes = db.get_all_attributes(conn)
-    day_values = {row["attribute_name"]: row["value"] for row in db.get_values_for_date(conn, date_str)}
-    profile = db.get_profile(conn)
 
+def build_day(date_str, attributes, day_values, profile, all_records=None):
+    """Group one day's values for rendering.
+
+    `attributes` are metadata rows in display order, `day_values` maps
+    attribute name -> raw value, `all_records` is records.get_records().
+    Returns dict with keys: date, groups (OrderedDict of group_label ->
+    list of attr dicts), tags, records (achievements on this day: all-time
+    highs/lows and running streaks, as dicts with name, label, kind, text).
+    """
     groups = OrderedDict()
     tags = []
+    day_records = []
+    all_records = all_records or {}
 
     for attr in attributes:
         attr_name = attr["name"]
@@ -53,13 +70,66 @@ def query_day(conn, date_str):
         if value_type == 7 and raw_value is not None and int(float(raw_value)) == 1:
             tags.append(attr["label"])
 
+        record = all_records.get(attr_name)
+        if record:
+            day_records.extend(_day_achievements(attr_name, record, date_str, formatted))
+
     return {
         "date": date_str,
         "groups": groups,
         "tags": tags,
+        "records": day_records,
     }
 
 
+def _day_achievements(name, record, date_str, formatted):
+    achievements = []
+    if record["max_date"] == date_str:
+        achievements.append(("high", f"all-time high ({formatted})"))
+    elif record["min_date"] == date_str:
+        achievements.append(("low", f"all-time low ({formatted})"))
+    streak = records.streak_on(record, date_str)
+    if streak > 1:
+        achievements.append(("streak", f"{streak}-day streak"))
+    return [{"name": name, "label": record["label"], "kind": kind, "text": text} for kind, text in achievements]
+
+
+@hot_path("query_day")
+def query_day(conn, date_str, filters=None):
+    """Query all data for a single day, grouped for template rendering.
+
+    `filters` (include_*/exclude_* lists) are applied in SQL by the db queries.
+
+    Returns dict with keys: date, groups (OrderedDict of group_label -> list of attr dicts).
+    """
+    attributes = db.get_all_attributes(conn, filters)
+    day_values = {
+        row["attribute_name"]: row["value"] for row in db.get_values_for_date(conn, date_str, filters)
+    }
+    return build_day(date_str, attributes, day_values, db.get_profile(conn), records.get_records(conn))
+
+
+@hot_path("scan_days")
+def scan_days(conn, date_from, date_to, filters=None):
+    """Yield build_day() records for each day with data, from one ordered range scan."""
+    attributes = db.get_all_attributes(conn, filters)
+    profile = db.get_profile(conn)
+    all_records = records.get_records(conn)
+    rows = db.iter_values_for_date_range(conn, date_from, date_to, filters)
+    for date_str, day_rows in groupby(rows, key=itemgetter("date")):
+        day_values = {r["attribute_name"]: r["value"] for r in day_rows}
+        day = build_day(date_str, attributes, day_values, profile, all_records)
+        # Values whose attribute has no metadata row are not rendered
+        if day["groups"]:
+            yield day
+
+
+@hot_path("template_render")
+def render_note(template, day_data):
+    """Render one note from query_day() output."""
+    return template.render(**day_data)
+
+
 def get_jinja_env(template_name_or_path):
     """Create Jinja2 environment, searching built-in templates and custom paths."""
     search_paths = [str(TEMPLATES_DIR)]
@@ -78,49 +148,269 @@ def get_jinja_env(template_name_or_path):
 
 def resolve_template_name(template_setting):
     """Resolve the template config value to a filename."""
-    if template_setting in ("daily", "weekly"):
+    if template_setting in BUILTIN_TEMPLATES:
         return f"{template_setting}.md.j2"
     # Assume it's a path to a custom template
     return Path(template_setting).name
 
 
-def export_date_range(config, date_from, date_to):
-    """Export Obsidian markdown files for a date range.
+def note_path(output_dir, pattern, day):
+    """Resolve the note path pattern for a date.
+
+    The pattern may use {date} (YYYY-MM-DD), {year}, {month} and {day}.
+    """
+    return Path(output_dir) / pattern.format(
+        date=day.isoformat(),
+        year=f"{day.year:04d}",
+        month=f"{day.month:02d}",
+        day=f"{day.day:02d}",
+    )
+
+
+def replace_block(text, block, start_marker, end_marker):
+    """Return text with the delimited block replaced (or appended if absent).
+
+    Returns None if the note has a start marker without a matching end marker.
+    """
+    start = text.find(start_marker)
+    if start == -1:
+        if text and not text.endswith("\n"):
+            text += "\n"
+        separator = "\n" if text and not text.endswith("\n\n") else ""
+        return f"{text}{separator}{block}\n"
+    end = text.find(end_marker, start + len(start_marker))
+    if end == -1:
+        return None
+    return text[:start] + block + text[end + len(end_marker):]
+
+
+def load_merge_state(output_dir):
+    """Read the merge state file, treating a missing or corrupt file as empty."""
+    path = Path(output_dir) / MERGE_STATE_FILE
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def save_merge_state(output_dir, state):
+    path = Path(output_dir) / MERGE_STATE_FILE
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+
+def merge_note(path, content, start_marker, end_marker, state, key):
+    """Write content into the delimited block of the note at path.
+
+    state maps key -> [block hash, mtime_ns, size] from earlier runs; if the
+    hash matches and the file is untouched since, the note isn't even read.
+    Returns "written", "unchanged" or "skipped" (malformed block).
+    """
+    block = f"{start_marker}\n{content.strip()}\n{end_marker}"
+    block_hash = hashlib.sha1(block.encode()).hexdigest()
+
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        st = None
+    if st is not None and state.get(key) == [block_hash, st.st_mtime_ns, st.st_size]:
+        return "unchanged"
+
+    text = path.read_text() if st is not None else ""
+    new_text = replace_block(text, block, start_marker, end_marker)
+    if new_text is None:
+        print(f"  {path}: found '{start_marker}' without '{end_marker}', skipping", file=sys.stderr)
+        return "skipped"
+
+    result = "unchanged"
+    if new_text != text:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with metrics.timer("file_write"):
+            path.write_text(new_text)
+        st = path.stat()
+        result = "written"
+    state[key] = [block_hash, st.st_mtime_ns, st.st_size]
+    return result
+
+
+class MarkdownSink:
+    """Obsidian notes rendered with the Jinja template, one per day.
+
+    With ``mode = "files"`` (default) each note is owned and rewritten
+    whole. With ``mode = "merge"`` only the block between the start/end
+    markers of existing notes is rewritten, and a note is touched only when
+    that block changes. Settings come from [export], overridden by
+    [export.markdown].
+    """
+
+    name = "markdown"
+
+    def __init__(self, export_config, options):
+        settings = {**export_config, **options}
+        self.output_dir = Path(settings["output_dir"])
+        self.pattern = settings.get("note_path", DEFAULT_NOTE_PATH)
+        self.merge = settings.get("mode", "files") == "merge"
+        if self.merge:
+            template_setting = settings.get("block_template", "block")
+            self.start_marker = settings.get("block_start", DEFAULT_BLOCK_START)
+            self.end_marker = settings.get("block_end", DEFAULT_BLOCK_END)
+            self.merge_state = load_merge_state(self.output_dir)
+            self.outcomes = {"written": 0, "unchanged": 0, "skipped": 0}
+        else:
+            template_setting = settings.get("template", "daily")
+
+        env = get_jinja_env(template_setting)
+        self.template = env.get_template(resolve_template_name(template_setting))
+        self.written = 0
+
+    def write(self, day):
+        out_path = note_path(self.output_dir, self.pattern, date.fromisoformat(day["date"]))
+        with metrics.timer("template_render"):
+            content = render_note(self.template, day)
+        if self.merge:
+            key = out_path.relative_to(self.output_dir).as_posix()
+            outcome = merge_note(out_path, content, self.start_marker, self.end_marker, self.merge_state, key)
+            self.outcomes[outcome] += 1
+            self.written += outcome == "written"
+        else:
+            out_path.parent.mkdir(parents=True, exist_ok=True)
+            with metrics.timer("file_write"):
+                out_path.write_text(content)
+            self.written += 1
+
+    def close(self):
+        if self.merge:
+            save_merge_state(self.output_dir, self.merge_state)
+            print(
+                f"Merged notes: {self.outcomes['written']} updated, {self.outcomes['unchanged']} unchanged, "
+                f"{self.outcomes['skipped']} skipped",
+                file=sys.stderr,
+            )
+        return self.written
+
+
+SINKS = {
+    "markdown": MarkdownSink,
+    "csv": sinks.CsvSink,
+    "json": sinks.JsonSink,
+}
+
+
+def run_export(config, date_from, date_to, sink_names=None):
+    """Scan the date range once and feed every day to each configured sink.
 
     Args:
         config: Parsed configuration dict.
         date_from: Start date (inclusive) as date object.
         date_to: End date (inclusive) as date object.
+        sink_names: Sink names overriding [export] sinks (default ["markdown"]).
 
     Returns:
-        Number of files written.
+        Dict of sink name -> items written.
     """
-    conn = db.connect(config["sync"]["database"])
-    output_dir = Path(config["export"]["output_dir"])
-    template_setting = config["export"].get("template", "daily")
-
-    env = get_jinja_env(template_setting)
-    template_name = resolve_template_name(template_setting)
-    template = env.get_template(template_name)
-
-    files_written = 0
-    current = date_from
+    export_config = config["export"]
+    names = list(sink_names or export_config.get("sinks", ["markdown"]))
+    filters = db.filters_from_config(export_config)
+    outputs = []
+    try:
+        for name in names:
+            outputs.append((name, sinks.load_sink(name, SINKS)(export_config, export_config.get(name, {}))))
+
+        conn = db.connect_readonly(config["sync"]["database"], **db.connection_options(config["sync"]))
+        try:
+            with metrics.timer("export"):
+                for day in scan_days(conn, date_from.isoformat(), date_to.isoformat(), filters):
+                    for name, sink in outputs:
+                        with metrics.timer("export_sink", sink=name):
+                            sink.write(day)
+        finally:
+            conn.close()
+
+        results = {}
+        while outputs:
+            name, sink = outputs[0]
+            results[name] = sink.close()
+            outputs.pop(0)
+        return results
+    finally:
+        # Left over only when something failed: discard their partial output
+        for _, sink in outputs:
+            abort = getattr(sink, "abort", None)
+            if abort is not None:
+                abort()
 
-    while current <= date_to:
-        date_str = current.isoformat()
-        day_data = query_day(conn, date_str)
 
-        # Only write if there's data for this day
-        if day_data["groups"]:
-            year_dir = output_dir / str(current.year)
-            year_dir.mkdir(parents=True, exist_ok=True)
-            out_path = year_dir / f"{date_str}.md"
+def export_date_range(config, date_from, date_to):
+    """Export Obsidian markdown files for a date range.
 
-            content = template.render(**day_data)
-            out_path.write_text(content)
-            files_written += 1
+    Returns:
+        Number of files written.
+    """
+    return run_export(config, date_from, date_to, ["markdown"])["markdown"]
 
-        current += timedelta(days=1)
 
-    conn.close()
-    return files_written
+def days_for_dates(conn, dates, filters=None):
+    """Yield build_day() records for specific dates, loading metadata once."""
+    attributes = db.get_all_attributes(conn, filters)
+    profile = db.get_profile(conn)
+    all_records = records.get_records(conn)
+    for date_str in dates:
+        day_values = {
+            row["attribute_name"]: row["value"] for row in db.get_values_for_date(conn, date_str, filters)
+        }
+        day = build_day(date_str, attributes, day_values, profile, all_records)
+        if day["groups"]:
+            yield day
+
+
+def watch_export(config, date_from, date_to=None, interval=1.0, stop=None, since_seq=None):
+    """Keep markdown notes up to date as the database changes.
+
+    Polls PRAGMA data_version every `interval` seconds, which only moves
+    when another connection commits, so an idle database costs one pragma
+    per poll. After a commit the dates stamped in day_changes since the
+    last poll are re-rendered, limited to [date_from, date_to] (no upper
+    bound when date_to is None). since_seq is the day_changes sequence
+    number to watch from: take it with db.get_change_seq before an initial
+    export so commits made while that export runs are not missed (None =
+    from now). Runs until `stop` (a threading.Event) is set or the process
+    is interrupted. Returns the number of notes written.
+    """
+    export_config = config["export"]
+    filters = db.filters_from_config(export_config)
+    low = date_from.isoformat()
+    high = date_to.isoformat() if date_to else None
+    stop = stop or threading.Event()
+    written = 0
+
+    conn = db.connect_readonly(config["sync"]["database"], **db.connection_options(config["sync"]))
+    try:
+        # With a since_seq the first poll catches up on changes made before this connection opened
+        version = db.get_data_version(conn) if since_seq is None else None
+        seq = db.get_change_seq(conn) if since_seq is None else since_seq
+        print(f"Watching {config['sync']['database']} for changes...", file=sys.stderr)
+        while not stop.wait(interval):
+            current = db.get_data_version(conn)
+            if current == version:
+                continue
+            version = current
+            dates, seq = db.get_changed_dates(conn, seq)
+            dates = [d for d in dates if d >= low and (high is None or d <= high)]
+            if not dates:
+                continue
+            sink = MarkdownSink(export_config, export_config.get("markdown", {}))
+            with metrics.timer("export_watch"):
+                for day in days_for_dates(conn, dates, filters):
+                    sink.write(day)
+            count = sink.close()
+            written += count
+            metrics.count("export_watch_notes", count)
+            print(f"  {len(dates)} changed days, {count} notes written ({', '.join(dates[:5])}"
+                  f"{', ...' if len(dates) > 5 else ''})", file=sys.stderr)
+    finally:
+        conn.close()
+    return written
@@ -0,0 +1,31 @@
+"""Pluggable JSON decoding for API responses.
+
+orjson (installed with the ``fast`` extra) decodes large pages several
+times faster than the stdlib; without it the stdlib ``json`` module is
+used. Both take the raw response bytes, so no intermediate str is built.
+"""
+
+import json
+
+try:
+    import orjson
+except ImportError:  # optional: pip install exist-backup[fast]
+    orjson = None
+
+BACKENDS = {"json": json.loads}
+if orjson is not None:
+    BACKENDS["orjson"] = orjson.loads
+
+
+class JSONBackendError(ValueError):
+    """Raised for a json_backend setting that isn't available."""
+
+
+def get_loads(name="auto"):
+    """Return (backend name, loads function) for "auto", "orjson" or "json"."""
+    if name == "auto":
+        name = "orjson" if "orjson" in BACKENDS else "json"
+    if name not in BACKENDS:
+        hint = " (pip install exist-backup[fast])" if name == "orjson" else ""
+        raise JSONBackendError(f"JSON backend {name!r} is not available{hint}")
+    return name, BACKENDS[name]
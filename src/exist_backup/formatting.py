@@ -1,6 +1,9 @@
 """Value formatting helpers for human-readable display."""
 
+from .profiling import hot_path
 
+
+@hot_path("format_value")
 def format_value(raw_value, value_type, user_profile=None):
     """Format a raw attribute value into a human-readable string.
 
@@ -0,0 +1,171 @@
+"""Bootstrap the database from an Exist.io CSV data export.
+
+Exist.io lets users download their data as CSV files (usually zipped). The
+files are streamed straight into the values table in large batches, so
+years of history load in seconds instead of a long rate-limited full sync.
+Afterwards the stored dates act as the watermark for incremental syncs.
+
+Three CSV layouts are recognised:
+- long: ``attribute,date,value`` rows (``name`` is accepted for ``attribute``)
+- wide: a ``date`` column plus one column per attribute
+- per attribute: ``date,value`` in a file named after the attribute
+"""
+
+import csv
+import io
+import sys
+import zipfile
+from datetime import UTC, date, datetime
+from pathlib import Path
+
+from . import db, metrics
+
+DEFAULT_BATCH_SIZE = 50_000
+
+# Placeholder metadata for attributes the archive has but the API hasn't
+# described yet; the next sync overwrites it with the real definitions.
+PLACEHOLDER_GROUP = ("imported", "Imported", 999)
+VALUE_TYPES = {"integer": (0, "Integer"), "real": (1, "Float"), "text": (2, "String")}
+
+
+def _csv_members(path):
+    """Yield (name, text stream) for each CSV file in a zip archive or a single CSV."""
+    path = Path(path)
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            for info in archive.infolist():
+                if info.is_dir() or not info.filename.lower().endswith(".csv"):
+                    continue
+                with archive.open(info) as raw:
+                    yield info.filename, io.TextIOWrapper(raw, encoding="utf-8-sig", newline="")
+    else:
+        with open(path, encoding="utf-8-sig", newline="") as f:
+            yield path.name, f
+
+
+def _rows(member_name, stream):
+    """Yield (attribute, date, value) from one CSV file, whatever its layout."""
+    reader = csv.reader(stream)
+    header = [column.strip() for column in next(reader, [])]
+    lowered = [column.lower() for column in header]
+    if "date" not in lowered:
+        print(f"  {member_name}: no date column, skipping", file=sys.stderr)
+        return
+    date_col = lowered.index("date")
+
+    name_col = next((lowered.index(c) for c in ("attribute", "name") if c in lowered), None)
+    if name_col is not None and "value" in lowered:
+        value_col = lowered.index("value")
+        for row in reader:
+            if len(row) > max(name_col, date_col, value_col):
+                yield row[name_col], row[date_col], row[value_col]
+        return
+
+    if lowered == ["date", "value"] or lowered == ["value", "date"]:
+        columns = [(lowered.index("value"), Path(member_name).stem)]
+    else:
+        columns = [(i, name) for i, name in enumerate(header) if i != date_col]
+    for row in reader:
+        for i, name in columns:
+            if i < len(row):
+                yield name, row[date_col], row[i]
+
+
+def _add_placeholders(conn, names):
+    """Insert placeholder metadata for imported attributes with no attributes row.
+
+    Returns {name: value_type} for the placeholders added.
+    """
+    known = {row[0] for row in conn.execute("SELECT name FROM attributes")}
+    missing = sorted(set(names) - known)
+    now = datetime.now(UTC).isoformat()
+    added = {}
+    for priority, name in enumerate(missing, start=1):
+        kinds = {
+            row[0]
+            for row in conn.execute(
+                "SELECT DISTINCT typeof(d.value) FROM attribute_data d "
+                "JOIN attribute_ids n ON n.id = d.attribute_id WHERE n.name = ?",
+                (name,),
+            )
+        }
+        kind = "text" if "text" in kinds else "real" if "real" in kinds else "integer"
+        value_type, description = VALUE_TYPES[kind]
+        group_name, group_label, group_priority = PLACEHOLDER_GROUP
+        conn.execute(
+            """INSERT OR IGNORE INTO attributes
+            (name, label, group_name, group_label, group_priority, priority,
+             value_type, value_type_description, manual, active, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, 0, 1, ?)""",
+            (name, name.replace("_", " ").capitalize(), group_name, group_label, group_priority,
+             priority, value_type, description, now),
+        )
+        added[name] = value_type
+    return added
+
+
+@metrics.timed("import")
+def import_archive(conn, path, batch_size=DEFAULT_BATCH_SIZE):
+    """Stream an Exist.io CSV export into the database.
+
+    Rows are written with executemany in transactions of `batch_size`
+    values. Values of known manual attributes are recorded as synced in
+    the same transaction, since the export came from Exist.io and push
+    must not send them back. Empty cells and rows with unparseable dates
+    are skipped.
+    Returns a report dict: files, attributes, values, skipped,
+    placeholders, watermark (latest imported date).
+    """
+    conn.execute("PRAGMA synchronous=NORMAL")
+    ids = {}
+    manual_names = {row[0] for row in conn.execute("SELECT name FROM attributes WHERE manual = 1")}
+    manual = set()
+    batch = []
+    report = {"files": 0, "attributes": 0, "values": 0, "skipped": 0, "placeholders": 0, "watermark": None}
+    max_day = None
+
+    def flush():
+        db.write_value_rows(conn, batch)
+        db.mark_synced(conn, [row for row in batch if row["id"] in manual])
+        conn.commit()
+        report["values"] += len(batch)
+        batch.clear()
+
+    for member_name, stream in _csv_members(path):
+        report["files"] += 1
+        for name, date_str, value in _rows(member_name, stream):
+            name, value = name.strip(), value.strip()
+            if not name or value == "":
+                report["skipped"] += 1
+                continue
+            try:
+                day = date.fromisoformat(date_str.strip()).toordinal() - db.EPOCH_ORDINAL
+            except ValueError:
+                report["skipped"] += 1
+                continue
+            attribute_id = ids.get(name)
+            if attribute_id is None:
+                attribute_id = ids[name] = db.get_attribute_id(conn, name)
+                if name in manual_names:
+                    manual.add(attribute_id)
+            batch.append({"id": attribute_id, "day": day, "value": value})
+            max_day = day if max_day is None else max(max_day, day)
+            if len(batch) >= batch_size:
+                flush()
+                print(f"  {report['values']:,} values imported...", file=sys.stderr)
+    if batch:
+        flush()
+
+    report["attributes"] = len(ids)
+    placeholders = _add_placeholders(conn, ids)
+    report["placeholders"] = len(placeholders)
+    if VALUE_TYPES["text"][0] in placeholders.values():
+        # Values were written before their attribute was known to be text
+        db.rebuild_search_index(conn)
+    for name, value_type in placeholders.items():
+        # Likewise numeric ones had no value type to roll up under
+        if value_type in db.ROLLUP_TYPES:
+            db.rebuild_rollups(conn, ids[name])
+    report["watermark"] = db.day_to_date(max_day) if max_day is not None else None
+    db.write_sync_log(conn, "import", report["attributes"], report["values"], "success")
+    return report
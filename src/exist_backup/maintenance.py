@@ -0,0 +1,170 @@
+"""Database housekeeping: statistics, vacuum and WAL checkpoints.
+
+Repeated syncs rewrite rows with INSERT OR REPLACE, which leaves free pages
+behind, and the WAL only shrinks when it is checkpointed with TRUNCATE.
+``maintain`` runs the whole routine and reports what it reclaimed together
+with query plans and timings for the queries export and the API rely on.
+It can run on demand (``exist-backup maintain``) or after a sync once the
+WAL or free space passes the ``[maintenance]`` thresholds.
+"""
+
+import os
+import sys
+import time
+from datetime import date, timedelta
+
+from . import db, metrics
+
+AUTO_VACUUM_MODES = {0: "none", 1: "full", 2: "incremental"}
+
+
+def file_sizes(conn, db_path):
+    """Current on-disk size of the database and its WAL, plus free page stats."""
+    wal_path = f"{db_path}-wal"
+    return {
+        "db_bytes": os.path.getsize(db_path),
+        "wal_bytes": os.path.getsize(wal_path) if os.path.exists(wal_path) else 0,
+        "page_count": conn.execute("PRAGMA page_count").fetchone()[0],
+        "freelist_pages": conn.execute("PRAGMA freelist_count").fetchone()[0],
+        "page_size": conn.execute("PRAGMA page_size").fetchone()[0],
+    }
+
+
+def maintenance_due(conn, db_path, settings):
+    """Return the reason post-sync maintenance should run, or None.
+
+    `settings` is the [maintenance] config section; thresholds are wal_mb
+    (WAL size) and freelist_pct (share of free pages in the database).
+    """
+    sizes = file_sizes(conn, db_path)
+    wal_mb = float(settings.get("wal_mb", 64))
+    freelist_pct = float(settings.get("freelist_pct", 10))
+    if sizes["wal_bytes"] >= wal_mb * 1024 * 1024:
+        return f"WAL is {sizes['wal_bytes']:,} bytes"
+    if sizes["page_count"] and 100 * sizes["freelist_pages"] / sizes["page_count"] >= freelist_pct:
+        return f"{sizes['freelist_pages']} of {sizes['page_count']} pages are free"
+    return None
+
+
+def _has_statistics(conn):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'").fetchone() is not None
+
+
+def _explain_queries(conn):
+    """Time the common read queries and capture their plans.
+
+    The statements are captured from the db functions themselves (via the
+    trace callback) so the plans always match what the application runs.
+    """
+    row = conn.execute(
+        "SELECT (SELECT date FROM calendar WHERE day = (SELECT MAX(day) FROM attribute_data)), "
+        "(SELECT MIN(name) FROM attribute_ids)"
+    ).fetchone()
+    max_date, attribute_name = row[0], row[1]
+    if max_date is None:
+        return []
+    month_ago = (date.fromisoformat(max_date) - timedelta(days=30)).isoformat()
+
+    queries = [
+        ("values_for_date", lambda: db.get_values_for_date(conn, max_date)),
+        ("values_for_range", lambda: db.get_values_for_date_range(conn, month_ago, max_date)),
+        ("attribute_range", lambda: db.query_values(conn, attribute_name, month_ago, max_date)),
+        ("last_sync_date", lambda: db.get_last_sync_date(conn, attribute_name)),
+    ]
+    results = []
+    for name, query in queries:
+        statements = []
+        conn.set_trace_callback(statements.append)
+        try:
+            start = time.perf_counter()
+            query()
+            elapsed = time.perf_counter() - start
+        finally:
+            conn.set_trace_callback(None)
+        plan = [
+            detail
+            for sql in statements
+            for *_, detail in conn.execute(f"EXPLAIN QUERY PLAN {sql}").fetchall()
+        ]
+        results.append({
+            "name": name,
+            "ms": round(elapsed * 1000, 2),
+            "plan": plan,
+            "full_scan": any(step.startswith("SCAN d") or step == "SCAN attribute_data" for step in plan),
+        })
+    return results
+
+
+@metrics.timed("maintain")
+def maintain(conn, db_path, full_vacuum=False, analyze=False, explain=True):
+    """Analyze, vacuum and checkpoint the database.
+
+    - ANALYZE when forced or when no statistics exist yet, otherwise
+      PRAGMA optimize (re-analyzes only tables whose stats are stale)
+    - incremental vacuum to release free pages; a full VACUUM when
+      `full_vacuum` is set, which also switches older databases to
+      auto_vacuum=INCREMENTAL so later runs can vacuum incrementally
+    - wal_checkpoint(TRUNCATE) to fold the WAL back and shrink it to zero
+
+    Returns a report with before/after sizes, the steps taken, the
+    checkpoint result and (when `explain` is set) query plan stats.
+    """
+    before = file_sizes(conn, db_path)
+    steps = []
+
+    if analyze or not _has_statistics(conn):
+        conn.execute("ANALYZE")
+        steps.append("analyze")
+    else:
+        conn.execute("PRAGMA analysis_limit=1000")
+        conn.execute("PRAGMA optimize")
+        steps.append("optimize")
+    conn.commit()
+
+    auto_vacuum = AUTO_VACUUM_MODES[conn.execute("PRAGMA auto_vacuum").fetchone()[0]]
+    if full_vacuum:
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.execute("VACUUM")
+        auto_vacuum = AUTO_VACUUM_MODES[conn.execute("PRAGMA auto_vacuum").fetchone()[0]]
+        steps.append("vacuum")
+    elif auto_vacuum == "incremental" and before["freelist_pages"]:
+        conn.execute("PRAGMA incremental_vacuum").fetchall()  # frees one page per step
+        conn.commit()
+        steps.append("incremental_vacuum")
+
+    busy, wal_frames, checkpointed = conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+    steps.append("checkpoint")
+
+    after = file_sizes(conn, db_path)
+    reclaimed = (before["db_bytes"] + before["wal_bytes"]) - (after["db_bytes"] + after["wal_bytes"])
+    metrics.count("maintain_reclaimed_bytes", max(reclaimed, 0))
+    return {
+        "before": before,
+        "after": after,
+        "reclaimed_bytes": reclaimed,
+        "auto_vacuum": auto_vacuum,
+        "steps": steps,
+        "checkpoint": {"busy": bool(busy), "wal_frames": wal_frames, "checkpointed": checkpointed},
+        "queries": _explain_queries(conn) if explain else [],
+    }
+
+
+def auto_maintain(conn, config):
+    """Post-sync hook: run maintenance if enabled and a threshold is crossed.
+
+    Returns the maintain() report, or None if nothing ran.
+    """
+    settings = config.get("maintenance", {})
+    if not settings.get("auto", False):
+        return None
+    db_path = config["sync"]["database"]
+    reason = maintenance_due(conn, db_path, settings)
+    if reason is None:
+        return None
+    print(f"Running maintenance ({reason})", file=sys.stderr)
+    report = maintain(conn, db_path, explain=False)
+    print(
+        f"  {', '.join(report['steps'])}: reclaimed {report['reclaimed_bytes']:,} bytes",
+        file=sys.stderr,
+    )
+    return report
@@ -0,0 +1,159 @@
+"""Lightweight process-wide timers and counters.
+
+Hot paths are wrapped with ``timer``/``timed`` (HTTP requests, database
+writes, template rendering, file writes) and bump counters with ``count``.
+The collected numbers can be dumped as JSON, written as a Prometheus
+textfile for node_exporter, or persisted next to the sync log.
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from pathlib import Path
+
+PROMETHEUS_PREFIX = "exist_backup"
+
+_lock = threading.Lock()
+_timers = {}  # (name, labels) -> [count, total_seconds]
+_counters = {}  # (name, labels) -> value
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def reset():
+    """Forget everything recorded so far."""
+    with _lock:
+        _timers.clear()
+        _counters.clear()
+
+
+def record(name, seconds, **labels):
+    """Add one observation of `seconds` to a timer."""
+    key = _key(name, labels)
+    with _lock:
+        entry = _timers.setdefault(key, [0, 0.0])
+        entry[0] += 1
+        entry[1] += seconds
+
+
+def count(name, n=1, **labels):
+    """Increment a counter."""
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + n
+
+
+@contextmanager
+def timer(name, **labels):
+    """Time the enclosed block."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start, **labels)
+
+
+def timed(name, **labels):
+    """Decorator form of timer()."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with timer(name, **labels):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _format_key(name, labels):
+    if not labels:
+        return name
+    return name + "{" + ",".join(f"{k}={v}" for k, v in labels) + "}"
+
+
+def snapshot():
+    """Return current metrics as plain dicts keyed by "name{label=value}"."""
+    with _lock:
+        timers = {
+            _format_key(name, labels): {"count": c, "seconds": round(s, 6)}
+            for (name, labels), (c, s) in sorted(_timers.items())
+        }
+        counters = {_format_key(name, labels): v for (name, labels), v in sorted(_counters.items())}
+    return {"timers": timers, "counters": counters}
+
+
+def since(earlier):
+    """Metrics recorded after an earlier snapshot() (for per-run summaries)."""
+    now = snapshot()
+    timers = {}
+    for key, entry in now["timers"].items():
+        before = earlier["timers"].get(key, {"count": 0, "seconds": 0.0})
+        if entry["count"] > before["count"]:
+            timers[key] = {
+                "count": entry["count"] - before["count"],
+                "seconds": round(entry["seconds"] - before["seconds"], 6),
+            }
+    counters = {
+        key: value - earlier["counters"].get(key, 0)
+        for key, value in now["counters"].items()
+        if value != earlier["counters"].get(key, 0)
+    }
+    return {"timers": timers, "counters": counters}
+
+
+def _atomic_write(path, text):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp_path.write_text(text)
+    os.replace(tmp_path, path)
+
+
+def write_json(path, data=None):
+    """Write metrics as JSON to `path` ("-" for stdout)."""
+    text = json.dumps(data or snapshot(), indent=2) + "\n"
+    if str(path) == "-":
+        print(text, end="")
+    else:
+        _atomic_write(path, text)
+
+
+def _prometheus_labels(labels):
+    if not labels:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"') for _, v in labels)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(labels, escaped)) + "}"
+
+
+def prometheus_text():
+    """Render metrics in the Prometheus text exposition format."""
+    with _lock:
+        timers = sorted(_timers.items())
+        counters = sorted(_counters.items())
+
+    lines = []
+    seen = set()
+    for (name, labels), (c, s) in timers:
+        metric = f"{PROMETHEUS_PREFIX}_{name}"
+        if metric not in seen:
+            seen.add(metric)
+            lines.append(f"# TYPE {metric}_seconds_total counter")
+            lines.append(f"# TYPE {metric}_count counter")
+        lines.append(f"{metric}_seconds_total{_prometheus_labels(labels)} {s:.6f}")
+        lines.append(f"{metric}_count{_prometheus_labels(labels)} {c}")
+    for (name, labels), value in counters:
+        metric = f"{PROMETHEUS_PREFIX}_{name}_total"
+        if metric not in seen:
+            seen.add(metric)
+            lines.append(f"# TYPE {metric} counter")
+        lines.append(f"{metric}{_prometheus_labels(labels)} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(path):
+    """Write a node_exporter textfile-collector file atomically."""
+    _atomic_write(path, prometheus_text())
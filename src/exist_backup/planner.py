@@ -0,0 +1,169 @@
+"""Sync planning: a fetch strategy per attribute and the expected request cost.
+
+The plan is built from the database alone (stored attributes, the latest
+stored day of each one, and the HTTP timings persisted in sync_metrics),
+so `sync --plan` makes no API calls. `run_sync` executes the same plan.
+
+Strategies:
+- bulk: covered by one ``attributes/with-values/`` window (at most 31
+  days, shared by all attributes)
+- tail: stored values end before that window; the bulk window plus the
+  attribute's own ``attributes/values/`` pages back to its last stored day
+- full: the attribute's whole history through ``attributes/values/``
+  (``sync --full``)
+- current: nothing newer than the last stored day to fetch
+
+Attributes excluded by the [sync] selection rules are left out of the plan.
+"""
+
+import math
+import re
+from datetime import date, timedelta
+
+from . import db
+
+BULK, TAIL, FULL, CURRENT = "bulk", "tail", "full", "current"
+MAX_WINDOW_DAYS = 31
+PAGE_LIMIT = 100
+
+# Exist.io allows 300 requests per hour per token and client
+RATE_LIMIT_REQUESTS = 300
+RATE_LIMIT_WINDOW = 3600
+# Assumed until sync_metrics has timings for an endpoint
+DEFAULT_REQUEST_SECONDS = 0.5
+# Assumed history length for attributes with nothing stored yet, in an empty database
+DEFAULT_HISTORY_DAYS = 365
+
+_ENDPOINT_KEY = re.compile(r"^http_request\{endpoint=([^,}]*)\}$")
+
+
+def _pages(items):
+    return max(1, math.ceil(items / PAGE_LIMIT))
+
+
+def _watermarks(conn, filters=None):
+    """(name, last stored day, first stored day, density) per stored attribute, in display order.
+
+    Days written by `sync --today` don't count as stored until a regular
+    sync has fetched them complete.
+
+    density is the share of days in the stored range that have a value,
+    used to estimate how many values a range of days will return.
+    """
+    where, params = db.filter_clause(filters)
+    where = f"WHERE {where} " if where else ""
+    rows = conn.execute(
+        "SELECT a.name, "
+        "(SELECT max(day) FROM attribute_data WHERE attribute_id = n.id "
+        "AND day NOT IN (SELECT day FROM partial_days)), "
+        "(SELECT min(day) FROM attribute_data WHERE attribute_id = n.id), "
+        "(SELECT count(*) FROM attribute_data WHERE attribute_id = n.id) "
+        "FROM attributes a LEFT JOIN attribute_ids n ON n.name = a.name "
+        f"{where}ORDER BY a.group_priority, a.priority",
+        params,
+    ).fetchall()
+    return [
+        (name, last_day, first_day, count / (last_day - first_day + 1) if count else 1.0)
+        for name, last_day, first_day, count in rows
+    ]
+
+
+def build_plan(conn, full=False, date_max=None, filters=None):
+    """Choose a strategy for each stored attribute and count the requests it needs.
+
+    `filters` are the [sync] selection rules (db.sync_filters_from_config).
+
+    Returns a dict with date_max, full, bulk_days (0 = no bulk window),
+    attributes (list of dicts with name, strategy, since, days, requests)
+    and requests ({endpoint: count}, including the profile request).
+    """
+    date_max = date_max or date.today() - timedelta(days=1)
+    last = db.date_to_day(date_max)
+    rows = _watermarks(conn, filters)
+    requests = {"accounts/profile/": 1}
+    entries = []
+
+    if full:
+        earliest = conn.execute("SELECT min(day) FROM attribute_data").fetchone()[0]
+        default_days = last - earliest + 1 if earliest is not None else DEFAULT_HISTORY_DAYS
+        requests["attributes/"] = _pages(len(rows))
+        for name, last_day, first_day, density in rows:
+            days = last - first_day + 1 if first_day is not None else default_days
+            entries.append({"name": name, "strategy": FULL, "since": None, "days": days,
+                            "requests": _pages(math.ceil(days * density))})
+        requests["attributes/values/"] = sum(e["requests"] for e in entries)
+        return {"date_max": str(date_max), "full": True, "bulk_days": 0, "attributes": entries, "requests": requests}
+
+    stored = [last_day for _, last_day, _, _ in rows if last_day is not None]
+    behind = [last - last_day for last_day in stored if last_day < last]
+    if not stored:
+        bulk_days = MAX_WINDOW_DAYS
+    elif behind:
+        bulk_days = max(1, min(MAX_WINDOW_DAYS, max(behind)))
+    else:
+        bulk_days = 0
+
+    for name, last_day, _, density in rows:
+        since = db.day_to_date(last_day) if last_day is not None else None
+        if last_day is not None and last_day >= last:
+            entries.append({"name": name, "strategy": CURRENT, "since": since, "days": 0, "requests": 0})
+        elif last_day is not None and last - last_day > bulk_days:
+            # Values before the window, plus the already stored one that ends the walk back
+            expected = math.ceil((last - last_day - bulk_days) * density) + 1
+            entries.append({"name": name, "strategy": TAIL, "since": since, "days": last - last_day,
+                            "requests": _pages(expected)})
+        else:
+            # Attributes with nothing stored ride along in the bulk window when there is one
+            days = last - last_day if last_day is not None else bulk_days
+            entries.append({"name": name, "strategy": BULK if bulk_days else CURRENT, "since": since,
+                            "days": days if bulk_days else 0, "requests": 0})
+
+    if bulk_days:
+        requests["attributes/with-values/"] = _pages(len(rows))
+    tail = sum(e["requests"] for e in entries if e["strategy"] == TAIL)
+    if tail:
+        requests["attributes/values/"] = tail
+    return {"date_max": str(date_max), "full": False, "bulk_days": bulk_days, "attributes": entries,
+            "requests": requests}
+
+
+def request_timings(conn):
+    """Average seconds per request by endpoint, and throttle wait per request, from sync_metrics."""
+    timings = {}
+    total_requests = 0
+    for name, count, seconds in conn.execute(
+        "SELECT name, sum(count), sum(seconds) FROM sync_metrics "
+        "WHERE kind = 'timer' AND name LIKE 'http_request{%' GROUP BY name"
+    ):
+        match = _ENDPOINT_KEY.match(name)
+        if match and count:
+            timings[match.group(1)] = seconds / count
+            total_requests += count
+    waited = conn.execute(
+        "SELECT coalesce(sum(seconds), 0) FROM sync_metrics "
+        "WHERE kind = 'timer' AND name LIKE 'http_throttle_wait{%'"
+    ).fetchone()[0]
+    return timings, (waited / total_requests if total_requests else 0.0)
+
+
+def estimate(conn, plan):
+    """Expected wall time for a plan: request time from past syncs plus rate-limit waits.
+
+    Returns a dict with requests (total), request_seconds, throttle_seconds,
+    seconds and history (number of past syncs with metrics).
+    """
+    timings, wait_per_request = request_timings(conn)
+    fallback = sum(timings.values()) / len(timings) if timings else DEFAULT_REQUEST_SECONDS
+    total = sum(plan["requests"].values())
+    request_seconds = sum(count * timings.get(endpoint, fallback) for endpoint, count in plan["requests"].items())
+    # Past throttling, or at least the waits the documented quota forces on a run this size
+    quota_wait = ((total - 1) // RATE_LIMIT_REQUESTS) * RATE_LIMIT_WINDOW if total else 0
+    throttle_seconds = max(total * wait_per_request, quota_wait)
+    history = conn.execute("SELECT count(DISTINCT sync_id) FROM sync_metrics").fetchone()[0]
+    return {
+        "requests": total,
+        "request_seconds": round(request_seconds, 1),
+        "throttle_seconds": round(throttle_seconds, 1),
+        "seconds": round(request_seconds + throttle_seconds, 1),
+        "history": history,
+    }
@@ -0,0 +1,195 @@
+"""Opt-in profiling for CLI commands.
+
+Two modes:
+- deterministic: cProfile, written as a pstats file (open with snakeviz,
+  ``python -m pstats`` etc.)
+- sampling: a background thread samples the main thread's stack every few
+  milliseconds and writes a speedscope JSON profile (https://speedscope.app)
+
+Functions on the hot path are tagged with ``hot_path`` so they stand out:
+sampled frames are named ``[tag] function`` and a per-tag summary is
+printed when profiling stops. Optionally tracemalloc tracks allocations.
+"""
+
+import cProfile
+import inspect
+import json
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+
+# (co_filename, co_firstlineno, co_name) -> tag
+HOT_PATHS = {}
+
+TOP_ALLOCATIONS = 15
+
+
+def hot_path(tag):
+    """Tag a function as a hot path for profiler output. Adds no runtime cost."""
+    def decorator(func):
+        code = inspect.unwrap(func).__code__
+        HOT_PATHS[(code.co_filename, code.co_firstlineno, code.co_name)] = tag
+        return func
+    return decorator
+
+
+def _tag_for(code):
+    return HOT_PATHS.get((code.co_filename, code.co_firstlineno, code.co_name))
+
+
+class StackSampler:
+    """Samples one thread's Python stack on an interval."""
+
+    def __init__(self, interval=0.001, thread_id=None):
+        self.interval = interval
+        self.thread_id = thread_id or threading.main_thread().ident
+        self.frames = []  # speedscope frame dicts
+        self._frame_index = {}
+        self.samples = []
+        self.weights = []
+        self._stop = threading.Event()
+        self._thread = None
+        self.start_time = self.end_time = None
+
+    def _index(self, code):
+        key = (code.co_filename, code.co_firstlineno, code.co_qualname)
+        idx = self._frame_index.get(key)
+        if idx is None:
+            tag = _tag_for(code)
+            name = f"[{tag}] {code.co_qualname}" if tag else code.co_qualname
+            idx = self._frame_index[key] = len(self.frames)
+            self.frames.append({"name": name, "file": code.co_filename, "line": code.co_firstlineno})
+        return idx
+
+    def _run(self):
+        last = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            now = time.perf_counter()
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(self._index(frame.f_code))
+                frame = frame.f_back
+            stack.reverse()
+            self.samples.append(stack)
+            self.weights.append(now - last)
+            last = now
+
+    def start(self):
+        self.start_time = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.end_time = time.perf_counter()
+
+    def tag_totals(self):
+        """Seconds of samples with each tagged function on the stack."""
+        tags = {i: _tag_for_name(f["name"]) for i, f in enumerate(self.frames)}
+        totals = {}
+        for stack, weight in zip(self.samples, self.weights):
+            for tag in {tags[i] for i in stack if tags[i]}:
+                totals[tag] = totals.get(tag, 0.0) + weight
+        return totals
+
+    def speedscope(self, name):
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "shared": {"frames": self.frames},
+            "profiles": [{
+                "type": "sampled",
+                "name": name,
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": self.end_time - self.start_time,
+                "samples": self.samples,
+                "weights": self.weights,
+            }],
+            "name": name,
+            "activeProfileIndex": 0,
+            "exporter": "exist-backup",
+        }
+
+
+def _tag_for_name(frame_name):
+    if frame_name.startswith("["):
+        return frame_name[1:frame_name.index("]")]
+    return None
+
+
+class Profiler:
+    """Profile a block of work and write the result to `path`."""
+
+    def __init__(self, path, mode="deterministic", interval_ms=1.0, trace_alloc=False, name="exist-backup"):
+        if mode not in ("deterministic", "sampling"):
+            raise ValueError(f"Unknown profile mode: {mode}")
+        self.path = Path(path)
+        self.mode = mode
+        self.interval = interval_ms / 1000
+        self.trace_alloc = trace_alloc
+        self.name = name
+        self._profile = None
+        self._sampler = None
+
+    def start(self):
+        if self.trace_alloc:
+            tracemalloc.start(25)
+        if self.mode == "deterministic":
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        else:
+            self._sampler = StackSampler(self.interval)
+            self._sampler.start()
+
+    def stop(self):
+        """Stop profiling, write the profile and print a summary to stderr."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if self._profile is not None:
+            self._profile.disable()
+            self._profile.dump_stats(self.path)
+            totals = self._pstats_tag_totals()
+        else:
+            self._sampler.stop()
+            with open(self.path, "w") as f:
+                json.dump(self._sampler.speedscope(self.name), f)
+            totals = {tag: (None, seconds) for tag, seconds in self._sampler.tag_totals().items()}
+
+        print(f"Profile written to {self.path}", file=sys.stderr)
+        if totals:
+            print("Hot paths (cumulative):", file=sys.stderr)
+            for tag, (calls, seconds) in sorted(totals.items(), key=lambda kv: -kv[1][1]):
+                calls_text = f"{calls:>9} calls" if calls is not None else ""
+                print(f"  {tag:<20} {seconds:>9.3f}s {calls_text}", file=sys.stderr)
+
+        if self.trace_alloc:
+            self._write_allocations()
+
+    def _pstats_tag_totals(self):
+        stats = pstats.Stats(self._profile).stats
+        totals = {}
+        for (filename, line, funcname), (_, ncalls, _, cumtime, _) in stats.items():
+            tag = HOT_PATHS.get((filename, line, funcname))
+            if tag:
+                calls, seconds = totals.get(tag, (0, 0.0))
+                totals[tag] = (calls + ncalls, max(seconds, cumtime))
+        return totals
+
+    def _write_allocations(self):
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        alloc_path = self.path.with_name(self.path.name + ".alloc.txt")
+        lines = [f"current={current} peak={peak} bytes", ""]
+        for stat in snapshot.statistics("traceback")[:TOP_ALLOCATIONS]:
+            lines.append(f"{stat.size:>12,} bytes in {stat.count:>8,} blocks")
+            lines.extend(f"    {line}" for line in stat.traceback.format(limit=8))
+            lines.append("")
+        alloc_path.write_text("\n".join(lines))
+        print(f"Allocations: peak {peak:,} bytes, top sites in {alloc_path}", file=sys.stderr)
@@ -0,0 +1,98 @@
+"""Push locally changed values of manual attributes back to Exist.io."""
+
+import sys
+import time
+
+from . import api, db, metrics
+
+
+def _plan(pending, increment_names):
+    """Split pending rows into (updates, increments) payloads keyed back to their rows.
+
+    Attributes listed in [push] increment are sent as the difference from
+    the synced value through the increment endpoint (so concurrent
+    increments from other apps aren't overwritten); everything else is set.
+    """
+    updates, increments = [], []
+    for row in pending:
+        value = row["value"]
+        if row["name"] in increment_names and isinstance(value, (int, float)):
+            delta = value - (row["synced_value"] or 0)
+            increments.append((row, {"name": row["name"], "date": row["date"], "value": delta}))
+        else:
+            updates.append((row, {"name": row["name"], "date": row["date"], "value": value}))
+    return updates, increments
+
+
+def _send(conn, send, planned):
+    """Send one kind of write and record the outcome. Returns (pushed, failed) lists of rows."""
+    if not planned:
+        return [], []
+    result = send([payload for _, payload in planned])
+    by_key = {(p["name"], p["date"]): row for row, p in planned}
+    ok_keys = {(v["name"], v["date"]) for v in result["success"]}
+    failed = []
+    for value in result["failed"]:
+        row = by_key.get((value.get("name"), value.get("date")))
+        if row is not None and (row["name"], row["date"]) not in ok_keys:
+            failed.append({"id": row["attribute_id"], "day": row["day"], "name": row["name"],
+                           "date": row["date"], "error": value.get("error") or value.get("error_code")})
+    failed_keys = {(f["name"], f["date"]) for f in failed}
+    # Values the server neither confirmed nor rejected are left pending for the next push
+    pushed = [row for key, row in by_key.items() if key in ok_keys and key not in failed_keys]
+    db.mark_synced(conn, [{"id": r["attribute_id"], "day": r["day"], "value": r["value"]} for r in pushed])
+    db.mark_push_failed(conn, failed)
+    conn.commit()
+    return pushed, failed
+
+
+def run_push(config, dry_run=False):
+    """Send manual attribute values that changed locally since the last sync.
+
+    Values are sent in batches of api.MAX_WRITE_BATCH; 429 responses are
+    retried after Retry-After by the client. Confirmed values become the
+    new synced state, failures are kept pending with their error, and the
+    run is recorded in sync_log as a "push".
+
+    Returns dict with keys: pending, pushed, failed (list of dicts with
+    name, date, error), status.
+    """
+    token = config["auth"]["token"]
+    if not token:
+        raise SystemExit("No API token configured. Set EXIST_TOKEN or auth.token in config.toml.")
+
+    conn = db.connect(config["sync"]["database"], **db.connection_options(config["sync"]))
+    db.init_db(conn)
+    pending = db.get_pending_manual_values(conn)
+    increment_names = set(config.get("push", {}).get("increment", []))
+    updates, increments = _plan(pending, increment_names)
+
+    print(f"{len(pending)} changed values ({len(updates)} updates, {len(increments)} increments)", file=sys.stderr)
+    if dry_run or not pending:
+        for row in pending:
+            print(f"  {row['date']} {row['name']}: {row['synced_value']!r} -> {row['value']!r}", file=sys.stderr)
+        conn.close()
+        return {"pending": len(pending), "pushed": 0, "failed": [], "status": "dry-run" if dry_run else "success"}
+
+    started_at = time.perf_counter()
+    client = api.client_from_config(config)
+    pushed_updates, failed_updates = _send(conn, client.update_attributes, updates)
+    pushed_increments, failed_increments = _send(conn, client.increment_attributes, increments)
+    pushed = pushed_updates + pushed_increments
+    failed = failed_updates + failed_increments
+    metrics.record("push_run", time.perf_counter() - started_at)
+    metrics.count("push_values", len(pushed), result="pushed")
+    metrics.count("push_values", len(failed), result="failed")
+
+    status = "success" if len(pushed) == len(pending) else "partial" if pushed else "error"
+    errors = [f"{f['name']} {f['date']}: {f['error']}" for f in failed]
+    db.write_sync_log(
+        conn, "push", len({row["name"] for row in pushed}), len(pushed), status,
+        "\n".join(errors) if errors else None,
+    )
+    conn.close()
+
+    print(f"Pushed {len(pushed)} of {len(pending)} values ({status})", file=sys.stderr)
+    for e in errors:
+        print(f"  {e}", file=sys.stderr)
+    return {"pending": len(pending), "pushed": len(pushed), "failed": failed, "status": status}
@@ -0,0 +1,230 @@
+"""Personal records and streaks, maintained incrementally.
+
+For every numeric attribute the highest and lowest values (and their days)
+are kept; for booleans, and numeric attributes with a goal configured under
+``[records] goals``, the current and longest streak of consecutive days
+that met the goal. One row per attribute lives in ``attribute_records``.
+
+After a sync only the values newer than an attribute's ``processed_day``
+watermark are folded in. If a sync touched a day at or before the
+watermark (a backfill or a corrected value), or the goal changed, that
+attribute is recomputed from its full history instead. Folding all values
+in day order from an empty state is the full recompute, so both paths
+produce the same result. Partial days written by ``sync --today`` are left
+out until a regular sync finalizes them, so the watermark never passes a
+day whose value may still change.
+"""
+
+from . import db, metrics
+
+BOOLEAN_TYPE = 7
+# Integer, float, duration, percentage, scale; times of day and text have no ordering worth a record
+NUMERIC_TYPES = {0, 1, 3, 5, 8}
+
+COLUMNS = (
+    "attribute_id", "goal", "processed_day",
+    "max_value", "max_day", "min_value", "min_day",
+    "current_streak", "current_streak_start",
+    "longest_streak", "longest_streak_start", "last_hit_day",
+)
+
+
+def goal_for(name, value_type, goals):
+    """The streak goal for an attribute: 1 for booleans, else from [records] goals."""
+    if value_type == BOOLEAN_TYPE:
+        return 1.0
+    if value_type in NUMERIC_TYPES and name in goals:
+        return float(goals[name])
+    return None
+
+
+def _tracked(value_type, goal):
+    return value_type in NUMERIC_TYPES or goal is not None
+
+
+def _empty_state(attribute_id, goal):
+    state = dict.fromkeys(COLUMNS)
+    state.update(attribute_id=attribute_id, goal=goal, processed_day=-1, current_streak=0, longest_streak=0)
+    return state
+
+
+def fold(state, rows, value_type):
+    """Fold (day, value) rows, in ascending day order, into a record state."""
+    goal = state["goal"]
+    for day, value in rows:
+        state["processed_day"] = day
+        try:
+            number = float(value)
+        except (TypeError, ValueError):
+            if goal is not None:
+                # A day without a usable value doesn't meet the goal
+                state["current_streak"] = 0
+            continue
+
+        if value_type in NUMERIC_TYPES:
+            if state["max_value"] is None or number > float(state["max_value"]):
+                state["max_value"], state["max_day"] = value, day
+            if state["min_value"] is None or number < float(state["min_value"]):
+                state["min_value"], state["min_day"] = value, day
+
+        if goal is None:
+            continue
+        if number >= goal:
+            if state["current_streak"] and state["last_hit_day"] == day - 1:
+                state["current_streak"] += 1
+            else:
+                state["current_streak"], state["current_streak_start"] = 1, day
+            state["last_hit_day"] = day
+            if state["current_streak"] > state["longest_streak"]:
+                state["longest_streak"] = state["current_streak"]
+                state["longest_streak_start"] = state["current_streak_start"]
+        else:
+            state["current_streak"] = 0
+    return state
+
+
+def _load(conn, attribute_id):
+    row = conn.execute(
+        f"SELECT {', '.join(COLUMNS)} FROM attribute_records WHERE attribute_id = ?", (attribute_id,)
+    ).fetchone()
+    return dict(zip(COLUMNS, row)) if row else None
+
+
+def _save(conn, state):
+    conn.execute(
+        f"INSERT OR REPLACE INTO attribute_records ({', '.join(COLUMNS)}) "
+        f"VALUES ({', '.join('?' * len(COLUMNS))})",
+        [state[c] for c in COLUMNS],
+    )
+
+
+def _refresh(conn, attribute_id, value_type, goal, since_day=None):
+    """Fold values after the watermark into the stored state, or recompute from scratch.
+
+    since_day is the earliest day changed since the last update (None = unknown).
+    Returns True if the attribute was fully recomputed.
+    """
+    state = _load(conn, attribute_id)
+    full = (
+        state is None
+        or state["goal"] != goal
+        or since_day is None
+        or since_day <= state["processed_day"]
+    )
+    if full:
+        state = _empty_state(attribute_id, goal)
+    rows = conn.execute(
+        "SELECT day, value FROM attribute_data WHERE attribute_id = ? AND day > ? "
+        "AND day NOT IN (SELECT day FROM partial_days) ORDER BY day",
+        (attribute_id, state["processed_day"]),
+    )
+    _save(conn, fold(state, rows, value_type))
+    return full
+
+
+def _tracked_attributes(conn, goals):
+    """Yield (name, attribute_id, value_type, goal) for attributes that get records."""
+    for name, attribute_id, value_type in conn.execute(
+        "SELECT a.name, n.id, a.value_type FROM attributes a JOIN attribute_ids n ON n.name = a.name"
+    ):
+        goal = goal_for(name, value_type, goals)
+        if _tracked(value_type, goal):
+            yield name, attribute_id, value_type, goal
+
+
+@metrics.timed("records_update")
+def update(conn, touched, goals=None):
+    """Bring records up to date after a sync.
+
+    `touched` maps attribute name -> earliest date (YYYY-MM-DD) written in
+    this run. Attributes that have no records row yet, or whose goal
+    changed, are computed in full as well. Returns the number of
+    attributes updated.
+    """
+    goals = goals or {}
+    stored = {
+        row[0]: row[1] for row in conn.execute("SELECT attribute_id, goal FROM attribute_records")
+    }
+    updated = 0
+    for name, attribute_id, value_type, goal in _tracked_attributes(conn, goals):
+        if name in touched:
+            full = _refresh(conn, attribute_id, value_type, goal, db.date_to_day(touched[name]))
+            metrics.count("records_refreshed", mode="full" if full else "incremental")
+            updated += 1
+        elif attribute_id not in stored or stored[attribute_id] != goal:
+            _refresh(conn, attribute_id, value_type, goal)
+            metrics.count("records_refreshed", mode="full")
+            updated += 1
+    conn.commit()
+    return updated
+
+
+@metrics.timed("records_rebuild")
+def rebuild(conn, goals=None):
+    """Recompute every attribute's records from its full history."""
+    conn.execute("DELETE FROM attribute_records")
+    count = 0
+    for _, attribute_id, value_type, goal in _tracked_attributes(conn, goals or {}):
+        _refresh(conn, attribute_id, value_type, goal)
+        count += 1
+    conn.commit()
+    return count
+
+
+def _as_date(day):
+    return db.day_to_date(day) if day is not None else None
+
+
+def get_records(conn):
+    """Records keyed by attribute name, in display order, with days as ISO dates.
+
+    Each value is a dict with label, group_label, value_type, goal,
+    max_value/max_date, min_value/min_date, current_streak (+ _start/_end
+    dates) and longest_streak (+ _start/_end dates). A streak whose last
+    hit is older than the latest finalized day stored for any attribute
+    has ended, even if the attribute has no values since, and is not
+    reported as current.
+    """
+    latest = conn.execute(
+        "SELECT max(day) FROM attribute_data WHERE day NOT IN (SELECT day FROM partial_days)"
+    ).fetchone()[0]
+    rows = conn.execute(
+        "SELECT a.name, a.label, a.group_label, a.value_type, r.* FROM attribute_records r "
+        "JOIN attribute_ids n ON n.id = r.attribute_id JOIN attributes a ON a.name = n.name "
+        "ORDER BY a.group_priority, a.priority"
+    ).fetchall()
+    records = {}
+    for row in rows:
+        current = row["current_streak"] if latest is None or row["last_hit_day"] == latest else 0
+        current_end = row["last_hit_day"] if current else None
+        longest_end = (
+            row["longest_streak_start"] + row["longest_streak"] - 1 if row["longest_streak"] else None
+        )
+        records[row["name"]] = {
+            "label": row["label"],
+            "group_label": row["group_label"],
+            "value_type": row["value_type"],
+            "goal": row["goal"],
+            "max_value": row["max_value"],
+            "max_date": _as_date(row["max_day"]),
+            "min_value": row["min_value"],
+            "min_date": _as_date(row["min_day"]),
+            "current_streak": current,
+            "current_streak_start": _as_date(row["current_streak_start"] if current_end else None),
+            "current_streak_end": _as_date(current_end),
+            "longest_streak": row["longest_streak"],
+            "longest_streak_start": _as_date(row["longest_streak_start"]),
+            "longest_streak_end": _as_date(longest_end),
+        }
+    return records
+
+
+def streak_on(record, date_str):
+    """Length of the streak running on `date_str`, counted up to that day, or 0."""
+    for start, end in (
+        (record["current_streak_start"], record["current_streak_end"]),
+        (record["longest_streak_start"], record["longest_streak_end"]),
+    ):
+        if start and start <= date_str <= end:
+            return db.date_to_day(date_str) - db.date_to_day(start) + 1
+    return 0
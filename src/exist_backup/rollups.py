@@ -0,0 +1,157 @@
+"""Range statistics from the incrementally maintained rollup table.
+
+``attribute_rollups`` holds count, sum, min, max and sum of squares of each
+numeric attribute per week, month and year; db.refresh_rollups keeps the
+periods a write touched current. A date range is covered by the largest
+whole periods that fit inside it plus the leftover days at its edges, which
+are read from attribute_data, so a summary over years of history reads a
+few dozen rows per attribute instead of every value.
+
+`verify` compares the table with db.recompute_rollups, a from-scratch
+grouped scan that shares nothing with the incremental path but the period
+boundaries.
+"""
+
+import math
+
+from . import db, metrics
+
+
+def cover(first_day, last_day):
+    """Split [first_day, last_day] into whole periods and leftover day spans.
+
+    Returns (blocks, spans): blocks is a list of (period, start_day), using
+    the largest period that starts on a day and ends inside the range; spans
+    is a list of (first, last) day numbers covered by no block.
+    """
+    blocks, spans = [], []
+    day = first_day
+    while day <= last_day:
+        for period in reversed(db.ROLLUP_PERIODS):
+            start, end = db.period_bounds(day, period)
+            if start == day and end <= last_day:
+                blocks.append((period, start))
+                day = end + 1
+                break
+        else:
+            if spans and spans[-1][1] == day - 1:
+                spans[-1] = (spans[-1][0], day)
+            else:
+                spans.append((day, day))
+            day += 1
+    return blocks, spans
+
+
+def _merge(totals, attribute_id, count, total, low, high, sum_sq):
+    entry = totals.get(attribute_id)
+    if entry is None:
+        totals[attribute_id] = [count, total, low, high, sum_sq]
+    else:
+        entry[0] += count
+        entry[1] += total
+        entry[2] = min(entry[2], low)
+        entry[3] = max(entry[3], high)
+        entry[4] += sum_sq
+
+
+@metrics.timed("rollup_summary")
+def summarize(conn, date_from, date_to, filters=None):
+    """Statistics of every numeric attribute over [date_from, date_to], in display order.
+
+    `filters` is a dict of include_*/exclude_* lists as for
+    db.get_all_attributes. Returns {name: dict with label, value_type,
+    count, sum, min, max, mean, stddev} for attributes with values in the
+    range; stddev is the population standard deviation.
+    """
+    first, last = db.date_to_day(date_from), db.date_to_day(date_to)
+    blocks, spans = cover(first, last)
+    where, params = db.filter_clause(filters)
+    where = f" AND {where}" if where else ""
+    attributes = conn.execute(
+        "SELECT n.id, a.name, a.label, a.value_type FROM attributes a JOIN attribute_ids n ON n.name = a.name "
+        f"WHERE a.value_type IN ({', '.join(map(str, db.ROLLUP_TYPES))})"
+        f"{where} ORDER BY a.group_priority, a.priority",
+        params,
+    ).fetchall()
+    wanted = {row[0] for row in attributes}
+
+    totals = {}
+    rows_read = 0
+    for period in db.ROLLUP_PERIODS:
+        starts = [start for kind, start in blocks if kind == period]
+        if not starts:
+            continue
+        for row in conn.execute(
+            "SELECT attribute_id, count, sum, min, max, sum_sq FROM attribute_rollups "
+            f"WHERE period = ? AND start_day IN ({', '.join('?' * len(starts))})",
+            [period, *starts],
+        ):
+            rows_read += 1
+            if row[0] in wanted:
+                _merge(totals, *row)
+    for span_first, span_last in spans:
+        for row in conn.execute(
+            "SELECT attribute_id, count(*), sum(value), min(value), max(value), sum(value * value) "
+            "FROM attribute_data WHERE day BETWEEN ? AND ? AND typeof(value) IN ('integer', 'real') "
+            "GROUP BY attribute_id",
+            (span_first, span_last),
+        ):
+            rows_read += row[1]
+            if row[0] in wanted:
+                _merge(totals, *row)
+    metrics.count("rollup_rows_read", rows_read)
+
+    summary = {}
+    for attribute_id, name, label, value_type in attributes:
+        if attribute_id not in totals:
+            continue
+        count, total, low, high, sum_sq = totals[attribute_id]
+        mean = total / count
+        summary[name] = {
+            "label": label,
+            "value_type": value_type,
+            "count": count,
+            "sum": total,
+            "min": low,
+            "max": high,
+            "mean": mean,
+            "stddev": math.sqrt(max(0.0, sum_sq / count - mean * mean)),
+        }
+    return summary
+
+
+def _matches(stored, expected):
+    if stored is None or expected is None or stored[0] != expected[0]:
+        return stored == expected
+    return all(math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-9) for a, b in zip(stored[1:], expected[1:]))
+
+
+def verify(conn):
+    """Compare every stored rollup row with a full recomputation.
+
+    Sums are compared with a relative tolerance, as years are added up
+    from months rather than from values. Returns a list of mismatches:
+    dicts with name, period, start (ISO date), stored and expected
+    ((count, sum, min, max, sum_sq) tuples, or None for a missing row).
+    """
+    names = {row[0]: row[1] for row in conn.execute("SELECT id, name FROM attribute_ids")}
+    stored = {
+        tuple(row[:3]): tuple(row[3:])
+        for row in conn.execute(
+            "SELECT attribute_id, period, start_day, count, sum, min, max, sum_sq FROM attribute_rollups"
+        )
+    }
+    expected = {tuple(row[:3]): tuple(row[3:]) for row in db.recompute_rollups(conn)}
+    mismatches = []
+    for key in sorted(stored.keys() | expected.keys()):
+        if not _matches(stored.get(key), expected.get(key)):
+            attribute_id, period, start = key
+            mismatches.append({
+                "name": names.get(attribute_id, attribute_id),
+                "period": period,
+                "start": db.day_to_date(start),
+                "stored": stored.get(key),
+                "expected": expected.get(key),
+            })
+    metrics.count("rollup_rows_verified", len(expected))
+    return mismatches
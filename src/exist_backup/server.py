@@ -0,0 +1,205 @@
+"""Read-only local HTTP query API over the SQLite database."""
+
+import hashlib
+import json
+import sys
+import threading
+from collections import OrderedDict
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from . import db, rollups
+from .export import query_day
+
+
+class ResponseCache:
+    """Thread-safe LRU cache of encoded responses.
+
+    Entries are tagged with the database's PRAGMA data_version; when it
+    changes (a sync committed), the whole cache is dropped. A response is
+    only stored if the version it was computed under is still current, so
+    one built from data a commit replaced mid-query is never cached.
+    """
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self.data_version = None
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def validate(self, data_version):
+        """Clear the cache if the database changed since it was filled."""
+        with self._lock:
+            if data_version != self.data_version:
+                self._entries.clear()
+                self.data_version = data_version
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, entry, data_version):
+        """Store entry, unless data_version (read before computing it) is out of date."""
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            if data_version != self.data_version:
+                return
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+
+class BadRequest(Exception):
+    """Raised by route handlers for invalid query parameters."""
+
+
+class NotFound(Exception):
+    """Raised by route handlers for unknown paths."""
+
+
+def _parse_date(value, name):
+    if value is None:
+        return None
+    try:
+        return date.fromisoformat(value).isoformat()
+    except ValueError:
+        raise BadRequest(f"Invalid {name} date: {value!r} (expected YYYY-MM-DD)")
+
+
+class QueryApp:
+    """Routes API paths to database queries and caches encoded results."""
+
+    def __init__(self, db_path, cache_size=256, pool_size=4, **options):
+        # data_version is per connection, so change detection uses one dedicated connection
+        self.conn = db.connect_readonly(db_path, check_same_thread=False, **options)
+        self.lock = threading.Lock()
+        self.pool = db.ReadPool(db_path, pool_size, **options)
+        self.cache = ResponseCache(cache_size)
+
+    def close(self):
+        self.pool.close()
+        self.conn.close()
+
+    def handle(self, path, query):
+        """Return (etag, body) for a request, serving from cache when possible."""
+        with self.lock:
+            data_version = db.get_data_version(self.conn)
+        self.cache.validate(data_version)
+
+        key = (path, tuple(sorted((k, tuple(v)) for k, v in query.items())))
+        entry = self.cache.get(key)
+        if entry is not None:
+            return entry
+
+        with self.pool.connection() as conn:
+            payload = self.route(conn, path, query)
+        body = json.dumps(payload).encode()
+        etag = '"' + hashlib.sha1(body).hexdigest()[:20] + '"'
+        entry = (etag, body)
+        self.cache.put(key, entry, data_version)
+        return entry
+
+    def route(self, conn, path, query):
+        parts = [p for p in path.split("/") if p]
+        if parts == ["attributes"]:
+            return [dict(row) for row in db.get_all_attributes(conn)]
+        if parts == ["values"]:
+            attribute = query.get("attribute", [None])[0]
+            date_from = _parse_date(query.get("from", [None])[0], "from")
+            date_to = _parse_date(query.get("to", [None])[0], "to")
+            rows = db.query_values(conn, attribute, date_from, date_to)
+            return [dict(row) for row in rows]
+        if parts == ["summary"]:
+            date_from = _parse_date(query.get("from", [None])[0], "from")
+            date_to = _parse_date(query.get("to", [None])[0], "to")
+            if date_from is None or date_to is None:
+                raise BadRequest("summary needs both from and to dates")
+            filters = {"include_attributes": query["attribute"]} if query.get("attribute") else None
+            return rollups.summarize(conn, date_from, date_to, filters)
+        if len(parts) == 2 and parts[0] == "day":
+            return query_day(conn, _parse_date(parts[1], "day"))
+        raise NotFound(f"No such endpoint: {path}")
+
+
+class QueryRequestHandler(BaseHTTPRequestHandler):
+    """GET-only JSON handler with ETag / If-None-Match support."""
+
+    server_version = "exist-backup"
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        try:
+            etag, body = self.server.app.handle(url.path, parse_qs(url.query))
+        except BadRequest as e:
+            return self._send_error(400, str(e))
+        except NotFound as e:
+            return self._send_error(404, str(e))
+
+        if etag in self.headers.get("If-None-Match", ""):
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error(self, status, message):
+        body = json.dumps({"error": message}).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        print(f"{self.address_string()} - {format % args}", file=sys.stderr)
+
+
+def make_server(db_path, host="127.0.0.1", port=8765, cache_size=256, pool_size=4, **options):
+    """Build a threaded HTTP server bound to host:port (port 0 picks a free one).
+
+    Extra keyword arguments (busy_timeout_ms, mmap_mb) tune the read-only connections.
+    """
+    server = ThreadingHTTPServer((host, port), QueryRequestHandler)
+    server.daemon_threads = True
+    server.app = QueryApp(db_path, cache_size, pool_size, **options)
+    return server
+
+
+def serve(config, host=None, port=None):
+    """Serve the read-only query API until interrupted."""
+    api_config = config["api"]
+    server = make_server(
+        config["sync"]["database"],
+        host or api_config["host"],
+        port if port is not None else api_config["port"],
+        api_config.get("cache_size", 256),
+        api_config.get("pool_size", 4),
+        **db.connection_options(config["sync"]),
+    )
+    bound_host, bound_port = server.server_address[:2]
+    print(f"Serving read-only API on http://{bound_host}:{bound_port}/", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.app.close()
@@ -0,0 +1,93 @@
+"""Output sinks for the export pipeline.
+
+Export scans the database once and hands each day's record (the dict
+returned by ``export.build_day``: date, groups, tags) to every configured
+sink. A sink is any class constructed as ``Sink(export_config, options)``
+with ``write(day)`` and ``close()`` methods; ``close()`` returns how many
+items it wrote. ``options`` is the sink's own table in the config, e.g.
+``[export.csv]``. A sink may also define ``abort()``, called instead of
+``close()`` when the export fails, to discard partial output.
+
+Custom sinks are referenced in ``[export] sinks`` as ``"module:Class"``.
+"""
+
+import csv
+import importlib
+import json
+import os
+from pathlib import Path
+
+
+class SinkError(ValueError):
+    """Raised for an export sink name that can't be resolved."""
+
+
+class FileSink:
+    """Base for sinks that stream into a single file, replaced atomically on close."""
+
+    name = None
+    default_filename = None
+
+    def __init__(self, export_config, options):
+        self.path = Path(options.get("path") or Path(export_config["output_dir"]) / self.default_filename)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._tmp_path = self.path.with_name(f".{self.path.name}.{os.getpid()}.tmp")
+        self._file = open(self._tmp_path, "w", newline="")
+        self.written = 0
+
+    def write(self, day):
+        raise NotImplementedError
+
+    def close(self):
+        self._file.close()
+        os.replace(self._tmp_path, self.path)
+        return self.written
+
+    def abort(self):
+        self._file.close()
+        self._tmp_path.unlink(missing_ok=True)
+
+
+class CsvSink(FileSink):
+    """One row per value: date, attribute, label, group, value, formatted_value."""
+
+    name = "csv"
+    default_filename = "exist.csv"
+
+    def __init__(self, export_config, options):
+        super().__init__(export_config, options)
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(["date", "attribute", "label", "group", "value", "formatted_value"])
+
+    def write(self, day):
+        for group_label, entries in day["groups"].items():
+            self._writer.writerows(
+                (day["date"], e["name"], e["label"], group_label, e["raw_value"], e["formatted_value"])
+                for e in entries
+            )
+        self.written += 1
+
+
+class JsonSink(FileSink):
+    """JSON Lines: one object per day with its grouped values and tags."""
+
+    name = "json"
+    default_filename = "exist.jsonl"
+
+    def write(self, day):
+        self._file.write(json.dumps(day, ensure_ascii=False))
+        self._file.write("\n")
+        self.written += 1
+
+
+def load_sink(name, builtin):
+    """Resolve a sink name to its class: a key of `builtin` or "module:Class"."""
+    if name in builtin:
+        return builtin[name]
+    module_name, sep, class_name = name.partition(":")
+    if not sep:
+        raise SinkError(f"Unknown export sink {name!r} (expected one of {sorted(builtin)} or module:Class)")
+    try:
+        return getattr(importlib.import_module(module_name), class_name)
+    except (ImportError, AttributeError) as e:
+        raise SinkError(f"Cannot load export sink {name!r}: {e}") from e
@@ -0,0 +1,250 @@
+"""Online, deduplicated, compressed snapshots of the SQLite database.
+
+A snapshot is taken with SQLite's online backup API into a temporary file,
+which is then split into fixed-size chunks. Each chunk is stored once,
+zlib-compressed, under its SHA-256 hash; a JSON manifest lists the chunks
+that make up the snapshot. Unchanged chunks are shared between snapshots,
+so a daily snapshot only costs the pages that changed.
+
+Layout under the snapshot directory:
+    manifests/<snapshot_id>.json
+    chunks/<hash[:2]>/<hash>.z
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import zlib
+from datetime import UTC, datetime
+from pathlib import Path
+
+from . import db
+
+
+class SnapshotError(Exception):
+    """Raised when a snapshot is missing or fails verification."""
+
+
+class SnapshotStore:
+    """Content-addressed chunk store plus snapshot manifests."""
+
+    def __init__(self, root, chunk_size=64 * 1024, compress_level=6):
+        self.root = Path(root)
+        self.chunk_size = chunk_size
+        self.compress_level = compress_level
+        self.manifest_dir = self.root / "manifests"
+        self.chunk_dir = self.root / "chunks"
+
+    def _chunk_path(self, digest):
+        return self.chunk_dir / digest[:2] / f"{digest}.z"
+
+    def _manifest_path(self, snapshot_id):
+        return self.manifest_dir / f"{snapshot_id}.json"
+
+    def list_snapshots(self):
+        """Return manifests, oldest first."""
+        if not self.manifest_dir.exists():
+            return []
+        manifests = []
+        for path in self.manifest_dir.glob("*.json"):
+            with open(path) as f:
+                manifests.append(json.load(f))
+        return sorted(manifests, key=lambda m: m["created_at"])
+
+    def load_manifest(self, snapshot_id=None):
+        """Load a manifest by id, or the newest one if snapshot_id is None."""
+        if snapshot_id is None:
+            snapshots = self.list_snapshots()
+            if not snapshots:
+                raise SnapshotError("No snapshots found")
+            return snapshots[-1]
+        path = self._manifest_path(snapshot_id)
+        if not path.exists():
+            raise SnapshotError(f"No such snapshot: {snapshot_id}")
+        with open(path) as f:
+            return json.load(f)
+
+    def _new_snapshot_id(self):
+        base = datetime.now(UTC).strftime("%Y%m%dT%H%M%SZ")
+        snapshot_id, n = base, 1
+        while self._manifest_path(snapshot_id).exists():
+            n += 1
+            snapshot_id = f"{base}-{n}"
+        return snapshot_id
+
+    def _store_file(self, path):
+        """Split a file into chunks, writing only chunks not already stored."""
+        chunks = []
+        new_chunks = 0
+        stored_bytes = 0
+        whole = hashlib.sha256()
+        with open(path, "rb") as f:
+            while block := f.read(self.chunk_size):
+                whole.update(block)
+                digest = hashlib.sha256(block).hexdigest()
+                chunks.append(digest)
+                chunk_path = self._chunk_path(digest)
+                if chunk_path.exists():
+                    continue
+                chunk_path.parent.mkdir(parents=True, exist_ok=True)
+                data = zlib.compress(block, self.compress_level)
+                tmp_path = chunk_path.with_suffix(".tmp")
+                tmp_path.write_bytes(data)
+                os.replace(tmp_path, chunk_path)
+                new_chunks += 1
+                stored_bytes += len(data)
+        return chunks, whole.hexdigest(), new_chunks, stored_bytes
+
+    def create(self, db_path):
+        """Take an online snapshot of db_path. Returns the manifest."""
+        self.manifest_dir.mkdir(parents=True, exist_ok=True)
+        self.chunk_dir.mkdir(parents=True, exist_ok=True)
+
+        fd, tmp_name = tempfile.mkstemp(prefix="snapshot-", suffix=".db", dir=self.root)
+        os.close(fd)
+        try:
+            src = db.connect(db_path)
+            dst = sqlite3.connect(tmp_name)
+            try:
+                # One step: a single read transaction sees one consistent version, and under
+                # WAL writers carry on meanwhile. A stepped backup restarts on every commit.
+                src.backup(dst, pages=-1)
+                # Make the copy a self-contained rollback-journal database file
+                dst.execute("PRAGMA journal_mode=DELETE")
+                page_size = dst.execute("PRAGMA page_size").fetchone()[0]
+            finally:
+                dst.close()
+                src.close()
+
+            size = os.path.getsize(tmp_name)
+            chunks, sha256, new_chunks, stored_bytes = self._store_file(tmp_name)
+        finally:
+            os.unlink(tmp_name)
+
+        manifest = {
+            "id": self._new_snapshot_id(),
+            "created_at": datetime.now(UTC).isoformat(),
+            "size": size,
+            "page_size": page_size,
+            "chunk_size": self.chunk_size,
+            "sha256": sha256,
+            "chunks": chunks,
+            "new_chunks": new_chunks,
+            "stored_bytes": stored_bytes,
+        }
+        with open(self._manifest_path(manifest["id"]), "w") as f:
+            json.dump(manifest, f)
+        return manifest
+
+    def _read_chunk(self, digest):
+        chunk_path = self._chunk_path(digest)
+        if not chunk_path.exists():
+            raise SnapshotError(f"Missing chunk {digest}")
+        try:
+            block = zlib.decompress(chunk_path.read_bytes())
+        except zlib.error as e:
+            raise SnapshotError(f"Corrupt chunk {digest}: {e}")
+        if hashlib.sha256(block).hexdigest() != digest:
+            raise SnapshotError(f"Checksum mismatch in chunk {digest}")
+        return block
+
+    def restore(self, snapshot_id, target_path):
+        """Reassemble a snapshot into target_path, replacing it atomically.
+
+        Returns the manifest of the restored snapshot.
+        """
+        manifest = self.load_manifest(snapshot_id)
+        target_path = Path(target_path)
+        target_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = target_path.with_name(target_path.name + ".restore")
+
+        whole = hashlib.sha256()
+        try:
+            with open(tmp_path, "wb") as f:
+                for digest in manifest["chunks"]:
+                    block = self._read_chunk(digest)
+                    whole.update(block)
+                    f.write(block)
+            if whole.hexdigest() != manifest["sha256"]:
+                raise SnapshotError(f"Snapshot {manifest['id']} does not match its checksum")
+        except SnapshotError:
+            tmp_path.unlink(missing_ok=True)
+            raise
+
+        # Stale WAL/SHM files from the old database must not be replayed over the restore
+        for suffix in ("-wal", "-shm"):
+            Path(str(target_path) + suffix).unlink(missing_ok=True)
+        os.replace(tmp_path, target_path)
+        return manifest
+
+    def verify(self, snapshot_id=None):
+        """Check chunk hashes, the whole-file hash and SQLite integrity.
+
+        Returns the manifest; raises SnapshotError on any failure.
+        """
+        manifest = self.load_manifest(snapshot_id)
+        with tempfile.TemporaryDirectory(dir=self.root) as tmp:
+            restored = Path(tmp) / "verify.db"
+            self.restore(manifest["id"], restored)
+            conn = sqlite3.connect(restored)
+            try:
+                result = conn.execute("PRAGMA integrity_check").fetchone()[0]
+            finally:
+                conn.close()
+        if result != "ok":
+            raise SnapshotError(f"Snapshot {manifest['id']} failed integrity check: {result}")
+        return manifest
+
+    def prune(self, keep):
+        """Keep the newest `keep` snapshots and delete chunks no longer referenced.
+
+        Returns (snapshots_removed, chunks_removed).
+        """
+        snapshots = self.list_snapshots()
+        removed = snapshots[:-keep] if keep > 0 else snapshots
+        for manifest in removed:
+            self._manifest_path(manifest["id"]).unlink()
+
+        live = set()
+        for manifest in snapshots[len(removed):]:
+            live.update(manifest["chunks"])
+
+        chunks_removed = 0
+        if self.chunk_dir.exists():
+            for chunk_path in self.chunk_dir.glob("*/*.z"):
+                if chunk_path.stem not in live:
+                    chunk_path.unlink()
+                    chunks_removed += 1
+        return len(removed), chunks_removed
+
+
+def get_store(config):
+    """Build a SnapshotStore from the [snapshot] config section."""
+    snap_config = config["snapshot"]
+    return SnapshotStore(
+        snap_config["dir"],
+        chunk_size=int(snap_config.get("chunk_kb", 64)) * 1024,
+    )
+
+
+def create_snapshot(config):
+    """Take a snapshot and apply retention. Returns the new manifest."""
+    store = get_store(config)
+    manifest = store.create(config["sync"]["database"])
+    print(
+        f"Snapshot {manifest['id']}: {manifest['size']:,} bytes in {len(manifest['chunks'])} chunks, "
+        f"{manifest['new_chunks']} new ({manifest['stored_bytes']:,} bytes stored)",
+        file=sys.stderr,
+    )
+    keep = int(config["snapshot"].get("keep", 0))
+    if keep > 0:
+        snapshots_removed, chunks_removed = store.prune(keep)
+        if snapshots_removed:
+            print(
+                f"Pruned {snapshots_removed} old snapshots ({chunks_removed} unreferenced chunks)",
+                file=sys.stderr,
+            )
+    return manifest
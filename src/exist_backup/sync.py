@@ -1,34 +1,58 @@
 """Sync orchestration — fetch data from Exist.io and store in SQLite."""
 
 import sys
+import time
 from datetime import date, timedelta
 
-from . import api, db
+from . import api, db, maintenance, metrics, planner, records
+
+
+def _fetch_tail(client, name, since, date_max):
+    """Values of one attribute in (since, date_max], newest first, stopping at `since`."""
+    values = []
+    for v in client.get_attribute_values(name, date_max=str(date_max)):
+        if v["date"] <= since:
+            break
+        values.append(v)
+    return values
 
 
 def run_sync(config, full=False):
     """Run a sync from Exist.io API to local SQLite database.
 
+    The fetch strategy for each attribute comes from planner.build_plan,
+    the same plan `sync --plan` prints. Attributes excluded by the [sync]
+    selection rules are not fetched; their stored data is left as it is.
+
     Args:
         config: Parsed configuration dict.
         full: If True, fetch all historical data. Otherwise incremental.
 
     Returns:
-        dict with keys: attributes_synced, values_synced, status, errors
+        dict with keys: attributes_synced, values_synced, status, errors,
+        metrics, plan
     """
     token = config["auth"]["token"]
     if not token:
         raise SystemExit("No API token configured. Set EXIST_TOKEN or auth.token in config.toml.")
 
-    client = api.ExistClient(token)
-    conn = db.connect(config["sync"]["database"])
+    started_at = time.perf_counter()
+    started_metrics = metrics.snapshot()
+    client = api.client_from_config(config)
+    conn = db.connect(config["sync"]["database"], **db.connection_options(config["sync"]))
     db.init_db(conn)
+    filters = db.sync_filters_from_config(config["sync"])
+    params = api.selection_params(filters)
 
     yesterday = date.today() - timedelta(days=1)
+    plan = planner.build_plan(conn, full=full, date_max=yesterday, filters=filters)
+    cost = planner.estimate(conn, plan)
+    print(f"Planned {cost['requests']} requests (about {cost['seconds']:.0f}s)", file=sys.stderr)
     sync_type = "full" if full else "incremental"
     attributes_synced = 0
     values_synced = 0
     errors = []
+    touched = {}  # attribute name -> earliest date written, for records.update
 
     # 1. Fetch + upsert user profile
     print("Fetching user profile...", file=sys.stderr)
@@ -38,7 +62,7 @@ def run_sync(config, full=False):
     if full:
         # Full sync: fetch each attribute's complete history individually
         print("Fetching attributes...", file=sys.stderr)
-        attributes = client.get_attributes()
+        attributes = [attr for attr in client.get_attributes(params) if db.attribute_matches(attr, filters)]
         for attr in attributes:
             db.upsert_attribute(conn, attr)
         print(f"  {len(attributes)} attributes synced", file=sys.stderr)
@@ -54,6 +78,8 @@ def run_sync(config, full=False):
                 ))
 
                 count = db.upsert_values(conn, attr_name, values)
+                if values:
+                    touched[attr_name] = min(v["date"] for v in values)
                 values_synced += count
                 attributes_synced += 1
                 print(f" {count} values", file=sys.stderr)
@@ -62,26 +88,25 @@ def run_sync(config, full=False):
                 errors.append(f"{attr_name}: {e}")
                 print(f" ERROR: {e}", file=sys.stderr)
     else:
-        # Incremental sync: bulk fetch via /attributes/with-values/
-        oldest = db.get_oldest_last_sync_date(conn)
+        # Incremental sync: one bulk with-values window, then per-attribute tails
+        # for attributes whose stored values end before the window
+        bulk_days = plan["bulk_days"]
+        tails = [e for e in plan["attributes"] if e["strategy"] == planner.TAIL]
 
-        if oldest and oldest >= str(yesterday):
+        if not bulk_days:
             print("All attributes up to date, nothing to sync.", file=sys.stderr)
         else:
-            if oldest:
-                oldest_date = date.fromisoformat(oldest)
-                days_needed = max(1, min(31, (yesterday - oldest_date).days))
-            else:
-                days_needed = 31
-
-            print(f"Fetching attributes with values (last {days_needed} days)...", file=sys.stderr)
+            print(f"Fetching attributes with values (last {bulk_days} days)...", file=sys.stderr)
 
             try:
                 for attr in client.get_attributes_with_values(
-                    days=days_needed,
+                    days=bulk_days,
                     date_max=str(yesterday),
+                    params=params,
                 ):
                     attr_name = attr["name"]
+                    if not db.attribute_matches(attr, filters):
+                        continue
                     try:
                         db.upsert_attribute(conn, attr)
                         attr_values = attr.get("values", [])
@@ -92,6 +117,7 @@ def run_sync(config, full=False):
 
                         if attr_values:
                             count = db.upsert_values(conn, attr_name, attr_values)
+                            touched[attr_name] = min(v["date"] for v in attr_values)
                             values_synced += count
                             attributes_synced += 1
                             print(f"  {attr_name}: {count} values", file=sys.stderr)
@@ -103,11 +129,44 @@ def run_sync(config, full=False):
                 errors.append(f"Bulk fetch: {e}")
                 print(f"  Bulk fetch error: {e}", file=sys.stderr)
 
-    # 4. Write sync_log entry
+        tail_max = yesterday - timedelta(days=bulk_days)
+        for entry in tails:
+            attr_name = entry["name"]
+            try:
+                values = _fetch_tail(client, attr_name, entry["since"], tail_max)
+                if values:
+                    count = db.upsert_values(conn, attr_name, values)
+                    if attr_name not in touched:
+                        attributes_synced += 1
+                    touched[attr_name] = min(v["date"] for v in values)
+                    values_synced += count
+                print(f"  {attr_name}: {len(values)} older values", file=sys.stderr)
+            except Exception as e:
+                errors.append(f"{attr_name}: {e}")
+                print(f"  {attr_name}: ERROR: {e}", file=sys.stderr)
+
+    if not errors:
+        # Days a --today refresh wrote are complete now
+        db.clear_partial_days(conn, db.date_to_day(yesterday))
+
+    # 4. Fold the new values into streaks and records
+    try:
+        records.update(conn, touched, config.get("records", {}).get("goals", {}))
+    except Exception as e:
+        errors.append(f"Records: {e}")
+        print(f"  Records update error: {e}", file=sys.stderr)
+
+    # 5. Write sync_log entry
     status = "success" if not errors else "partial" if attributes_synced > 0 else "error"
     error_msg = "\n".join(errors) if errors else None
-    db.write_sync_log(conn, sync_type, attributes_synced, values_synced, status, error_msg)
+    sync_id = db.write_sync_log(conn, sync_type, attributes_synced, values_synced, status, error_msg)
+
+    metrics.record("sync_run", time.perf_counter() - started_at, type=sync_type)
+    run_metrics = metrics.since(started_metrics)
+    if config["sync"].get("persist_metrics", True):
+        db.write_sync_metrics(conn, sync_id, run_metrics)
 
+    maintenance.auto_maintain(conn, config)
     conn.close()
 
     result = {
@@ -115,6 +174,8 @@ def run_sync(config, full=False):
         "values_synced": values_synced,
         "status": status,
         "errors": errors,
+        "metrics": run_metrics,
+        "plan": plan,
     }
 
     print(f"\nSync complete: {attributes_synced} attributes, {values_synced} values ({status})", file=sys.stderr)
@@ -124,3 +185,88 @@ def run_sync(config, full=False):
             print(f"    {e}", file=sys.stderr)
 
     return result
+
+
+def run_today(config):
+    """Refresh today's in-progress values with one 1-day with-values fetch.
+
+    The stored profile is reused (it is only fetched if there is none yet),
+    attribute metadata is rewritten only when it differs, and only values
+    that changed are written, so this can run every few minutes. Today is
+    recorded as a partial day: it doesn't advance any attribute's watermark,
+    so the next regular sync still fetches its final values, and records
+    are updated then rather than on every refresh. The [sync] selection
+    rules apply as in run_sync.
+
+    Returns dict with keys: attributes_synced, values_synced, status,
+    errors, metrics.
+    """
+    token = config["auth"]["token"]
+    if not token:
+        raise SystemExit("No API token configured. Set EXIST_TOKEN or auth.token in config.toml.")
+
+    started_at = time.perf_counter()
+    started_metrics = metrics.snapshot()
+    client = api.client_from_config(config)
+    conn = db.connect(config["sync"]["database"], **db.connection_options(config["sync"]))
+    db.init_db(conn)
+    filters = db.sync_filters_from_config(config["sync"])
+
+    today = date.today()
+    attributes_synced = 0
+    values_synced = 0
+    metadata_updated = 0
+    errors = []
+
+    if db.get_profile(conn) is None:
+        db.upsert_profile(conn, client.get_profile())
+
+    try:
+        for attr in client.get_attributes_with_values(
+            days=1, date_max=str(today), params=api.selection_params(filters)
+        ):
+            attr_name = attr["name"]
+            if not db.attribute_matches(attr, filters):
+                continue
+            try:
+                if not db.attribute_unchanged(conn, attr):
+                    db.upsert_attribute(conn, attr)
+                    metadata_updated += 1
+                values = [v for v in attr.get("values", []) if v["date"] == str(today)]
+                count = db.upsert_changed_values(conn, attr_name, values) if values else 0
+                if count:
+                    values_synced += count
+                    attributes_synced += 1
+                    print(f"  {attr_name}: {values[0]['value']}", file=sys.stderr)
+            except Exception as e:
+                errors.append(f"{attr_name}: {e}")
+                print(f"  {attr_name}: ERROR: {e}", file=sys.stderr)
+    except Exception as e:
+        errors.append(f"Bulk fetch: {e}")
+        print(f"  Bulk fetch error: {e}", file=sys.stderr)
+
+    db.mark_partial_day(conn, db.date_to_day(today))
+    conn.commit()
+    metrics.count("today_metadata_updated", metadata_updated)
+
+    status = "success" if not errors else "partial" if attributes_synced > 0 else "error"
+    sync_id = db.write_sync_log(
+        conn, "today", attributes_synced, values_synced, status, "\n".join(errors) if errors else None
+    )
+    metrics.record("sync_run", time.perf_counter() - started_at, type="today")
+    run_metrics = metrics.since(started_metrics)
+    if config["sync"].get("persist_metrics", True):
+        db.write_sync_metrics(conn, sync_id, run_metrics)
+    conn.close()
+
+    print(f"Today: {values_synced} values changed, {metadata_updated} attributes updated ({status})",
+          file=sys.stderr)
+    for e in errors:
+        print(f"    {e}", file=sys.stderr)
+    return {
+        "attributes_synced": attributes_synced,
+        "values_synced": values_synced,
+        "status": status,
+        "errors": errors,
+        "metrics": run_metrics,
+    }
@@ -0,0 +1,264 @@
+"""Block-checksum reconciliation between the database and Exist.io (`sync --verify`).
+
+The history is split into blocks of one attribute and one calendar month.
+Local checksums for every block are computed in a single grouped query;
+each month is then fetched from ``attributes/with-values/`` (one 31-day
+window covers a month for all attributes), staged in a temporary table and
+checksummed with the same SQL. Only blocks whose checksums differ are
+rewritten, so writes and record refreshes scale with the drift.
+
+Exist.io has no checksum endpoint, so the remote side of every verified
+month still has to be downloaded; ``since`` limits how far back to look.
+"""
+
+import hashlib
+import sys
+import time
+from datetime import date, timedelta
+
+from . import api, db, maintenance, metrics, records
+
+STAGING_SCHEMA = """
+CREATE TEMP TABLE IF NOT EXISTS verify_remote (
+    attribute_id INTEGER NOT NULL,
+    day INTEGER NOT NULL,
+    value,
+    PRIMARY KEY (attribute_id, day)
+) WITHOUT ROWID
+"""
+
+# Order-independent: the sum of per-row hashes, so rows can be aggregated in any order
+_CHECKSUM_MASK = (1 << 63) - 1
+
+
+class _BlockChecksum:
+    """SQLite aggregate: block_checksum(day, value) over the rows of a block."""
+
+    def __init__(self):
+        self.total = 0
+
+    def step(self, day, value):
+        digest = hashlib.blake2b(f"{day}:{type(value).__name__}:{value!r}".encode(), digest_size=8).digest()
+        self.total = (self.total + int.from_bytes(digest, "big")) & _CHECKSUM_MASK
+
+    def finalize(self):
+        return self.total
+
+
+def checksums(conn, table, day_min, day_max):
+    """{(attribute_id, "YYYY-MM"): (count, checksum)} for non-null values in [day_min, day_max]."""
+    conn.create_aggregate("block_checksum", 2, _BlockChecksum)
+    rows = conn.execute(
+        f"SELECT attribute_id, strftime('%Y-%m', day * 86400, 'unixepoch') AS month, "
+        f"count(*), block_checksum(day, value) FROM {table} "
+        "WHERE day BETWEEN ? AND ? AND value IS NOT NULL GROUP BY attribute_id, month",
+        (day_min, day_max),
+    )
+    return {(row[0], row[1]): (row[2], row[3]) for row in rows}
+
+
+def months(first, last):
+    """Yield (month key, first date, last date) for each month touching [first, last]."""
+    start = first.replace(day=1)
+    while start <= last:
+        following = (start + timedelta(days=32)).replace(day=1)
+        yield start.strftime("%Y-%m"), max(start, first), min(following - timedelta(days=1), last)
+        start = following
+
+
+def _stage_month(conn, client, names, first, last, filters=None):
+    """Fetch one month for the selected attributes into verify_remote, registering new attribute names.
+
+    Inactive attributes are requested too, since their history is stored
+    like any other. Returns the ids of the attributes the response included.
+    """
+    conn.execute("DELETE FROM verify_remote")
+    window = (last - first).days + 1
+    rows = []
+    seen = set()
+    params = {**api.selection_params(filters or {}), "include_inactive": "true"}
+    for attr in client.get_attributes_with_values(days=window, date_max=str(last), params=params):
+        name = attr["name"]
+        if not db.attribute_matches(attr, filters):
+            continue
+        if name not in names:
+            db.upsert_attribute(conn, attr)
+            names[name] = db.get_attribute_id(conn, name)
+        seen.add(names[name])
+        for v in attr.get("values", []):
+            if str(first) <= v["date"] <= str(last):
+                rows.append({"id": names[name], "day": db.date_to_day(v["date"]), "value": v["value"]})
+    conn.executemany(
+        f"INSERT OR REPLACE INTO verify_remote (attribute_id, day, value) VALUES (:id, :day, {db.native_value(':value')})",
+        rows,
+    )
+    metrics.count("verify_values_fetched", len(rows))
+    return seen
+
+
+def _repair_block(conn, attribute_id, manual, day_min, day_max):
+    """Replace a block's local values with the staged remote ones.
+
+    Local edits of manual attributes that haven't been pushed yet are kept;
+    their synced state is moved to the remote value. Returns the number of
+    rows written plus deleted.
+    """
+    keep = set()
+    if manual:
+        keep = {
+            row[0]
+            for row in conn.execute(
+                "SELECT d.day FROM attribute_data d LEFT JOIN manual_sync_state s "
+                "ON s.attribute_id = d.attribute_id AND s.day = d.day "
+                "WHERE d.attribute_id = ? AND d.day BETWEEN ? AND ? AND d.value IS NOT s.value",
+                (attribute_id, day_min, day_max),
+            )
+        }
+    remote = [
+        {"id": attribute_id, "day": day, "value": value}
+        for day, value in conn.execute(
+            "SELECT day, value FROM verify_remote WHERE attribute_id = ? AND day BETWEEN ? AND ?",
+            (attribute_id, day_min, day_max),
+        )
+    ]
+    remote_days = {row["day"] for row in remote}
+    stale = [
+        (attribute_id, row[0])
+        for row in conn.execute(
+            "SELECT day FROM attribute_data WHERE attribute_id = ? AND day BETWEEN ? AND ?",
+            (attribute_id, day_min, day_max),
+        )
+        if row[0] not in remote_days and row[0] not in keep
+    ]
+    conn.executemany("DELETE FROM attribute_data WHERE attribute_id = ? AND day = ?", stale)
+    db.mark_days_changed(conn, {day for _, day in stale})
+    db.write_value_rows(conn, [row for row in remote if row["day"] not in keep])
+    db.refresh_rollups(conn, stale)
+    if manual:
+        db.mark_synced(conn, remote)
+    return len(remote) - len(keep & remote_days) + len(stale)
+
+
+@metrics.timed("verify")
+def verify(conn, client, since=None, until=None, filters=None):
+    """Compare per-attribute monthly checksums with Exist.io and repair the blocks that differ.
+
+    `since`/`until` are dates; by default the whole stored history up to
+    yesterday is checked. `filters` are the [sync] selection rules: blocks
+    of excluded attributes are neither compared nor repaired, and neither
+    are those of attributes the response left out, so their stored values
+    are never deleted. Returns a report dict: months, blocks, repaired
+    (list of dicts with name, month, local_count, remote_count),
+    values (rows rewritten or deleted), errors, touched (attribute name ->
+    earliest repaired date, for records.update).
+    """
+    conn.execute(STAGING_SCHEMA)
+    until = until or date.today() - timedelta(days=1)
+    if since is None:
+        row = conn.execute("SELECT min(day) FROM attribute_data").fetchone()
+        since = date.fromisoformat(db.day_to_date(row[0])) if row[0] is not None else until
+    names = {row[0]: row[1] for row in conn.execute("SELECT name, id FROM attribute_ids")}
+    manual = {row[0] for row in conn.execute("SELECT name FROM attributes WHERE manual = 1")}
+
+    with metrics.timer("verify_local_checksums"):
+        local = checksums(conn, "attribute_data", db.date_to_day(since), db.date_to_day(until))
+    if filters:
+        selected = {names.get(row["name"]) for row in db.get_all_attributes(conn, filters)}
+        local = {key: block for key, block in local.items() if key[0] in selected}
+
+    report = {"months": 0, "blocks": 0, "repaired": [], "values": 0, "errors": [], "touched": {}}
+    for month, first, last in months(since, until):
+        day_min, day_max = db.date_to_day(first), db.date_to_day(last)
+        try:
+            seen = _stage_month(conn, client, names, first, last, filters)
+        except Exception as e:
+            report["errors"].append(f"{month}: {e}")
+            print(f"  {month}: ERROR: {e}", file=sys.stderr)
+            continue
+        report["months"] += 1
+        remote = checksums(conn, "verify_remote", day_min, day_max)
+        ids = {attribute_id for attribute_id, key in local if key == month and attribute_id in seen}
+        ids |= {attribute_id for attribute_id, _ in remote}
+        by_id = {attribute_id: name for name, attribute_id in names.items()}
+        for attribute_id in sorted(ids):
+            report["blocks"] += 1
+            mine, theirs = local.get((attribute_id, month)), remote.get((attribute_id, month))
+            if mine == theirs:
+                continue
+            name = by_id[attribute_id]
+            report["values"] += _repair_block(conn, attribute_id, name in manual, day_min, day_max)
+            report["repaired"].append({
+                "name": name,
+                "month": month,
+                "local_count": mine[0] if mine else 0,
+                "remote_count": theirs[0] if theirs else 0,
+            })
+            report["touched"].setdefault(name, str(first))
+        conn.commit()
+        print(f"  {month}: {len(ids)} blocks checked", file=sys.stderr)
+
+    metrics.count("verify_blocks", report["blocks"] - len(report["repaired"]), result="match")
+    metrics.count("verify_blocks", len(report["repaired"]), result="repaired")
+    return report
+
+
+def run_verify(config, since=None, until=None):
+    """`sync --verify`: reconcile the database with Exist.io and log the run as "verify".
+
+    Returns dict with keys: attributes_synced, values_synced, status,
+    errors, repaired, metrics (the same shape as sync.run_sync plus the
+    repaired blocks).
+    """
+    token = config["auth"]["token"]
+    if not token:
+        raise SystemExit("No API token configured. Set EXIST_TOKEN or auth.token in config.toml.")
+
+    started_at = time.perf_counter()
+    started_metrics = metrics.snapshot()
+    client = api.client_from_config(config)
+    conn = db.connect(config["sync"]["database"], **db.connection_options(config["sync"]))
+    db.init_db(conn)
+
+    print("Verifying monthly checksums against Exist.io...", file=sys.stderr)
+    report = verify(conn, client, since=since, until=until, filters=db.sync_filters_from_config(config["sync"]))
+    errors = report["errors"]
+    try:
+        records.update(conn, report["touched"], config.get("records", {}).get("goals", {}))
+    except Exception as e:
+        errors.append(f"Records: {e}")
+
+    repaired = report["repaired"]
+    attributes = len({block["name"] for block in repaired})
+    status = "success" if not errors else "partial" if report["months"] else "error"
+    sync_id = db.write_sync_log(
+        conn, "verify", attributes, report["values"], status, "\n".join(errors) if errors else None
+    )
+    metrics.record("sync_run", time.perf_counter() - started_at, type="verify")
+    run_metrics = metrics.since(started_metrics)
+    if config["sync"].get("persist_metrics", True):
+        db.write_sync_metrics(conn, sync_id, run_metrics)
+    maintenance.auto_maintain(conn, config)
+    conn.close()
+
+    print(
+        f"\nVerify complete: {report['blocks']} blocks in {report['months']} months, "
+        f"{len(repaired)} repaired ({status})",
+        file=sys.stderr,
+    )
+    for block in repaired:
+        print(
+            f"  {block['month']} {block['name']}: {block['local_count']} local, "
+            f"{block['remote_count']} remote values",
+            file=sys.stderr,
+        )
+    for e in errors:
+        print(f"    {e}", file=sys.stderr)
+
+    return {
+        "attributes_synced": attributes,
+        "values_synced": report["values"],
+        "status": status,
+        "errors": errors,
+        "repaired": repaired,
+        "metrics": run_metrics,
+    }
@@ -2,10 +2,14 @@
 
 import json
 import sqlite3
+from contextlib import ExitStack
+from datetime import date, timedelta
 from pathlib import Path
 
 import pytest
 
+from benchmarks.stub_server import StubExistServer
+from benchmarks.synthetic import SyntheticDataset
 from exist_backup import db
 
 FIXTURES_DIR = Path(__file__).parent / "fixtures"
@@ -48,3 +52,22 @@ def populated_db(test_db, sample_profile, sample_attributes, sample_values):
     for val in sample_values:
         db.upsert_values(test_db, val["name"], val["values"])
     return test_db
+
+
+@pytest.fixture
+def stub_setup(tmp_path):
+    """Factory for a synthetic database served by a local stub Exist.io server.
+
+    stub_setup(attributes, end_date=yesterday, until=None, **stub_options)
+    returns (config, dataset, stub); the server stops after the test.
+    """
+    with ExitStack() as stack:
+        def make(attributes, end_date=None, until=None, **stub_options):
+            dataset = SyntheticDataset(attributes, 1, end_date=end_date or date.today() - timedelta(days=1))
+            db_path = str(tmp_path / "stub.db")
+            dataset.build_db(db_path, until=until)
+            stub = stack.enter_context(StubExistServer(dataset, **stub_options))
+            config = {"auth": {"token": "t"}, "sync": {"database": db_path, "api_url": stub.base_url}}
+            return config, dataset, stub
+
+        yield make
@@ -4,8 +4,11 @@ import json
 
 import pytest
 import responses
+from click.testing import CliRunner
 
-from exist_backup.api import BASE_URL, ExistClient
+from exist_backup import fastjson, metrics
+from exist_backup.api import BASE_URL, ExistClient, selection_params
+from exist_backup.cli import cli
 
 
 @pytest.fixture
@@ -128,6 +131,24 @@ class TestExistClient:
         assert "days=2" in responses.calls[0].request.url
         assert "date_max=2024-12-02" in responses.calls[0].request.url
 
+    @responses.activate
+    def test_with_values_passes_selection_params(self, client):
+        responses.add(responses.GET, f"{BASE_URL}attributes/with-values/",
+                      json={"count": 0, "next": None, "previous": None, "results": []})
+        list(client.get_attributes_with_values(days=3, params={"groups": "sleep,mood"}))
+        assert "groups=sleep%2Cmood" in responses.calls[0].request.url
+        assert "days=3" in responses.calls[0].request.url
+
+    def test_selection_params(self):
+        assert selection_params({}) == {}
+        assert selection_params({"include_groups": ["sleep", "mood"]}) == {"groups": "sleep,mood"}
+        assert selection_params({"include_attributes": ["steps"], "manual": True}) == {
+            "attributes": "steps", "manual": "true",
+        }
+        # Both lists OR together, which separate API parameters can't express
+        assert selection_params({"include_attributes": ["steps"], "include_groups": ["sleep"]}) == {}
+        assert selection_params({"exclude_groups": ["sleep"], "active": False}) == {"include_inactive": "true"}
+
     @responses.activate
     def test_rate_limit_retry(self, client):
         responses.add(
@@ -157,3 +178,44 @@ class TestExistClient:
         )
         with pytest.raises(Exception):
             client.get_profile()
+
+    @responses.activate
+    def test_negotiates_compression_and_counts_bytes(self, client):
+        metrics.reset()
+        responses.add(responses.GET, BASE_URL + "accounts/profile/", json={"username": "testuser"}, status=200)
+        client.get_profile()
+
+        assert "gzip" in responses.calls[0].request.headers["Accept-Encoding"]
+        data = metrics.snapshot()
+        body_size = len(json.dumps({"username": "testuser"}))
+        assert data["counters"]['http_bytes_decoded{endpoint=accounts/profile/}'] == body_size
+        assert data["counters"]['http_bytes_wire{encoding=identity,endpoint=accounts/profile/}'] == body_size
+
+
+class TestFastJson:
+    def test_auto_prefers_orjson_when_installed(self, monkeypatch):
+        monkeypatch.setitem(fastjson.BACKENDS, "orjson", json.loads)
+        assert fastjson.get_loads("auto")[0] == "orjson"
+
+    def test_falls_back_to_stdlib(self, monkeypatch):
+        monkeypatch.delitem(fastjson.BACKENDS, "orjson", raising=False)
+        name, loads = fastjson.get_loads("auto")
+        assert name == "json"
+        assert loads(b'{"a": [1, 2.5]}') == {"a": [1, 2.5]}
+
+    def test_unavailable_backend(self, monkeypatch):
+        monkeypatch.delitem(fastjson.BACKENDS, "orjson", raising=False)
+        with pytest.raises(fastjson.JSONBackendError, match="fast"):
+            ExistClient("token", json_backend="orjson")
+
+    def test_unavailable_backend_is_a_clean_cli_error(self, monkeypatch, tmp_path):
+        monkeypatch.delitem(fastjson.BACKENDS, "orjson", raising=False)
+        config_path = tmp_path / "config.toml"
+        config_path.write_text(
+            f'[auth]\ntoken = "t"\n[sync]\ndatabase = "{tmp_path / "test.db"}"\njson_backend = "orjson"\n'
+        )
+        for command in (["sync"], ["sync", "--today"], ["sync", "--verify"]):
+            result = CliRunner().invoke(cli, ["-c", str(config_path), *command])
+            assert result.exit_code == 1
+            assert "JSON backend 'orjson' is not available" in result.output
+            assert not isinstance(result.exception, fastjson.JSONBackendError)
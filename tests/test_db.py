@@ -0,0 +1,211 @@
+"""Tests for the database storage layout."""
+
+import sqlite3
+import threading
+
+import pytest
+
+from exist_backup import db
+
+LEGACY_SCHEMA = """
+CREATE TABLE attributes (
+    name TEXT PRIMARY KEY, label TEXT NOT NULL, group_name TEXT NOT NULL,
+    group_label TEXT NOT NULL, group_priority INTEGER NOT NULL, priority INTEGER NOT NULL,
+    value_type INTEGER NOT NULL, value_type_description TEXT NOT NULL,
+    service_name TEXT, service_label TEXT, manual INTEGER NOT NULL DEFAULT 0,
+    active INTEGER NOT NULL DEFAULT 1, template TEXT, updated_at TEXT NOT NULL
+);
+CREATE TABLE attribute_values (
+    attribute_name TEXT NOT NULL, date TEXT NOT NULL, value TEXT,
+    PRIMARY KEY (attribute_name, date),
+    FOREIGN KEY (attribute_name) REFERENCES attributes(name)
+);
+"""
+
+
+class TestCompactLayout:
+    def test_numeric_values_stored_natively(self, populated_db):
+        rows = populated_db.execute(
+            "SELECT typeof(d.value) FROM attribute_data d JOIN attribute_ids n ON n.id = d.attribute_id "
+            "WHERE n.name IN ('steps', 'mood_note') AND d.day = ?",
+            (db.date_to_day("2024-12-01"),),
+        ).fetchall()
+        assert sorted(r[0] for r in rows) == ["integer", "text"]
+
+    def test_values_round_trip_as_text(self, test_db):
+        values = ["8432", "6.23", "007", 6201, "100.0", None, "", "-720"]
+        db.upsert_values(test_db, "x", [
+            {"date": f"2024-01-{i + 1:02d}", "value": v} for i, v in enumerate(values)
+        ])
+        rows = db.get_values_for_date_range(test_db, "2024-01-01", "2024-01-31")
+        assert [r["value"] for r in rows] == ["8432", "6.23", "007", "6201", "100.0", None, "", "-720"]
+        assert [r["date"] for r in rows][:2] == ["2024-01-01", "2024-01-02"]
+
+    def test_compatibility_view(self, populated_db):
+        populated_db.execute(
+            "INSERT OR REPLACE INTO attribute_values (attribute_name, date, value) VALUES (?, ?, ?)",
+            ("steps", "2024-12-01", "9000"),
+        )
+        row = populated_db.execute(
+            "SELECT value FROM attribute_values WHERE attribute_name = 'steps' AND date = '2024-12-01'"
+        ).fetchone()
+        assert row["value"] == "9000"
+        assert db.get_last_sync_date(populated_db, "steps") == "2024-12-03"
+
+    def test_day_numbers(self):
+        assert db.date_to_day("1970-01-02") == 1
+        assert db.day_to_date(db.date_to_day("2024-02-29")) == "2024-02-29"
+
+
+class TestMigrateToCompact:
+    def test_migrates_legacy_database(self, tmp_path):
+        db_path = str(tmp_path / "legacy.db")
+        legacy = sqlite3.connect(db_path)
+        legacy.executescript(LEGACY_SCHEMA)
+        legacy.execute(
+            "INSERT INTO attributes VALUES ('steps', 'Steps', 'activity', 'Activity', 1, 1, 0, "
+            "'Integer', NULL, NULL, 0, 1, NULL, 'now')"
+        )
+        legacy.executemany(
+            "INSERT INTO attribute_values VALUES ('steps', ?, ?)",
+            [("2024-12-01", "8432"), ("2024-12-02", "6.5"), ("2024-12-03", None)],
+        )
+        legacy.commit()
+        legacy.close()
+
+        conn = db.connect(db_path)
+        report = db.migrate_to_compact(conn)
+        db.init_db(conn)
+
+        assert report["rows"] == 3
+        assert report["after"]["size_bytes"] > 0
+        rows = db.get_values_for_date_range(conn, "2024-12-01", "2024-12-03")
+        assert [tuple(r) for r in rows] == [
+            ("steps", "2024-12-01", "8432"),
+            ("steps", "2024-12-02", "6.5"),
+            ("steps", "2024-12-03", None),
+        ]
+        assert db.migrate_to_compact(conn) is None
+        conn.close()
+
+
+class TestAttributeFilters:
+    def test_include_group_or_attribute(self, populated_db):
+        filters = {"include_groups": ["sleep"], "include_attributes": ["mood"]}
+        names = [row["name"] for row in db.get_all_attributes(populated_db, filters)]
+        assert names == ["sleep", "sleep_start", "mood"]
+        values = db.get_values_for_date(populated_db, "2024-12-01", filters)
+        assert {row["attribute_name"] for row in values} <= {"sleep", "sleep_start", "mood"}
+        assert any(row["attribute_name"] == "mood" for row in values)
+
+    def test_exclude_service_keeps_attributes_without_service(self, populated_db):
+        filters = {"exclude_services": ["googlefit"]}
+        names = {row["name"] for row in db.get_all_attributes(populated_db, filters)}
+        assert "steps" not in names and "sleep" not in names
+        assert {"mood", "productive_min", "meditation"} <= names
+        rows = db.get_values_for_date_range(populated_db, "2024-12-01", "2024-12-03", filters)
+        assert rows and not {row["attribute_name"] for row in rows} & {"steps", "sleep"}
+
+    def test_filters_use_attribute_index(self, populated_db):
+        sql, params = db._attribute_id_filter({"include_attributes": ["steps"]})
+        plan = " ".join(
+            row[-1] for row in populated_db.execute(
+                "EXPLAIN QUERY PLAN SELECT d.value FROM attribute_data d "
+                f"WHERE d.day >= ? AND d.day <= ? AND {sql}", [0, 10] + params
+            )
+        )
+        assert "SEARCH d USING PRIMARY KEY (attribute_id=?" in plan
+
+    def test_filters_from_config(self):
+        section = {"output_dir": "/x", "include_groups": ["sleep"], "exclude_attributes": []}
+        assert db.filters_from_config(section) == {"include_groups": ["sleep"]}
+
+    def test_sync_filters_add_flags_that_are_set(self):
+        section = {"database": "/x", "exclude_groups": ["custom"], "manual": False}
+        assert db.sync_filters_from_config(section) == {"exclude_groups": ["custom"], "manual": False}
+        assert db.sync_filters_from_config({"active": None}) == {}
+
+    @pytest.mark.parametrize("filters", [
+        {},
+        {"include_groups": ["sleep"], "include_attributes": ["mood"]},
+        {"exclude_services": ["googlefit"]},
+        {"include_services": ["googlefit"], "exclude_attributes": ["steps"]},
+        {"manual": True},
+        {"active": True, "exclude_groups": ["mood"]},
+    ])
+    def test_attribute_matches_agrees_with_sql(self, populated_db, sample_attributes, filters):
+        in_sql = {row["name"] for row in db.get_all_attributes(populated_db, filters)}
+        in_python = {attr["name"] for attr in sample_attributes if db.attribute_matches(attr, filters)}
+        assert in_python == in_sql
+
+
+class TestReadOnlyConnections:
+    def test_readonly_cannot_write(self, populated_db, tmp_path):
+        conn = db.connect_readonly(str(tmp_path / "test.db"))
+        assert db.get_values_for_date(conn, "2024-12-01")
+        with pytest.raises(sqlite3.OperationalError):
+            conn.execute("DELETE FROM attribute_data")
+        conn.close()
+
+    def test_creates_missing_database(self, tmp_path):
+        db_path = str(tmp_path / "new" / "exist.db")
+        conn = db.connect_readonly(db_path)
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == db.SCHEMA_VERSION
+        assert db.get_sync_status(conn)["total_values"] == 0
+        conn.close()
+
+    def test_reads_during_open_write_transaction(self, populated_db, tmp_path):
+        db_path = str(tmp_path / "test.db")
+        reader = db.connect_readonly(db_path, busy_timeout_ms=100)
+        before = db.get_sync_status(reader)["total_values"]
+
+        populated_db.execute("BEGIN IMMEDIATE")
+        populated_db.execute("DELETE FROM attribute_data")
+        assert db.get_sync_status(reader)["total_values"] == before
+        populated_db.commit()
+        assert db.get_sync_status(reader)["total_values"] == 0
+        reader.close()
+
+    def test_pool_reuses_and_bounds_connections(self, populated_db, tmp_path):
+        pool = db.ReadPool(str(tmp_path / "test.db"), size=2)
+        with pool.connection() as first:
+            with pool.connection() as second:
+                assert first is not second
+        with pool.connection() as again:
+            assert again in (first, second)
+
+        acquired = threading.Event()
+
+        def borrow():
+            with pool.connection():
+                acquired.set()
+
+        with pool.connection(), pool.connection():
+            thread = threading.Thread(target=borrow)
+            thread.start()
+            assert not acquired.wait(0.1)
+        assert acquired.wait(1)
+        thread.join()
+        pool.close()
+
+
+class TestDayChanges:
+    def test_writes_stamp_changed_days(self, populated_db):
+        start = db.get_change_seq(populated_db)
+        db.upsert_values(populated_db, "steps", [{"date": "2024-12-05", "value": 1}])
+        populated_db.execute("INSERT OR REPLACE INTO attribute_values (attribute_name, date, value) "
+                             "VALUES ('steps', '2024-12-01', '2')")
+        populated_db.commit()
+
+        dates, seq = db.get_changed_dates(populated_db, start)
+        assert dates == ["2024-12-01", "2024-12-05"]
+        assert seq == start + 2
+        assert db.get_changed_dates(populated_db, seq) == ([], seq)
+
+    def test_data_version_moves_on_other_commits(self, populated_db, tmp_path):
+        reader = db.connect_readonly(str(tmp_path / "test.db"))
+        before = db.get_data_version(reader)
+        assert db.get_data_version(reader) == before
+        db.upsert_values(populated_db, "steps", [{"date": "2024-12-06", "value": 1}])
+        assert db.get_data_version(reader) != before
+        reader.close()
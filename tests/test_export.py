@@ -1,12 +1,22 @@
 """Tests for Obsidian markdown export."""
 
+import csv
+import json
+import sqlite3
+import threading
+import time
 from datetime import date
 from pathlib import Path
 
 import pytest
+from click.testing import CliRunner
 
-from exist_backup import db
-from exist_backup.export import export_date_range, query_day
+from exist_backup import db, export as export_module
+from exist_backup.cli import cli
+from exist_backup.export import (
+    export_date_range, query_day, replace_block, run_export, scan_days, watch_export,
+)
+from exist_backup.sinks import SinkError
 
 
 class TestQueryDay:
@@ -79,3 +89,215 @@ class TestExportDateRange:
         assert "Exist.io 2024-12-01" in content
         assert "Steps" in content
         assert "8,432" in content
+
+
+class TestMergeExport:
+    @pytest.fixture
+    def config(self, populated_db, tmp_path):
+        return {
+            "sync": {"database": str(tmp_path / "test.db")},  # populated_db lives here
+            "export": {
+                "output_dir": str(tmp_path / "vault"),
+                "mode": "merge",
+                "note_path": "Daily/{date}.md",
+            },
+        }
+
+    def test_creates_appends_and_replaces_blocks(self, config, tmp_path):
+        daily = tmp_path / "vault" / "Daily"
+        daily.mkdir(parents=True)
+        (daily / "2024-12-01.md").write_text("# My day\n\nWent for a run.\n")
+        (daily / "2024-12-02.md").write_text(
+            "Before\n%% exist:start %%\nstale\n%% exist:end %%\nAfter\n"
+        )
+
+        count = export_date_range(config, date(2024, 12, 1), date(2024, 12, 3))
+
+        assert count == 3
+        appended = (daily / "2024-12-01.md").read_text()
+        assert appended.startswith("# My day\n\nWent for a run.\n\n%% exist:start %%\n")
+        assert "8,432" in appended
+        assert appended.endswith("%% exist:end %%\n")
+        replaced = (daily / "2024-12-02.md").read_text()
+        assert replaced.startswith("Before\n%% exist:start %%\n")
+        assert replaced.endswith("%% exist:end %%\nAfter\n")
+        assert "stale" not in replaced
+        created = (daily / "2024-12-03.md").read_text()
+        assert created.startswith("%% exist:start %%\n")
+        assert "---" not in created
+
+    def test_unchanged_notes_are_not_rewritten(self, config, tmp_path):
+        export_date_range(config, date(2024, 12, 1), date(2024, 12, 3))
+        note = tmp_path / "vault" / "Daily" / "2024-12-01.md"
+        mtime = note.stat().st_mtime_ns
+
+        assert export_date_range(config, date(2024, 12, 1), date(2024, 12, 3)) == 0
+        assert note.stat().st_mtime_ns == mtime
+
+        # Hand edits outside the block invalidate the cached hash but not the block
+        note.write_text("Edited\n" + note.read_text())
+        assert export_date_range(config, date(2024, 12, 1), date(2024, 12, 3)) == 0
+        assert note.read_text().startswith("Edited\n%% exist:start %%")
+
+    def test_skips_unterminated_block(self, config, tmp_path):
+        note = tmp_path / "vault" / "Daily" / "2024-12-01.md"
+        note.parent.mkdir(parents=True)
+        note.write_text("%% exist:start %%\nno end marker\n")
+
+        export_date_range(config, date(2024, 12, 1), date(2024, 12, 1))
+
+        assert note.read_text() == "%% exist:start %%\nno end marker\n"
+
+
+def test_replace_block_custom_markers():
+    text = "a\n<!-- s -->\nold\n<!-- e -->\nb\n"
+    assert replace_block(text, "<!-- s -->\nnew\n<!-- e -->", "<!-- s -->", "<!-- e -->") == (
+        "a\n<!-- s -->\nnew\n<!-- e -->\nb\n"
+    )
+
+
+def test_export_cli_filters(populated_db, tmp_path):
+    config_path = tmp_path / "config.toml"
+    config_path.write_text(
+        f'[sync]\ndatabase = "{tmp_path / "test.db"}"\n'
+        f'[export]\noutput_dir = "{tmp_path / "export"}"\nexclude_groups = ["activity"]\n'
+    )
+    result = CliRunner().invoke(cli, [
+        "-c", str(config_path), "export", "--from", "2024-12-01", "--to", "2024-12-01",
+        "--include-group", "sleep",
+    ])
+    assert result.exit_code == 0, result.output
+    content = (tmp_path / "export" / "2024" / "2024-12-01.md").read_text()
+    assert "## Sleep" in content
+    assert "Steps" not in content and "Mood" not in content
+
+
+class RecordingSink:
+    """Plugin sink used via "tests.test_export:RecordingSink"."""
+
+    days = []
+
+    def __init__(self, export_config, options):
+        self.prefix = options.get("prefix", "")
+
+    def write(self, day):
+        RecordingSink.days.append(self.prefix + day["date"])
+
+    def close(self):
+        return len(RecordingSink.days)
+
+
+class TestExportPipeline:
+    def test_one_scan_feeds_every_sink(self, populated_db, tmp_path, monkeypatch):
+        scans = []
+        original = db.iter_values_for_date_range
+        monkeypatch.setattr(db, "iter_values_for_date_range", lambda *a: scans.append(a) or original(*a))
+        RecordingSink.days = []
+        plugin = "tests.test_export:RecordingSink"
+        config = {
+            "sync": {"database": str(tmp_path / "test.db")},
+            "export": {
+                "output_dir": str(tmp_path / "export"),
+                "sinks": ["markdown", "csv", "json", plugin],
+                plugin: {"prefix": "day:"},
+            },
+        }
+
+        results = run_export(config, date(2024, 12, 1), date(2024, 12, 3))
+
+        assert len(scans) == 1
+        assert results == {"markdown": 3, "csv": 3, "json": 3, plugin: 3}
+        assert RecordingSink.days == ["day:2024-12-01", "day:2024-12-02", "day:2024-12-03"]
+        with open(tmp_path / "export" / "exist.csv", newline="") as f:
+            rows = list(csv.DictReader(f))
+        steps = next(r for r in rows if r["date"] == "2024-12-01" and r["attribute"] == "steps")
+        assert steps["formatted_value"] == "8,432"
+        lines = (tmp_path / "export" / "exist.jsonl").read_text().splitlines()
+        assert [json.loads(line)["date"] for line in lines] == ["2024-12-01", "2024-12-02", "2024-12-03"]
+        assert (tmp_path / "export" / "2024" / "2024-12-02.md").exists()
+
+    def test_scan_matches_query_day(self, populated_db):
+        days = list(scan_days(populated_db, "2024-12-01", "2024-12-03"))
+        assert days == [query_day(populated_db, d["date"]) for d in days]
+
+    def test_unknown_sink(self, populated_db, tmp_path):
+        config = {"sync": {"database": str(tmp_path / "test.db")}, "export": {"output_dir": str(tmp_path)}}
+        with pytest.raises(SinkError):
+            run_export(config, date(2024, 12, 1), date(2024, 12, 1), ["parquet"])
+
+    def test_failed_export_leaves_no_temp_files(self, populated_db, tmp_path, monkeypatch):
+        export_dir = tmp_path / "export"
+        config = {"sync": {"database": str(tmp_path / "test.db")}, "export": {"output_dir": str(export_dir)}}
+        with pytest.raises(SinkError):
+            run_export(config, date(2024, 12, 1), date(2024, 12, 1), ["csv", "json", "parquet"])
+        assert list(export_dir.iterdir()) == []
+
+        def failing_scan(*args):
+            raise sqlite3.OperationalError("disk I/O error")
+            yield
+
+        monkeypatch.setattr(export_module, "scan_days", failing_scan)
+        with pytest.raises(sqlite3.OperationalError):
+            run_export(config, date(2024, 12, 1), date(2024, 12, 1), ["csv", "json"])
+        assert list(export_dir.iterdir()) == []
+
+
+class TestWatchExport:
+    @pytest.fixture
+    def watching(self, populated_db, tmp_path):
+        config = {
+            "sync": {"database": str(tmp_path / "test.db")},  # populated_db lives here
+            "export": {"output_dir": str(tmp_path / "vault"), "template": "daily"},
+        }
+        stop = threading.Event()
+        thread = threading.Thread(target=watch_export, args=(config, date(2024, 12, 2)),
+                                  kwargs={"interval": 0.02, "stop": stop})
+        thread.start()
+        time.sleep(0.1)
+        yield populated_db, tmp_path / "vault" / "2024"
+        stop.set()
+        thread.join()
+
+    def _wait_for(self, path):
+        deadline = time.monotonic() + 5
+        while not path.exists() and time.monotonic() < deadline:
+            time.sleep(0.02)
+        return path.exists()
+
+    def test_renders_only_changed_days_in_range(self, watching):
+        conn, notes = watching
+        db.upsert_values(conn, "steps", [
+            {"date": "2024-12-01", "value": 1},  # before --from
+            {"date": "2024-12-03", "value": 12345},
+        ])
+
+        assert self._wait_for(notes / "2024-12-03.md")
+        assert "12,345" in (notes / "2024-12-03.md").read_text()
+        assert sorted(p.name for p in notes.iterdir()) == ["2024-12-03.md"]
+
+    def test_changes_through_the_view_are_seen(self, watching):
+        conn, notes = watching
+        conn.execute("INSERT OR REPLACE INTO attribute_values (attribute_name, date, value) "
+                     "VALUES ('steps', '2024-12-02', '777')")
+        conn.commit()
+
+        assert self._wait_for(notes / "2024-12-02.md")
+        assert "777" in (notes / "2024-12-02.md").read_text()
+
+    def test_changes_before_the_watch_starts_are_caught_up(self, populated_db, tmp_path):
+        config = {
+            "sync": {"database": str(tmp_path / "test.db")},
+            "export": {"output_dir": str(tmp_path / "vault"), "template": "daily"},
+        }
+        since_seq = db.get_change_seq(populated_db)
+        # Committed while an initial export would be running
+        db.upsert_values(populated_db, "steps", [{"date": "2024-12-04", "value": 4321}])
+        stop = threading.Event()
+        thread = threading.Thread(target=watch_export, args=(config, date(2024, 12, 1)),
+                                  kwargs={"interval": 0.02, "stop": stop, "since_seq": since_seq})
+        thread.start()
+        try:
+            assert self._wait_for(tmp_path / "vault" / "2024" / "2024-12-04.md")
+        finally:
+            stop.set()
+            thread.join()
@@ -0,0 +1,80 @@
+"""Tests for importing an Exist.io CSV export."""
+
+import zipfile
+
+from click.testing import CliRunner
+
+from exist_backup import db
+from exist_backup.cli import cli
+from exist_backup.importer import import_archive
+
+
+def _zip(path, files):
+    with zipfile.ZipFile(path, "w") as archive:
+        for name, text in files.items():
+            archive.writestr(name, text)
+    return path
+
+
+class TestImportArchive:
+    def test_long_and_wide_layouts(self, test_db, tmp_path):
+        archive = _zip(tmp_path / "export.zip", {
+            "exist/long.csv": "attribute,date,value\nsteps,2024-01-01,100\nsteps,2024-01-02,\nmood_note,2024-01-02,ok\n",
+            "exist/wide.csv": "date,weight,sleep\n2024-01-01,70.5,420\n2024-01-03,,400\n",
+            "exist/readme.txt": "not a csv",
+        })
+
+        report = import_archive(test_db, archive, batch_size=2)
+
+        assert report["files"] == 2
+        assert report["values"] == 5
+        assert report["skipped"] == 2
+        assert report["watermark"] == "2024-01-03"
+        assert db.get_last_sync_date(test_db, "sleep") == "2024-01-03"
+        values = {row["attribute_name"]: row["value"] for row in db.get_values_for_date(test_db, "2024-01-01")}
+        assert values == {"steps": "100", "weight": "70.5", "sleep": "420"}
+
+    def test_placeholders_keep_existing_metadata(self, test_db, tmp_path, sample_attributes):
+        steps = next(a for a in sample_attributes if a["name"] == "steps")
+        db.upsert_attribute(test_db, steps)
+        archive = tmp_path / "steps.csv"
+        archive.write_text("date,value\n2024-01-01,100\n")
+        (tmp_path / "mood_note.csv").write_text("date,value\n2024-01-01,fine\n")
+
+        import_archive(test_db, archive)
+        import_archive(test_db, tmp_path / "mood_note.csv")
+
+        attrs = {row["name"]: row for row in db.get_all_attributes(test_db)}
+        assert attrs["steps"]["label"] == steps["label"]
+        assert attrs["mood_note"]["group_name"] == "imported"
+        assert attrs["mood_note"]["value_type"] == 2
+        assert db.search_values(test_db, "fine")
+
+    def test_manual_values_are_recorded_as_synced(self, test_db, tmp_path, sample_attributes):
+        for attr in sample_attributes:
+            db.upsert_attribute(test_db, attr)
+        archive = tmp_path / "data.csv"
+        archive.write_text("name,date,value\nmood,2024-01-01,7\nmeditation,2024-01-01,15\nsteps,2024-01-01,1\n")
+
+        import_archive(test_db, archive)
+
+        assert db.get_pending_manual_values(test_db) == []
+
+    def test_logged_as_sync(self, test_db, tmp_path):
+        archive = tmp_path / "data.csv"
+        archive.write_text("name,date,value\nsteps,2024-01-01,1\n")
+        import_archive(test_db, archive)
+        assert db.get_global_last_sync(test_db) is not None
+        assert db.get_oldest_last_sync_date(test_db) == "2024-01-01"
+
+
+def test_import_cli(tmp_path):
+    config_path = tmp_path / "config.toml"
+    config_path.write_text(f'[sync]\ndatabase = "{tmp_path / "cli.db"}"\n')
+    archive = _zip(tmp_path / "export.zip", {"steps.csv": "date,value\n2024-01-01,1\n2024-01-02,2\n"})
+
+    result = CliRunner().invoke(cli, ["-c", str(config_path), "import", str(archive)])
+
+    assert result.exit_code == 0, result.output
+    assert "Imported 2 values for 1 attributes from 1 files" in result.output
+    assert "Latest imported date: 2024-01-02" in result.output
@@ -0,0 +1,83 @@
+"""Tests for database maintenance."""
+
+import sqlite3
+
+from click.testing import CliRunner
+
+from exist_backup import db, maintenance
+from exist_backup.cli import cli
+
+
+def _churn(conn, rounds=5):
+    """Rewrite every value a few times, like repeated full syncs."""
+    values = [{"date": f"2024-01-{d:02d}", "value": str(d)} for d in range(1, 29)]
+    for attr in range(30):
+        db.upsert_values(conn, f"attr_{attr}", values)
+    for _ in range(rounds):
+        conn.execute("DELETE FROM attribute_data")
+        conn.commit()
+        for attr in range(30):
+            db.upsert_values(conn, f"attr_{attr}", values)
+
+
+class TestMaintain:
+    def test_new_databases_use_incremental_vacuum(self, test_db):
+        assert test_db.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+
+    def test_reclaims_wal_and_free_pages(self, test_db, tmp_path):
+        db_path = str(tmp_path / "test.db")
+        _churn(test_db)
+        test_db.execute("DELETE FROM attribute_data WHERE attribute_id > 5")
+        test_db.commit()
+
+        report = maintenance.maintain(test_db, db_path)
+
+        assert report["before"]["wal_bytes"] > 0
+        assert report["after"]["wal_bytes"] == 0
+        assert report["after"]["freelist_pages"] == 0
+        assert "incremental_vacuum" in report["steps"]
+        assert "analyze" in report["steps"]
+        assert report["reclaimed_bytes"] > 0
+        assert not report["checkpoint"]["busy"]
+        by_name = {q["name"]: q for q in report["queries"]}
+        assert set(by_name) == {"values_for_date", "values_for_range", "attribute_range", "last_sync_date"}
+        assert not any(q["full_scan"] for q in report["queries"])
+
+        # Statistics exist now, so later runs only optimize
+        assert "optimize" in maintenance.maintain(test_db, db_path, explain=False)["steps"]
+
+    def test_full_vacuum_converts_legacy_auto_vacuum(self, tmp_path):
+        db_path = str(tmp_path / "old.db")
+        raw = sqlite3.connect(db_path)
+        raw.execute("PRAGMA journal_mode=WAL")
+        raw.execute("CREATE TABLE t (x)")
+        raw.commit()
+        raw.close()
+        conn = db.connect(db_path)
+        db.init_db(conn)
+        assert conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 0
+
+        report = maintenance.maintain(conn, db_path, full_vacuum=True)
+
+        assert report["auto_vacuum"] == "incremental"
+        conn.close()
+
+    def test_auto_maintain_thresholds(self, test_db, tmp_path):
+        config = {"sync": {"database": str(tmp_path / "test.db")}, "maintenance": {"auto": False}}
+        _churn(test_db, rounds=1)
+        assert maintenance.auto_maintain(test_db, config) is None
+
+        config["maintenance"] = {"auto": True, "wal_mb": 1024, "freelist_pct": 100}
+        assert maintenance.auto_maintain(test_db, config) is None
+
+        config["maintenance"]["wal_mb"] = 0
+        assert maintenance.auto_maintain(test_db, config)["after"]["wal_bytes"] == 0
+
+
+def test_maintain_cli(populated_db, tmp_path):
+    config_path = tmp_path / "config.toml"
+    config_path.write_text(f'[sync]\ndatabase = "{tmp_path / "test.db"}"\n')
+    result = CliRunner().invoke(cli, ["-c", str(config_path), "maintain"])
+    assert result.exit_code == 0, result.output
+    assert "WAL:" in result.output
+    assert "values_for_date" in result.output
@@ -0,0 +1,91 @@
+"""Tests for instrumentation metrics."""
+
+import json
+from unittest.mock import MagicMock, patch
+
+import pytest
+from click.testing import CliRunner
+
+from exist_backup import db, metrics
+from exist_backup.cli import cli
+from exist_backup.sync import run_sync
+
+
+@pytest.fixture(autouse=True)
+def clean_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+class TestMetrics:
+    def test_timer_and_counter(self):
+        with metrics.timer("work", op="a"):
+            pass
+        with metrics.timer("work", op="a"):
+            pass
+        metrics.count("rows", 5)
+        data = metrics.snapshot()
+        assert data["timers"]["work{op=a}"]["count"] == 2
+        assert data["counters"]["rows"] == 5
+
+    def test_since(self):
+        metrics.count("rows", 5)
+        earlier = metrics.snapshot()
+        metrics.count("rows", 2)
+        metrics.record("work", 0.5)
+        assert metrics.since(earlier) == {
+            "timers": {"work": {"count": 1, "seconds": 0.5}},
+            "counters": {"rows": 2},
+        }
+
+    def test_prometheus_text(self):
+        metrics.record("http_request", 0.25, endpoint="attributes/")
+        metrics.count("db_rows_written", 3)
+        text = metrics.prometheus_text()
+        assert 'exist_backup_http_request_seconds_total{endpoint="attributes/"} 0.250000' in text
+        assert 'exist_backup_http_request_count{endpoint="attributes/"} 1' in text
+        assert "exist_backup_db_rows_written_total 3" in text
+
+
+class TestSyncMetrics:
+    @patch("exist_backup.sync.api.ExistClient")
+    def test_run_sync_persists_metrics(self, MockClient, tmp_path, sample_profile, sample_attributes):
+        client = MagicMock()
+        client.get_profile.return_value = sample_profile
+        client.get_attributes.return_value = sample_attributes
+        client.get_attribute_values.side_effect = lambda name, date_max=None: iter(
+            [{"date": "2024-12-01", "value": "1"}]
+        )
+        MockClient.return_value = client
+        config = {"auth": {"token": "t"}, "sync": {"database": str(tmp_path / "m.db")}}
+
+        result = run_sync(config, full=True)
+
+        assert result["metrics"]["counters"]["db_rows_written"] == len(sample_attributes)
+        assert result["metrics"]["timers"]["db_write{op=upsert_values}"]["count"] == len(sample_attributes)
+        conn = db.connect(config["sync"]["database"])
+        sync_id = conn.execute("SELECT MAX(id) FROM sync_log").fetchone()[0]
+        names = {row["name"] for row in db.get_sync_metrics(conn, sync_id)}
+        conn.close()
+        assert "sync_run{type=full}" in names
+        assert "db_rows_written" in names
+
+
+class TestCliMetricsOptions:
+    def test_metrics_outputs(self, tmp_path):
+        config_path = tmp_path / "config.toml"
+        config_path.write_text(f'[sync]\ndatabase = "{tmp_path / "cli.db"}"\n')
+        metrics_path = tmp_path / "metrics.json"
+        prom_path = tmp_path / "exist.prom"
+
+        result = CliRunner().invoke(cli, [
+            "-c", str(config_path),
+            "--metrics-json", str(metrics_path),
+            "--prometheus-textfile", str(prom_path),
+            "status",
+        ])
+        assert result.exit_code == 0, result.output
+        assert set(json.loads(metrics_path.read_text())) == {"timers", "counters"}
+        assert "Total values:     0" in result.output
+        assert prom_path.exists()
@@ -0,0 +1,128 @@
+"""Tests for the sync planner."""
+
+from datetime import date, timedelta
+
+from benchmarks.stub_server import StubExistServer
+from benchmarks.synthetic import SyntheticDataset
+from exist_backup import db, metrics, planner
+from exist_backup.sync import run_sync
+
+YESTERDAY = date.today() - timedelta(days=1)
+
+
+def _store(conn, attributes, lag_days):
+    """Attributes with daily values for a year, ending `lag_days[name]` days before yesterday."""
+    for priority, name in enumerate(attributes):
+        db.upsert_attribute(conn, {
+            "name": name, "label": name, "group": {"name": "g", "label": "G", "priority": 1},
+            "priority": priority, "value_type": 0, "value_type_description": "Integer",
+        })
+        end = YESTERDAY - timedelta(days=lag_days[name])
+        db.upsert_values(conn, name, [
+            {"date": str(end - timedelta(days=i)), "value": i} for i in range(365)
+        ])
+
+
+def _by_name(plan):
+    return {e["name"]: e for e in plan["attributes"]}
+
+
+class TestBuildPlan:
+    def test_empty_database_uses_full_bulk_window(self, test_db):
+        plan = planner.build_plan(test_db, date_max=YESTERDAY)
+        assert plan["bulk_days"] == 31
+        assert plan["requests"] == {"accounts/profile/": 1, "attributes/with-values/": 1}
+
+    def test_strategies_follow_watermarks(self, test_db):
+        _store(test_db, ["steps", "sleep", "mood"], {"steps": 0, "sleep": 5, "mood": 250})
+        plan = planner.build_plan(test_db, date_max=YESTERDAY)
+
+        entries = _by_name(plan)
+        assert entries["steps"]["strategy"] == planner.CURRENT
+        assert entries["sleep"]["strategy"] == planner.BULK
+        assert entries["mood"]["strategy"] == planner.TAIL
+        assert entries["mood"]["requests"] == 3  # 250 - 31 days before the window, 100 per page
+        assert plan["bulk_days"] == 31
+        assert plan["requests"]["attributes/values/"] == 3
+
+    def test_bulk_window_covers_the_stalest_attribute(self, test_db):
+        _store(test_db, ["steps", "sleep"], {"steps": 2, "sleep": 7})
+        plan = planner.build_plan(test_db, date_max=YESTERDAY)
+        assert plan["bulk_days"] == 7
+        assert "attributes/values/" not in plan["requests"]
+
+    def test_up_to_date_needs_only_the_profile(self, test_db):
+        _store(test_db, ["steps"], {"steps": 0})
+        plan = planner.build_plan(test_db, date_max=YESTERDAY)
+        assert plan["bulk_days"] == 0
+        assert plan["requests"] == {"accounts/profile/": 1}
+
+    def test_full_pages_through_each_history(self, test_db):
+        _store(test_db, ["steps", "sleep"], {"steps": 0, "sleep": 0})
+        plan = planner.build_plan(test_db, full=True, date_max=YESTERDAY)
+        assert {e["strategy"] for e in plan["attributes"]} == {planner.FULL}
+        assert plan["requests"] == {"accounts/profile/": 1, "attributes/": 1, "attributes/values/": 8}
+
+
+class TestEstimate:
+    def test_defaults_without_history(self, test_db):
+        plan = planner.build_plan(test_db, date_max=YESTERDAY)
+        cost = planner.estimate(test_db, plan)
+        assert cost["requests"] == 2
+        assert cost["request_seconds"] == 2 * planner.DEFAULT_REQUEST_SECONDS
+        assert cost["history"] == 0
+
+    def test_uses_timings_from_past_syncs(self, test_db):
+        sync_id = db.write_sync_log(test_db, "incremental", 0, 0, "success")
+        db.write_sync_metrics(test_db, sync_id, {
+            "timers": {
+                "http_request{endpoint=accounts/profile/}": {"count": 4, "seconds": 0.4},
+                "http_request{endpoint=attributes/with-values/}": {"count": 2, "seconds": 3.0},
+                "http_throttle_wait{endpoint=attributes/with-values/}": {"count": 1, "seconds": 6.0},
+            },
+            "counters": {},
+        })
+        plan = planner.build_plan(test_db, date_max=YESTERDAY)
+        cost = planner.estimate(test_db, plan)
+        assert cost["request_seconds"] == 1.6
+        assert cost["throttle_seconds"] == 2.0  # 6s waited over 6 requests
+        assert cost["history"] == 1
+
+    def test_quota_stretches_large_runs(self, test_db):
+        plan = {"requests": {"attributes/values/": 601}}
+        assert planner.estimate(test_db, plan)["throttle_seconds"] == 2 * planner.RATE_LIMIT_WINDOW
+
+
+class TestPlanMatchesSync:
+    def test_requests_made_match_the_plan(self, tmp_path):
+        dataset = SyntheticDataset(6, 2, end_date=YESTERDAY)
+        db_path = str(tmp_path / "plan.db")
+        dataset.build_db(db_path, until=YESTERDAY - timedelta(days=10))
+        conn = db.connect(db_path)
+        lagging = db.get_attribute_id(conn, "activity_0")
+        conn.execute("DELETE FROM attribute_data WHERE attribute_id = ? AND day > ?",
+                     (lagging, db.date_to_day(YESTERDAY - timedelta(days=250))))
+        conn.commit()
+        plan = planner.build_plan(conn, date_max=YESTERDAY)
+        conn.close()
+        assert _by_name(plan)["activity_0"]["strategy"] == planner.TAIL
+
+        metrics.reset()
+        with StubExistServer(dataset) as stub:
+            config = {"auth": {"token": "t"}, "sync": {"database": db_path, "api_url": stub.base_url}}
+            result = run_sync(config)
+
+        assert result["status"] == "success"
+        counters = metrics.snapshot()["counters"]
+        made = {
+            endpoint: counters.get(f"http_responses{{endpoint={endpoint},status=200}}", 0)
+            for endpoint in plan["requests"]
+        }
+        # Page counts for the tail are estimated from the stored value density
+        planned = dict(plan["requests"])
+        assert abs(made.pop("attributes/values/") - planned.pop("attributes/values/")) <= 1
+        assert made == planned
+        conn = db.connect(db_path)
+        assert db.get_last_sync_date(conn, "activity_0") == str(YESTERDAY)
+        assert db.get_sync_status(conn)["total_values"] == dataset.total_values
+        conn.close()
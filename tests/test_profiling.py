@@ -0,0 +1,73 @@
+"""Tests for the --profile hooks."""
+
+import json
+import pstats
+import time
+
+from click.testing import CliRunner
+
+from exist_backup import db
+from exist_backup.cli import cli
+from exist_backup.profiling import HOT_PATHS, Profiler, hot_path
+
+
+@hot_path("busy")
+def _busy(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+class TestProfiler:
+    def test_hot_paths_registered(self):
+        assert {"paginate", "upsert_values", "query_day", "format_value", "template_render"} <= set(
+            HOT_PATHS.values()
+        )
+
+    def test_deterministic_writes_pstats(self, tmp_path):
+        path = tmp_path / "run.prof"
+        profiler = Profiler(path)
+        profiler.start()
+        _busy(0.01)
+        profiler.stop()
+        stats = pstats.Stats(str(path))
+        assert any(func == "_busy" for _, _, func in stats.stats)
+
+    def test_sampling_writes_speedscope(self, tmp_path):
+        path = tmp_path / "run.speedscope.json"
+        profiler = Profiler(path, mode="sampling", interval_ms=1)
+        profiler.start()
+        _busy(0.1)
+        profiler.stop()
+        doc = json.loads(path.read_text())
+        assert doc["profiles"][0]["type"] == "sampled"
+        assert doc["profiles"][0]["samples"]
+        assert any(f["name"] == "[busy] _busy" for f in doc["shared"]["frames"])
+
+    def test_trace_alloc(self, tmp_path):
+        path = tmp_path / "run.prof"
+        profiler = Profiler(path, trace_alloc=True)
+        profiler.start()
+        data = [bytes(1000) for _ in range(100)]
+        profiler.stop()
+        assert data
+        assert (tmp_path / "run.prof.alloc.txt").read_text().startswith("current=")
+
+
+class TestCliProfile:
+    def test_export_under_profile(self, tmp_path, populated_db):
+        db_path = tmp_path / "test.db"  # populated_db lives here
+        config_path = tmp_path / "config.toml"
+        config_path.write_text(
+            f'[sync]\ndatabase = "{db_path}"\n[export]\noutput_dir = "{tmp_path / "export"}"\n'
+        )
+        profile_path = tmp_path / "export.prof"
+
+        result = CliRunner().invoke(cli, [
+            "-c", str(config_path), "--profile", str(profile_path),
+            "export", "--from", "2024-12-01", "--to", "2024-12-03",
+        ])
+        assert result.exit_code == 0, result.output
+        stats = pstats.Stats(str(profile_path))
+        assert any(func == "scan_days" for _, _, func in stats.stats)
+        assert db.get_values_for_date(populated_db, "2024-12-01")
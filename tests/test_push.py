@@ -0,0 +1,97 @@
+"""Tests for pushing manual attribute values back to Exist.io."""
+
+from datetime import date, timedelta
+
+import pytest
+
+from exist_backup import db
+from exist_backup.push import run_push
+
+YESTERDAY = date.today() - timedelta(days=1)
+
+
+@pytest.fixture
+def setup(stub_setup):
+    config, dataset, stub = stub_setup(12)
+    config["push"] = {"increment": []}
+    return config, dataset, stub
+
+
+def _set_local(db_path, name, values):
+    conn = db.connect(db_path)
+    conn.executemany(
+        "INSERT OR REPLACE INTO attribute_values (attribute_name, date, value) VALUES (?, ?, ?)",
+        [(name, d, v) for d, v in values],
+    )
+    conn.commit()
+    conn.close()
+
+
+def _days(n):
+    return [(YESTERDAY - timedelta(days=i)).isoformat() for i in range(n)]
+
+
+class TestPush:
+    def test_nothing_pending_after_sync(self, setup):
+        config, _, stub = setup
+        assert run_push(config)["pending"] == 0
+        assert stub.state.stats["requests"] == 0
+
+    def test_pushes_only_changed_manual_values_in_batches(self, setup):
+        config, dataset, stub = setup
+        db_path = config["sync"]["database"]
+        _set_local(db_path, "productivity_3", [(d, 1000 + i) for i, d in enumerate(_days(40))])
+        _set_local(db_path, "health_11", [(YESTERDAY.isoformat(), "wrote this in obsidian")])
+
+        result = run_push(config)
+
+        assert result == {"pending": 41, "pushed": 41, "failed": [], "status": "success"}
+        assert stub.state.stats["requests"] == 2  # 41 values at 35 per batch
+        remote = {v["date"]: v["value"] for v in dataset.values["productivity_3"]}
+        assert remote[YESTERDAY.isoformat()] == 1000
+        assert dataset.values["health_11"][0] == {"date": YESTERDAY.isoformat(), "value": "wrote this in obsidian"}
+
+        conn = db.connect(db_path)
+        assert db.get_pending_manual_values(conn) == []
+        log = conn.execute("SELECT sync_type, values_synced, status FROM sync_log ORDER BY id DESC").fetchone()
+        conn.close()
+        assert tuple(log) == ("push", 41, "success")
+
+    def test_increment_sends_difference(self, setup):
+        config, dataset, stub = setup
+        config["push"]["increment"] = ["productivity_3"]
+        day = YESTERDAY.isoformat()
+        remote_before = next(v["value"] for v in dataset.values["productivity_3"] if v["date"] == day)
+        _set_local(config["sync"]["database"], "productivity_3", [(day, remote_before + 15)])
+        # Another app increments on the server meanwhile
+        stub.state.apply_writes([{"name": "productivity_3", "date": day, "value": 5}], increment=True)
+
+        assert run_push(config)["pushed"] == 1
+
+        remote = next(v["value"] for v in dataset.values["productivity_3"] if v["date"] == day)
+        assert remote == remote_before + 20
+
+    def test_rejected_values_stay_pending(self, setup):
+        config, dataset, _ = setup
+        db_path = config["sync"]["database"]
+        # Manual locally (e.g. acquired by another app), but the stub won't accept writes
+        conn = db.connect(db_path)
+        db.upsert_attribute(conn, {**dataset.attributes[0], "manual": True})
+        conn.close()
+        _set_local(db_path, "activity_0", [(YESTERDAY.isoformat(), 1)])
+
+        result = run_push(config)
+
+        assert result["status"] == "error"
+        assert result["failed"][0]["name"] == "activity_0"
+        conn = db.connect(db_path)
+        assert len(db.get_pending_manual_values(conn)) == 1
+        error = conn.execute("SELECT last_error FROM manual_sync_state WHERE last_error IS NOT NULL").fetchone()
+        conn.close()
+        assert "not owned" in error[0]
+
+    def test_dry_run_sends_nothing(self, setup):
+        config, _, stub = setup
+        _set_local(config["sync"]["database"], "health_11", [(YESTERDAY.isoformat(), "draft")])
+        assert run_push(config, dry_run=True) == {"pending": 1, "pushed": 0, "failed": [], "status": "dry-run"}
+        assert stub.state.stats["requests"] == 0
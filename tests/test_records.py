@@ -0,0 +1,172 @@
+"""Tests for incrementally maintained streaks and records."""
+
+import random
+from datetime import date, timedelta
+
+from click.testing import CliRunner
+
+from exist_backup import db, metrics, records
+from exist_backup.cli import cli
+from exist_backup.export import query_day
+
+GOALS = {"steps": 10000}
+
+
+def _attribute(name, value_type):
+    return {
+        "name": name, "label": name.title(), "priority": 1, "value_type": value_type,
+        "value_type_description": "", "group": {"name": "g", "label": "G", "priority": 1},
+    }
+
+
+def _snapshot(conn):
+    return conn.execute("SELECT * FROM attribute_records ORDER BY attribute_id").fetchall()
+
+
+def _dates(start, n):
+    return [(start + timedelta(days=i)).isoformat() for i in range(n)]
+
+
+class TestFold:
+    def test_streaks_and_extremes(self, test_db):
+        db.upsert_attribute(test_db, _attribute("meditation", 7))
+        days = _dates(date(2024, 1, 1), 7)
+        values = ["1", "1", "0", "1", "1", "1", "1"]
+        db.upsert_values(test_db, "meditation", [{"date": d, "value": v} for d, v in zip(days, values)])
+        # A gap breaks the streak too
+        db.upsert_values(test_db, "meditation", [{"date": "2024-01-09", "value": "1"}])
+        db.upsert_attribute(test_db, _attribute("steps", 0))
+        db.upsert_values(test_db, "steps", [
+            {"date": "2024-01-01", "value": "500"},
+            {"date": "2024-01-02", "value": "12000"},
+            {"date": "2024-01-03", "value": "12000"},
+        ])
+
+        records.update(test_db, {"meditation": "2024-01-01", "steps": "2024-01-01"}, GOALS)
+        result = records.get_records(test_db)
+
+        med = result["meditation"]
+        assert (med["longest_streak"], med["longest_streak_start"], med["longest_streak_end"]) == (
+            4, "2024-01-04", "2024-01-07"
+        )
+        assert (med["current_streak"], med["current_streak_start"]) == (1, "2024-01-09")
+        assert med["max_date"] is None  # booleans only get streaks
+        steps = result["steps"]
+        assert (steps["max_value"], steps["max_date"]) == (12000, "2024-01-02")
+        assert (steps["min_value"], steps["min_date"]) == (500, "2024-01-01")
+        assert steps["longest_streak"] == 2
+        assert records.streak_on(med, "2024-01-06") == 3
+
+
+def test_incremental_equals_full_recompute(test_db):
+    rng = random.Random(7)
+    db.upsert_attribute(test_db, _attribute("meditation", 7))
+    db.upsert_attribute(test_db, _attribute("steps", 0))
+    db.upsert_attribute(test_db, _attribute("weight", 1))
+    days = _dates(date(2023, 1, 1), 400)
+
+    def series(name):
+        if name == "meditation":
+            return [{"date": d, "value": str(int(rng.random() < 0.7))} for d in days]
+        if name == "steps":
+            return [{"date": d, "value": str(rng.randint(3000, 15000))} for d in days]
+        return [{"date": d, "value": f"{rng.uniform(60, 80):.1f}"} for d in days if rng.random() < 0.8]
+
+    data = {name: series(name) for name in ("meditation", "steps", "weight")}
+    # Sync in irregular batches, like daily incremental runs
+    position = 0
+    while position < len(days):
+        size = rng.randint(1, 40)
+        batch_days = set(days[position:position + size])
+        touched = {}
+        for name, values in data.items():
+            batch = [v for v in values if v["date"] in batch_days]
+            if batch:
+                db.upsert_values(test_db, name, batch)
+                touched[name] = batch[0]["date"]
+        records.update(test_db, touched, GOALS)
+        position += size
+    # A corrected old value forces a full recompute of that attribute
+    db.upsert_values(test_db, "steps", [{"date": days[10], "value": "99999"}])
+    records.update(test_db, {"steps": days[10]}, GOALS)
+
+    incremental = _snapshot(test_db)
+    records.rebuild(test_db, GOALS)
+    assert [tuple(r) for r in incremental] == [tuple(r) for r in _snapshot(test_db)]
+    assert records.get_records(test_db)["steps"]["max_value"] == 99999
+
+
+def test_goal_change_recomputes(test_db):
+    db.upsert_attribute(test_db, _attribute("steps", 0))
+    db.upsert_values(test_db, "steps", [{"date": d, "value": "8000"} for d in _dates(date(2024, 1, 1), 3)])
+    records.update(test_db, {"steps": "2024-01-01"}, GOALS)
+    assert records.get_records(test_db)["steps"]["longest_streak"] == 0
+
+    records.update(test_db, {}, {"steps": 5000})
+    assert records.get_records(test_db)["steps"]["longest_streak"] == 3
+
+
+def test_streak_ends_when_values_stop(test_db):
+    db.upsert_attribute(test_db, _attribute("meditation", 7))
+    db.upsert_attribute(test_db, _attribute("steps", 0))
+    db.upsert_values(test_db, "meditation", [{"date": d, "value": "1"} for d in _dates(date(2024, 1, 1), 3)])
+    db.upsert_values(test_db, "steps", [{"date": d, "value": "500"} for d in _dates(date(2024, 1, 1), 3)])
+    records.update(test_db, {"meditation": "2024-01-01", "steps": "2024-01-01"}, GOALS)
+    assert records.get_records(test_db)["meditation"]["current_streak"] == 3
+
+    # Other attributes move on while meditation has no rows at all
+    db.upsert_values(test_db, "steps", [{"date": "2024-01-05", "value": "500"}])
+    records.update(test_db, {"steps": "2024-01-05"}, GOALS)
+    med = records.get_records(test_db)["meditation"]
+    assert (med["current_streak"], med["current_streak_start"], med["current_streak_end"]) == (0, None, None)
+    assert (med["longest_streak"], med["longest_streak_end"]) == (3, "2024-01-03")
+
+    # A row without a usable value ends it too
+    db.upsert_values(test_db, "meditation", [{"date": "2024-01-04", "value": "1"},
+                                             {"date": "2024-01-05", "value": ""}])
+    records.update(test_db, {"meditation": "2024-01-04"}, GOALS)
+    stored = test_db.execute(
+        "SELECT current_streak FROM attribute_records WHERE attribute_id = ?",
+        (db.get_attribute_id(test_db, "meditation"),),
+    ).fetchone()[0]
+    assert stored == 0
+    incremental = _snapshot(test_db)
+    records.rebuild(test_db, GOALS)
+    assert [tuple(r) for r in incremental] == [tuple(r) for r in _snapshot(test_db)]
+
+
+def test_partial_days_wait_for_final_values(test_db):
+    db.upsert_attribute(test_db, _attribute("steps", 0))
+    db.upsert_values(test_db, "steps", [{"date": d, "value": "8000"} for d in _dates(date(2024, 1, 1), 3)])
+    db.mark_partial_day(test_db, db.date_to_day("2024-01-03"))
+    records.update(test_db, {"steps": "2024-01-01"}, GOALS)
+    assert records.get_records(test_db)["steps"]["max_date"] == "2024-01-01"
+
+    db.upsert_values(test_db, "steps", [{"date": "2024-01-03", "value": "12000"}])
+    db.clear_partial_days(test_db, db.date_to_day("2024-01-03"))
+    before = metrics.snapshot()
+    records.update(test_db, {"steps": "2024-01-03"}, GOALS)
+    assert metrics.since(before)["counters"] == {"records_refreshed{mode=incremental}": 1}
+    steps = records.get_records(test_db)["steps"]
+    assert (steps["max_value"], steps["max_date"], steps["current_streak"]) == (12000, "2024-01-03", 1)
+
+
+def test_template_and_status(populated_db, tmp_path):
+    records.rebuild(populated_db)
+    best = records.get_records(populated_db)["steps"]["max_date"]
+    day = query_day(populated_db, best)
+    assert {"name": "steps", "label": "Steps", "kind": "high", "text": day["records"][0]["text"]} in day["records"]
+
+    config_path = tmp_path / "config.toml"
+    config_path.write_text(
+        f'[sync]\ndatabase = "{tmp_path / "test.db"}"\n[export]\noutput_dir = "{tmp_path / "export"}"\n'
+    )
+    runner = CliRunner()
+    result = runner.invoke(cli, ["-c", str(config_path), "export", "--from", best, "--to", best])
+    assert result.exit_code == 0, result.output
+    note = (tmp_path / "export" / best[:4] / f"{best}.md").read_text()
+    assert "## Records" in note and "all-time high" in note
+
+    result = runner.invoke(cli, ["-c", str(config_path), "records", "--rebuild"])
+    assert result.exit_code == 0, result.output
+    assert "Steps: high" in result.output
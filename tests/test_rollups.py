@@ -0,0 +1,190 @@
+"""Tests for the incrementally maintained rollup tables and range summaries."""
+
+import random
+from datetime import date, timedelta
+
+import pytest
+from click.testing import CliRunner
+
+from benchmarks.synthetic import SyntheticDataset
+from exist_backup import db, metrics, rollups, verify
+from exist_backup.cli import cli
+
+
+def _day(value):
+    return db.date_to_day(value)
+
+
+def _raw_stats(conn, name, date_from, date_to):
+    return conn.execute(
+        "SELECT count(*), sum(d.value), min(d.value), max(d.value) FROM attribute_data d "
+        "JOIN attribute_ids n ON n.id = d.attribute_id WHERE n.name = ? AND d.day BETWEEN ? AND ? "
+        "AND typeof(d.value) IN ('integer', 'real')",
+        (name, _day(date_from), _day(date_to)),
+    ).fetchone()
+
+
+@pytest.fixture(scope="module")
+def synthetic_db(tmp_path_factory):
+    dataset = SyntheticDataset(12, 2, end_date=date(2024, 12, 31))
+    path = str(tmp_path_factory.mktemp("rollups") / "synthetic.db")
+    dataset.build_db(path)
+    conn = db.connect(path)
+    yield conn, dataset
+    conn.close()
+
+
+class TestPeriods:
+    def test_python_and_sql_bounds_agree(self, test_db):
+        for day in range(_day("2023-12-20"), _day("2025-01-10")):
+            for period in db.ROLLUP_PERIODS:
+                row = test_db.execute(
+                    f"SELECT {db._period_start_sql(':day', period)}, {db._period_end_sql(':day', period)}",
+                    {"day": day},
+                ).fetchone()
+                assert tuple(row) == db.period_bounds(day, period), (period, db.day_to_date(day))
+
+    def test_cover_uses_largest_whole_periods(self):
+        blocks, spans = rollups.cover(_day("2024-01-01"), _day("2025-03-10"))
+        assert blocks == [
+            ("year", _day("2024-01-01")),
+            ("month", _day("2025-01-01")),
+            ("month", _day("2025-02-01")),
+            ("week", _day("2025-03-03")),
+        ]
+        assert spans == [(_day("2025-03-01"), _day("2025-03-02")), (_day("2025-03-10"), _day("2025-03-10"))]
+
+
+class TestMaintenance:
+    def test_build_matches_full_recompute(self, synthetic_db):
+        conn, _ = synthetic_db
+        assert conn.execute("SELECT count(*) FROM attribute_rollups").fetchone()[0] > 0
+        assert rollups.verify(conn) == []
+
+    def test_only_numeric_types_are_rolled_up(self, populated_db):
+        names = {
+            row[0] for row in populated_db.execute(
+                "SELECT DISTINCT n.name FROM attribute_rollups r JOIN attribute_ids n ON n.id = r.attribute_id"
+            )
+        }
+        assert names == {"steps", "steps_active_min", "sleep", "mood", "productive_min", "meditation"}
+
+    def test_upsert_refreshes_only_touched_periods(self, populated_db):
+        before = metrics.snapshot()
+        db.upsert_values(populated_db, "steps", [
+            {"date": "2024-12-02", "value": "100"},
+            {"date": "2024-12-03", "value": "50000"},
+        ])
+        refreshed = metrics.since(before)["counters"]
+        assert {period: refreshed[f"rollup_runs_refreshed{{period={period}}}"]
+                for period in db.ROLLUP_PERIODS} == {"week": 1, "month": 1, "year": 1}
+        month = populated_db.execute(
+            "SELECT count, sum, min, max FROM attribute_rollups r JOIN attribute_ids n ON n.id = r.attribute_id "
+            "WHERE n.name = 'steps' AND period = 'month' AND start_day = ?",
+            (_day("2024-12-01"),),
+        ).fetchone()
+        assert tuple(month) == (3, 8432 + 100 + 50000, 100, 50000)
+        assert rollups.verify(populated_db) == []
+
+    def test_all_write_paths_keep_rollups_exact(self, populated_db):
+        populated_db.execute(
+            "INSERT INTO attribute_values (attribute_name, date, value) VALUES ('mood', '2025-01-06', '9')"
+        )
+        db.upsert_changed_values(populated_db, "sleep", [{"date": "2024-12-01", "value": "1"}])
+        steps = db.get_attribute_id(populated_db, "steps")
+        populated_db.execute("DELETE FROM attribute_data WHERE attribute_id = ? AND day = ?", (steps, _day("2024-12-03")))
+        db.refresh_rollups(populated_db, [(steps, _day("2024-12-03"))])
+        populated_db.commit()
+        assert rollups.verify(populated_db) == []
+
+    def test_value_type_change_recomputes_attribute(self, populated_db, sample_attributes):
+        mood_note = next(a for a in sample_attributes if a["name"] == "mood_note")
+        populated_db.execute(
+            "INSERT INTO attribute_values (attribute_name, date, value) VALUES ('mood_note', '2024-12-04', '7')"
+        )
+        db.upsert_attribute(populated_db, {**mood_note, "value_type": 8})
+        assert rollups.verify(populated_db) == []
+        db.upsert_attribute(populated_db, mood_note)
+        assert rollups.verify(populated_db) == []
+
+    def test_verify_reports_drift_and_rebuild_fixes_it(self, populated_db):
+        populated_db.execute("UPDATE attribute_rollups SET sum = sum + 1 WHERE period = 'week'")
+        populated_db.execute("DELETE FROM attribute_rollups WHERE period = 'year'")
+        mismatches = rollups.verify(populated_db)
+        assert {m["period"] for m in mismatches} == {"week", "year"}
+        assert all(m["stored"] is None for m in mismatches if m["period"] == "year")
+        db.rebuild_rollups(populated_db)
+        assert rollups.verify(populated_db) == []
+
+    def test_init_db_backfills_older_databases(self, populated_db):
+        expected = populated_db.execute("SELECT * FROM attribute_rollups").fetchall()
+        populated_db.execute("DROP TABLE attribute_rollups")
+        populated_db.commit()
+        db.init_db(populated_db)
+        assert populated_db.execute("SELECT * FROM attribute_rollups").fetchall() == expected
+        populated_db.execute(
+            "INSERT INTO attribute_values (attribute_name, date, value) VALUES ('steps', '2024-12-09', '1')"
+        )
+        assert rollups.verify(populated_db) == []
+
+    def test_verify_repair_refreshes_deleted_days(self, tmp_path):
+        dataset = SyntheticDataset(4, 1, end_date=date(2024, 12, 31))
+        path = str(tmp_path / "repair.db")
+        dataset.build_db(path)
+        conn = db.connect(path)
+        name = dataset.attributes[0]["name"]
+        conn.execute(verify.STAGING_SCHEMA)  # nothing staged: the block was deleted remotely
+        verify._repair_block(conn, db.get_attribute_id(conn, name), False, _day("2024-06-01"), _day("2024-06-30"))
+        conn.commit()
+        assert _raw_stats(conn, name, "2024-06-01", "2024-06-30")[0] == 0
+        assert rollups.verify(conn) == []
+        conn.close()
+
+
+class TestSummarize:
+    def test_matches_raw_aggregation_for_any_range(self, synthetic_db):
+        conn, dataset = synthetic_db
+        rng = random.Random(3)
+        first = dataset.start_date
+        span = (dataset.end_date - first).days
+        for _ in range(25):
+            start = first + timedelta(days=rng.randrange(span))
+            end = min(dataset.end_date, start + timedelta(days=rng.randrange(1, 500)))
+            summary = rollups.summarize(conn, start, end)
+            for name, stats in summary.items():
+                count, total, low, high = _raw_stats(conn, name, start, end)
+                assert (stats["count"], stats["min"], stats["max"]) == (count, low, high), (name, start, end)
+                assert stats["sum"] == pytest.approx(total)
+
+    def test_reads_rollups_not_values(self, synthetic_db):
+        conn, dataset = synthetic_db
+        before = metrics.snapshot()
+        summary = rollups.summarize(conn, "2023-01-01", "2024-12-31")
+        rows_read = metrics.since(before)["counters"]["rollup_rows_read"]
+        assert rows_read <= 2 * len(summary)
+        assert sum(s["count"] for s in summary.values()) > 100 * rows_read
+
+    def test_filters_and_stats(self, populated_db):
+        summary = rollups.summarize(populated_db, "2024-12-01", "2024-12-03", {"include_attributes": ["steps"]})
+        assert list(summary) == ["steps"]
+        steps = summary["steps"]
+        assert steps["count"] == 3
+        assert steps["mean"] == pytest.approx((8432 + 6201 + 12045) / 3)
+        assert steps["stddev"] == pytest.approx(2407.9, abs=0.1)
+
+
+def test_summary_command(populated_db, tmp_path):
+    config_path = tmp_path / "config.toml"
+    config_path.write_text(f'[sync]\ndatabase = "{tmp_path / "test.db"}"\n')
+    runner = CliRunner()
+
+    result = runner.invoke(cli, ["-c", str(config_path), "summary", "--from", "2024-12-01", "--to", "2024-12-03"])
+    assert result.exit_code == 0, result.output
+    assert "Steps" in result.output and "avg 8,893" in result.output
+
+    populated_db.execute("UPDATE attribute_rollups SET max = 0")
+    populated_db.commit()
+    result = runner.invoke(cli, ["-c", str(config_path), "summary", "--verify"])
+    assert result.exit_code == 1
+    result = runner.invoke(cli, ["-c", str(config_path), "summary", "--rebuild", "--verify"])
+    assert result.exit_code == 0, result.output
@@ -0,0 +1,36 @@
+"""Tests for the full-text index over string attributes."""
+
+from exist_backup import db
+
+
+class TestSearchValues:
+    def test_finds_string_values(self, populated_db):
+        rows = db.search_values(populated_db, "great")
+        assert [(r["date"], r["attribute_name"]) for r in rows] == [("2024-12-03", "mood_note")]
+        assert rows[0]["label"] == "Mood note"
+        assert "[great]" in rows[0]["snippet"]
+
+    def test_numeric_attributes_not_indexed(self, populated_db):
+        assert db.search_values(populated_db, "8432") == []
+
+    def test_upsert_replaces_indexed_text(self, populated_db):
+        db.upsert_values(populated_db, "mood_note", [{"date": "2024-12-03", "value": "Rainy walk"}])
+        assert db.search_values(populated_db, "great") == []
+        assert [r["date"] for r in db.search_values(populated_db, "rainy")] == ["2024-12-03"]
+
+    def test_prefix_query(self, populated_db):
+        rows = db.search_values(populated_db, "feel*")
+        assert [r["date"] for r in rows] == ["2024-12-03"]
+
+    def test_invalid_syntax_falls_back_to_literal(self, populated_db):
+        rows = db.search_values(populated_db, 'day" overall')
+        assert [r["date"] for r in rows] == ["2024-12-01"]
+
+    def test_backfill_existing_database(self, populated_db):
+        populated_db.execute("DROP TABLE value_search")
+        populated_db.commit()
+        db.init_db(populated_db)
+        assert len(db.search_values(populated_db, "day OR great")) == 2
+
+    def test_rebuild(self, populated_db):
+        assert db.rebuild_search_index(populated_db) == 2
@@ -0,0 +1,119 @@
+"""Tests for the read-only HTTP query API."""
+
+import threading
+
+import pytest
+import requests
+
+from exist_backup import db
+from exist_backup.server import ResponseCache, make_server
+
+
+@pytest.fixture
+def api_url(tmp_path, sample_profile, sample_attributes, sample_values):
+    db_path = str(tmp_path / "api.db")
+    conn = db.connect(db_path)
+    db.init_db(conn)
+    db.upsert_profile(conn, sample_profile)
+    for attr in sample_attributes:
+        db.upsert_attribute(conn, attr)
+    for val in sample_values:
+        db.upsert_values(conn, val["name"], val["values"])
+    conn.close()
+
+    server = make_server(db_path, port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    host, port = server.server_address[:2]
+    yield f"http://{host}:{port}", server, db_path
+    server.shutdown()
+    server.server_close()
+    server.app.close()
+
+
+class TestQueryApi:
+    def test_attributes(self, api_url, sample_attributes):
+        url, _, _ = api_url
+        resp = requests.get(url + "/attributes")
+        assert resp.status_code == 200
+        names = {a["name"] for a in resp.json()}
+        assert names == {a["name"] for a in sample_attributes}
+
+    def test_values_filtered(self, api_url):
+        url, _, _ = api_url
+        resp = requests.get(url + "/values", params={"attribute": "steps", "from": "2024-12-02"})
+        assert resp.json() == [
+            {"attribute_name": "steps", "date": "2024-12-02", "value": "6201"},
+            {"attribute_name": "steps", "date": "2024-12-03", "value": "12045"},
+        ]
+
+    def test_day_matches_query_day_grouping(self, api_url):
+        url, _, _ = api_url
+        data = requests.get(url + "/day/2024-12-01").json()
+        assert data["date"] == "2024-12-01"
+        steps = next(a for a in data["groups"]["Activity"] if a["name"] == "steps")
+        assert steps["formatted_value"] == "8,432"
+        assert "Meditated" in data["tags"]
+
+    def test_summary_reads_rollups(self, api_url):
+        url, _, _ = api_url
+        data = requests.get(url + "/summary", params={"from": "2024-12-01", "to": "2024-12-03",
+                                                      "attribute": "steps"}).json()
+        assert list(data) == ["steps"]
+        assert (data["steps"]["count"], data["steps"]["min"], data["steps"]["max"]) == (3, 6201, 12045)
+        assert requests.get(url + "/summary", params={"from": "2024-12-01"}).status_code == 400
+
+    def test_bad_date_and_unknown_path(self, api_url):
+        url, _, _ = api_url
+        assert requests.get(url + "/day/yesterday").status_code == 400
+        assert requests.get(url + "/nope").status_code == 404
+
+    def test_etag_not_modified(self, api_url):
+        url, _, _ = api_url
+        first = requests.get(url + "/attributes")
+        etag = first.headers["ETag"]
+        second = requests.get(url + "/attributes", headers={"If-None-Match": etag})
+        assert second.status_code == 304
+        assert second.content == b""
+
+    def test_cache_invalidated_by_write(self, api_url):
+        url, server, db_path = api_url
+        requests.get(url + "/values", params={"attribute": "steps"})
+        requests.get(url + "/values", params={"attribute": "steps"})
+        assert server.app.cache.hits == 1
+
+        conn = db.connect(db_path)
+        db.upsert_values(conn, "steps", [{"date": "2024-12-04", "value": "999"}])
+        conn.close()
+
+        values = requests.get(url + "/values", params={"attribute": "steps"}).json()
+        assert values[-1] == {"attribute_name": "steps", "date": "2024-12-04", "value": "999"}
+
+
+class TestResponseCache:
+    def test_lru_eviction(self):
+        cache = ResponseCache(maxsize=2)
+        cache.validate(1)
+        cache.put("a", 1, 1)
+        cache.put("b", 2, 1)
+        cache.get("a")
+        cache.put("c", 3, 1)
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+
+    def test_version_change_clears(self):
+        cache = ResponseCache()
+        cache.validate(1)
+        cache.put("a", 1, 1)
+        cache.validate(2)
+        assert cache.get("a") is None
+
+    def test_entry_computed_before_a_commit_is_not_stored(self):
+        cache = ResponseCache()
+        cache.validate(1)
+        # Another request sees the commit while this one is still querying
+        cache.validate(2)
+        cache.put("a", "stale", 1)
+        assert cache.get("a") is None
+        cache.put("a", "fresh", 2)
+        assert cache.get("a") == "fresh"
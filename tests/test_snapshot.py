@@ -0,0 +1,110 @@
+"""Tests for deduplicated database snapshots."""
+
+import threading
+import zlib
+from datetime import date, timedelta
+
+import pytest
+
+from exist_backup import db
+from exist_backup.snapshot import SnapshotError, SnapshotStore
+
+
+@pytest.fixture
+def db_path(tmp_path, sample_profile, sample_attributes, sample_values):
+    path = str(tmp_path / "exist.db")
+    conn = db.connect(path)
+    db.init_db(conn)
+    db.upsert_profile(conn, sample_profile)
+    for attr in sample_attributes:
+        db.upsert_attribute(conn, attr)
+    for val in sample_values:
+        db.upsert_values(conn, val["name"], val["values"])
+    # Enough rows to span several chunks
+    db.upsert_values(conn, "steps", [
+        {"date": f"20{y:02d}-01-{d:02d}", "value": str(y * 100 + d)} for y in range(10, 24) for d in range(1, 29)
+    ])
+    conn.close()
+    return path
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SnapshotStore(tmp_path / "snapshots", chunk_size=4096)
+
+
+class TestSnapshotStore:
+    def test_restore_round_trip(self, store, db_path, tmp_path):
+        manifest = store.create(db_path)
+        assert manifest["new_chunks"] == len(set(manifest["chunks"]))
+
+        restored = tmp_path / "restored.db"
+        store.restore(manifest["id"], restored)
+        conn = db.connect(str(restored))
+        assert db.get_last_sync_date(conn, "steps") == "2024-12-03"
+        assert len(db.get_values_for_date_range(conn, "2010-01-01", "2010-12-31")) == 28
+        conn.close()
+
+    def test_consistent_while_another_connection_commits(self, store, db_path, tmp_path):
+        stop = threading.Event()
+
+        def write():
+            conn = db.connect(db_path)
+            day = 0
+            while not stop.is_set():
+                day += 1
+                db.upsert_values(conn, "mood", [{"date": (date(2030, 1, 1) + timedelta(days=day)).isoformat(),
+                                                 "value": "5"}])
+            conn.close()
+
+        writer = threading.Thread(target=write)
+        writer.start()
+        try:
+            manifest = store.create(db_path)
+        finally:
+            stop.set()
+            writer.join()
+
+        restored = tmp_path / "restored.db"
+        store.restore(manifest["id"], restored)
+        conn = db.connect(str(restored))
+        assert conn.execute("PRAGMA integrity_check").fetchone()[0] == "ok"
+        assert len(db.get_values_for_date_range(conn, "2010-01-01", "2010-12-31")) == 28
+        conn.close()
+
+    def test_unchanged_chunks_are_shared(self, store, db_path):
+        first = store.create(db_path)
+        conn = db.connect(db_path)
+        db.upsert_values(conn, "mood", [{"date": "2024-12-04", "value": "6"}])
+        conn.close()
+        second = store.create(db_path)
+
+        assert second["id"] != first["id"]
+        assert 0 < second["new_chunks"] < len(second["chunks"])
+
+    def test_verify_detects_corruption(self, store, db_path):
+        manifest = store.create(db_path)
+        assert store.verify()["id"] == manifest["id"]
+
+        digest = manifest["chunks"][0]
+        chunk_path = store.chunk_dir / digest[:2] / f"{digest}.z"
+        chunk_path.write_bytes(zlib.compress(b"garbage"))
+        with pytest.raises(SnapshotError):
+            store.verify(manifest["id"])
+
+    def test_prune_keeps_newest_and_collects_chunks(self, store, db_path):
+        store.create(db_path)
+        conn = db.connect(db_path)
+        db.upsert_values(conn, "steps", [{"date": "2030-01-01", "value": "1"}])
+        conn.close()
+        newest = store.create(db_path)
+
+        snapshots_removed, chunks_removed = store.prune(keep=1)
+        assert snapshots_removed == 1
+        assert chunks_removed > 0
+        assert [m["id"] for m in store.list_snapshots()] == [newest["id"]]
+        store.verify(newest["id"])
+
+    def test_missing_snapshot(self, store):
+        with pytest.raises(SnapshotError):
+            store.load_manifest("nope")
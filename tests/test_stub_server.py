@@ -0,0 +1,79 @@
+"""Tests for the local stub Exist.io server, driven through ExistClient."""
+
+from datetime import date, timedelta
+
+import pytest
+import requests
+
+from benchmarks.stub_server import StubExistServer
+from benchmarks.synthetic import SyntheticDataset
+from exist_backup import db, metrics
+from exist_backup.api import ExistClient
+from exist_backup.sync import run_sync
+
+YESTERDAY = date.today() - timedelta(days=1)
+
+
+@pytest.fixture
+def dataset():
+    return SyntheticDataset(12, 1, end_date=YESTERDAY)
+
+
+class TestStubServer:
+    def test_pagination_matches_dataset(self, dataset):
+        with StubExistServer(dataset, page_size=5) as stub:
+            client = ExistClient("token", base_url=stub.base_url)
+            assert client.get_profile()["username"] == "benchuser"
+            assert [a["name"] for a in client.get_attributes()] == [a["name"] for a in dataset.attributes]
+
+            name = dataset.attributes[0]["name"]
+            values = list(client.get_attribute_values(name, date_max=str(YESTERDAY)))
+            assert values == dataset.values[name]
+            # 12 attributes at 5 per page, plus one paginated values walk
+            assert stub.state.stats["requests"] == 1 + 3 + -(-len(values) // 5)
+
+    def test_with_values_window(self, dataset):
+        with StubExistServer(dataset) as stub:
+            client = ExistClient("token", base_url=stub.base_url)
+            results = list(client.get_attributes_with_values(days=3, date_max=str(YESTERDAY)))
+            cutoff = (YESTERDAY - timedelta(days=2)).isoformat()
+            assert len(results) == len(dataset.attributes)
+            assert all(v["date"] >= cutoff for attr in results for v in attr["values"])
+
+    def test_compressed_pages_are_counted_on_the_wire(self, dataset):
+        metrics.reset()
+        with StubExistServer(dataset) as stub:
+            client = ExistClient("token", base_url=stub.base_url)
+            results = list(client.get_attributes_with_values(days=31))
+        assert len(results) == len(dataset.attributes)
+        counters = metrics.snapshot()["counters"]
+        wire = counters['http_bytes_wire{encoding=gzip,endpoint=attributes/with-values/}']
+        assert 0 < wire < counters['http_bytes_decoded{endpoint=attributes/with-values/}']
+
+    def test_quota_returns_retry_after(self, dataset):
+        with StubExistServer(dataset, quota=2, quota_window=1) as stub:
+            client = ExistClient("token", base_url=stub.base_url)
+            for _ in range(3):
+                client.get_profile()
+            assert stub.state.stats["throttled"] >= 1
+
+    def test_error_injection(self, dataset):
+        with StubExistServer(dataset, error_rate=1.0) as stub:
+            client = ExistClient("token", base_url=stub.base_url)
+            with pytest.raises(requests.HTTPError):
+                client.get_profile()
+
+    def test_full_sync_end_to_end(self, dataset, tmp_path):
+        config = {
+            "auth": {"token": "token"},
+            "sync": {"database": str(tmp_path / "stub.db")},
+        }
+        with StubExistServer(dataset) as stub:
+            config["sync"]["api_url"] = stub.base_url
+            result = run_sync(config, full=True)
+
+        assert result["status"] == "success"
+        assert result["values_synced"] == dataset.total_values
+        conn = db.connect(config["sync"]["database"])
+        assert db.get_sync_status(conn)["total_values"] == dataset.total_values
+        conn.close()
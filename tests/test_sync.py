@@ -4,9 +4,13 @@ from datetime import date, timedelta
 from unittest.mock import MagicMock, patch
 
 import pytest
+from click.testing import CliRunner
 
-from exist_backup import db
-from exist_backup.sync import run_sync
+from benchmarks.stub_server import StubExistServer
+from benchmarks.synthetic import SyntheticDataset
+from exist_backup import db, planner, records
+from exist_backup.cli import cli
+from exist_backup.sync import run_sync, run_today
 
 
 @pytest.fixture
@@ -40,7 +44,7 @@ def _make_incremental_client(sample_profile, sample_attributes, value_date):
     client = MagicMock()
     client.get_profile.return_value = sample_profile
 
-    def fake_with_values(days=1, date_max=None):
+    def fake_with_values(days=1, date_max=None, params=None):
         for attr in sample_attributes:
             result = dict(attr)
             result["values"] = [{"date": str(value_date), "value": "42"}]
@@ -72,6 +76,19 @@ class TestRunSync:
         assert stats["total_values"] > 0
         conn.close()
 
+    @patch("exist_backup.sync.api.ExistClient")
+    def test_sync_updates_records(self, MockClient, sync_config, mock_client):
+        MockClient.return_value = mock_client
+        sync_config["records"] = {"goals": {"steps": 150}}
+
+        run_sync(sync_config, full=True)
+
+        conn = db.connect(sync_config["sync"]["database"])
+        steps = records.get_records(conn)["steps"]
+        conn.close()
+        assert (steps["max_value"], steps["max_date"]) == (200, "2024-12-02")
+        assert (steps["longest_streak"], steps["longest_streak_start"]) == (1, "2024-12-02")
+
     @patch("exist_backup.sync.api.ExistClient")
     def test_incremental_sync_uses_bulk_endpoint(
         self, MockClient, sync_config, sample_profile, sample_attributes
@@ -119,7 +136,7 @@ class TestRunSync:
         client = MagicMock()
         client.get_profile.return_value = sample_profile
 
-        def failing_with_values(days=1, date_max=None):
+        def failing_with_values(days=1, date_max=None, params=None):
             # First attribute succeeds, rest raise
             first = dict(sample_attributes[0])
             first["values"] = [{"date": "2024-12-01", "value": "42"}]
@@ -156,3 +173,110 @@ class TestRunSync:
 
         assert result["status"] == "error"
         assert len(result["errors"]) == len(sample_attributes)
+
+
+class TestRunToday:
+    @pytest.fixture
+    def setup(self, stub_setup):
+        return stub_setup(6, end_date=date.today(), until=date.today() - timedelta(days=1))
+
+    def test_fetches_one_day_and_writes_only_changes(self, setup):
+        config, dataset, stub = setup
+        today = str(date.today())
+        expected = sum(1 for values in dataset.values.values() for v in values if v["date"] == today)
+
+        first = run_today(config)
+        assert first["status"] == "success"
+        assert first["values_synced"] == expected
+        assert stub.state.stats["requests"] == 1  # stored profile and metadata are reused
+
+        assert run_today(config)["values_synced"] == 0
+
+        name = next(n for n, values in dataset.values.items() if values[0]["date"] == today)
+        dataset.values[name][0] = {"date": today, "value": 123456}
+        assert run_today(config)["values_synced"] == 1
+
+    def test_today_stays_pending_for_the_regular_sync(self, setup):
+        config, _, _ = setup
+        conn = db.connect(config["sync"]["database"])
+        watermark = db.get_last_sync_date(conn, "activity_0")
+        conn.close()
+
+        run_today(config)
+
+        conn = db.connect(config["sync"]["database"])
+        assert db.get_last_sync_date(conn, "activity_0") == watermark
+        plan = planner.build_plan(conn, date_max=date.today())
+        assert all(e["strategy"] != planner.CURRENT for e in plan["attributes"])
+        db.clear_partial_days(conn, db.date_to_day(date.today()))
+        assert db.get_last_sync_date(conn, "activity_0") >= watermark
+        conn.close()
+
+
+class TestSelectiveSync:
+    @pytest.fixture
+    def dataset(self):
+        return SyntheticDataset(14, 1, end_date=date.today() - timedelta(days=1))
+
+    def test_full_sync_fetches_only_selected_attributes(self, tmp_path, dataset):
+        yesterday = date.today() - timedelta(days=1)
+        selected = [a["name"] for a in dataset.attributes if a["group"]["name"] == "sleep"]
+        pages = sum(max(1, -(-len(dataset.values_between(name, date_max=yesterday)) // 100)) for name in selected)
+        with StubExistServer(dataset) as stub:
+            config = {"auth": {"token": "t"}, "sync": {
+                "database": str(tmp_path / "sel.db"), "api_url": stub.base_url, "include_groups": ["sleep"],
+            }}
+            result = run_sync(config, full=True)
+            requests = stub.state.stats["requests"]
+
+        assert result["status"] == "success"
+        assert result["attributes_synced"] == len(selected)
+        # Profile, one attributes/ page narrowed by groups=, then history for the selected attributes only
+        assert requests == 2 + pages
+        conn = db.connect(config["sync"]["database"])
+        assert [row["name"] for row in db.get_all_attributes(conn)] == selected
+        conn.close()
+
+    def test_excluded_data_is_kept_but_not_synced(self, tmp_path, dataset):
+        db_path = str(tmp_path / "sel.db")
+        dataset.build_db(db_path, until=date.today() - timedelta(days=10))
+        excluded = [a["name"] for a in dataset.attributes if a["group"]["name"] == "sleep"]
+        count_excluded = (
+            "SELECT count(*) FROM attribute_data d JOIN attribute_ids n ON n.id = d.attribute_id "
+            f"WHERE n.name IN ({', '.join('?' * len(excluded))})"
+        )
+        conn = db.connect(db_path)
+        before = {name: db.get_last_sync_date(conn, name) for name in excluded}
+        stored = conn.execute(count_excluded, excluded).fetchone()[0]
+        conn.close()
+
+        with StubExistServer(dataset) as stub:
+            config = {"auth": {"token": "t"}, "sync": {
+                "database": db_path, "api_url": stub.base_url, "exclude_groups": ["sleep"],
+            }}
+            result = run_sync(config)
+            assert stub.state.stats["requests"] == 2  # profile and one with-values page
+
+        assert result["status"] == "success"
+        assert not {e["name"] for e in result["plan"]["attributes"]} & set(excluded)
+        conn = db.connect(db_path)
+        assert {name: db.get_last_sync_date(conn, name) for name in excluded} == before
+        assert conn.execute(count_excluded, excluded).fetchone()[0] == stored
+        latest = conn.execute("SELECT max(day) FROM attribute_data").fetchone()[0]
+        assert db.day_to_date(latest) == str(date.today() - timedelta(days=1))
+        conn.close()
+
+
+@pytest.mark.parametrize("flags, message", [
+    (["--today", "--full"], "--full does not apply to --today"),
+    (["--verify", "--full"], "--full does not apply to --verify"),
+    (["--today", "--verify"], "--today and --verify cannot be combined"),
+    (["--plan", "--today"], "--plan and --today cannot be combined"),
+    (["--plan", "--verify"], "--plan and --verify cannot be combined"),
+])
+def test_conflicting_sync_flags_are_rejected(tmp_path, flags, message):
+    config_path = tmp_path / "config.toml"
+    config_path.write_text(f'[auth]\ntoken = "t"\n[sync]\ndatabase = "{tmp_path / "test.db"}"\n')
+    result = CliRunner().invoke(cli, ["-c", str(config_path), "sync", *flags])
+    assert result.exit_code == 2
+    assert message in result.output
@@ -0,0 +1,39 @@
+"""Tests for the benchmark synthetic data generator."""
+
+from datetime import date
+
+from benchmarks.synthetic import VALUE_TYPES, SyntheticClient, SyntheticDataset
+from exist_backup import db
+
+
+class TestSyntheticDataset:
+    def test_deterministic(self):
+        a = SyntheticDataset(12, 1, seed=7, end_date=date(2024, 12, 31))
+        b = SyntheticDataset(12, 1, seed=7, end_date=date(2024, 12, 31))
+        assert a.attributes == b.attributes
+        assert a.values == b.values
+
+    def test_covers_all_value_types_and_is_sparse(self):
+        data = SyntheticDataset(18, 1, end_date=date(2024, 12, 31))
+        assert {a["value_type"] for a in data.attributes} == set(VALUE_TYPES)
+        assert 0 < data.total_values < 18 * 365
+
+    def test_values_newest_first_within_bounds(self):
+        data = SyntheticDataset(3, 1, end_date=date(2024, 12, 31))
+        values = data.values_between(data.attributes[0]["name"], "2024-06-01", "2024-06-30")
+        dates = [v["date"] for v in values]
+        assert dates == sorted(dates, reverse=True)
+        assert all("2024-06-01" <= d <= "2024-06-30" for d in dates)
+
+    def test_build_db_and_client(self, tmp_path):
+        data = SyntheticDataset(9, 1, end_date=date(2024, 12, 31))
+        db_path = str(tmp_path / "synthetic.db")
+        data.build_db(db_path)
+        conn = db.connect(db_path)
+        assert db.get_sync_status(conn)["total_values"] == data.total_values
+        conn.close()
+
+        client = SyntheticClient(data)
+        window = list(client.get_attributes_with_values(days=7, date_max="2024-12-31"))
+        assert len(window) == 9
+        assert all(v["date"] >= "2024-12-25" for attr in window for v in attr["values"])
@@ -0,0 +1,169 @@
+"""Tests for block-checksum verification against Exist.io."""
+
+from datetime import date, timedelta
+
+import pytest
+from click.testing import CliRunner
+
+from exist_backup import api, db, verify
+from exist_backup.cli import cli
+from exist_backup.verify import run_verify
+
+YESTERDAY = date.today() - timedelta(days=1)
+
+
+@pytest.fixture
+def setup(stub_setup):
+    return stub_setup(8)
+
+
+def _day(days_ago):
+    return db.date_to_day(YESTERDAY - timedelta(days=days_ago))
+
+
+class TestMonths:
+    def test_splits_range_on_month_boundaries(self):
+        assert list(verify.months(date(2024, 1, 20), date(2024, 3, 5))) == [
+            ("2024-01", date(2024, 1, 20), date(2024, 1, 31)),
+            ("2024-02", date(2024, 2, 1), date(2024, 2, 29)),
+            ("2024-03", date(2024, 3, 1), date(2024, 3, 5)),
+        ]
+
+
+class TestChecksums:
+    def test_order_independent_and_value_sensitive(self, test_db):
+        attribute_id = db.get_attribute_id(test_db, "steps")
+        rows = [{"id": attribute_id, "day": 19000 + i, "value": i} for i in range(10)]
+        db.write_value_rows(test_db, rows)
+        before = verify.checksums(test_db, "attribute_data", 0, 99999)
+
+        test_db.execute("DELETE FROM attribute_data")
+        db.write_value_rows(test_db, list(reversed(rows)))
+        assert verify.checksums(test_db, "attribute_data", 0, 99999) == before
+
+        db.write_value_rows(test_db, [{"id": attribute_id, "day": 19003, "value": "3.5"}])
+        after = verify.checksums(test_db, "attribute_data", 0, 99999)
+        assert after.keys() == before.keys()
+        assert after != before
+
+
+class TestVerify:
+    def test_in_sync_database_repairs_nothing(self, setup):
+        config, _, _ = setup
+        result = run_verify(config)
+        assert result["status"] == "success"
+        assert result["repaired"] == []
+        assert result["values_synced"] == 0
+
+    def test_repairs_only_drifted_blocks(self, setup):
+        config, dataset, _ = setup
+        conn = db.connect(config["sync"]["database"])
+        hole_id = db.get_attribute_id(conn, "activity_0")
+        edited_id = db.get_attribute_id(conn, "sleep_1")
+        conn.execute("DELETE FROM attribute_data WHERE attribute_id = ? AND day = ?", (hole_id, _day(0)))
+        conn.execute("UPDATE attribute_data SET value = -1 WHERE attribute_id = ? AND day = ?", (edited_id, _day(60)))
+        conn.commit()
+        conn.close()
+
+        result = run_verify(config)
+
+        repaired = {(b["name"], b["month"]) for b in result["repaired"]}
+        assert repaired == {
+            ("activity_0", YESTERDAY.strftime("%Y-%m")),
+            ("sleep_1", (YESTERDAY - timedelta(days=60)).strftime("%Y-%m")),
+        }
+        conn = db.connect(config["sync"]["database"])
+        stored = dict(conn.execute(
+            "SELECT date, value FROM attribute_values WHERE attribute_name = 'sleep_1'"
+        ).fetchall())
+        assert stored == {v["date"]: str(v["value"]) for v in dataset.values["sleep_1"]}
+        assert conn.execute(
+            "SELECT sync_type, values_synced FROM sync_log ORDER BY id DESC LIMIT 1"
+        ).fetchone()[0] == "verify"
+        conn.close()
+        assert run_verify(config)["repaired"] == []
+
+    def test_removes_values_deleted_remotely(self, setup):
+        config, dataset, _ = setup
+        removed = dataset.values["activity_0"].pop(0)
+
+        run_verify(config)
+
+        conn = db.connect(config["sync"]["database"])
+        assert conn.execute(
+            "SELECT count(*) FROM attribute_values WHERE attribute_name = 'activity_0' AND date = ?",
+            (removed["date"],),
+        ).fetchone()[0] == 0
+        conn.close()
+
+    def test_keeps_unpushed_manual_edits(self, setup):
+        config, dataset, _ = setup
+        name = next(a["name"] for a in dataset.attributes if a["manual"])
+        remote = dataset.values[name][0]
+        conn = db.connect(config["sync"]["database"])
+        conn.execute(
+            "INSERT OR REPLACE INTO attribute_values (attribute_name, date, value) VALUES (?, ?, 'local')",
+            (name, remote["date"]),
+        )
+        conn.commit()
+        conn.close()
+
+        run_verify(config)
+
+        conn = db.connect(config["sync"]["database"])
+        assert conn.execute(
+            "SELECT value FROM attribute_values WHERE attribute_name = ? AND date = ?", (name, remote["date"])
+        ).fetchone()[0] == "local"
+        assert len(db.get_pending_manual_values(conn)) == 1
+        conn.close()
+
+    def test_since_limits_months_fetched(self, setup):
+        config, _, stub = setup
+        conn = db.connect(config["sync"]["database"])
+        client = api.ExistClient("t", base_url=config["sync"]["api_url"])
+        report = verify.verify(conn, client, since=YESTERDAY.replace(day=1))
+        conn.close()
+        assert report["months"] == 1
+        assert stub.state.stats["requests"] == 1
+
+    def test_excluded_attributes_are_left_alone(self, setup):
+        config, dataset, _ = setup
+        dataset.values["activity_0"].pop(0)
+        dataset.values["sleep_1"].pop(0)
+        config["sync"]["exclude_attributes"] = ["activity_0"]
+
+        result = run_verify(config)
+
+        assert {b["name"] for b in result["repaired"]} == {"sleep_1"}
+        conn = db.connect(config["sync"]["database"])
+        stored = conn.execute("SELECT count(*) FROM attribute_values WHERE attribute_name = 'activity_0'")
+        assert stored.fetchone()[0] == len(dataset.values["activity_0"]) + 1
+        conn.close()
+
+    def test_attributes_missing_from_response_keep_their_values(self, stub_setup):
+        config, dataset, _ = stub_setup(11, hide_inactive=True)
+        assert any(not a["active"] for a in dataset.attributes)
+        db_path = config["sync"]["database"]
+        conn = db.connect(db_path)
+        stored = conn.execute("SELECT count(*) FROM attribute_data").fetchone()[0]
+        conn.close()
+
+        # Inactive attributes are requested explicitly and verified like the rest
+        assert run_verify(config)["repaired"] == []
+        # One the response leaves out entirely is not mistaken for deleted data
+        gone = dataset.attributes.pop(0)["name"]
+        assert run_verify(config)["repaired"] == []
+
+        conn = db.connect(db_path)
+        assert conn.execute("SELECT count(*) FROM attribute_data").fetchone()[0] == stored
+        assert db.get_last_sync_date(conn, gone) is not None
+        conn.close()
+
+
+def test_since_and_until_require_verify(tmp_path):
+    config_path = tmp_path / "config.toml"
+    config_path.write_text(f'[auth]\ntoken = "t"\n[sync]\ndatabase = "{tmp_path / "test.db"}"\n')
+    for option in ("--since", "--until"):
+        result = CliRunner().invoke(cli, ["-c", str(config_path), "sync", option, "2024-01-01"])
+        assert result.exit_code == 2
+        assert "only apply to --verify" in result.output